@@ -25,6 +25,18 @@ try:
 except ImportError:
     has_netCDF4 = False
 
+try:
+    import numexpr
+    has_numexpr = True
+except ImportError:
+    has_numexpr = False
+
+try:
+    import concurrent.futures
+    has_futures = True
+except ImportError:
+    has_futures = False
+
 
 def requires_scipy(test):
     return test if has_scipy else unittest.skip('requires scipy')(test)
@@ -38,6 +50,15 @@ def requires_netCDF4(test):
     return test if has_netCDF4 else unittest.skip('requires netCDF4')(test)
 
 
+def requires_numexpr(test):
+    return test if has_numexpr else unittest.skip('requires numexpr')(test)
+
+
+def requires_futures(test):
+    return (test if has_futures
+            else unittest.skip('requires concurrent.futures')(test))
+
+
 def decode_string_data(data):
     if data.dtype.kind == 'S':
         return np.core.defchararray.decode(data, 'utf-8', 'replace')
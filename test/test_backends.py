@@ -2,8 +2,11 @@ try:
     import cPickle as pickle
 except ImportError:
     import pickle
+from collections import OrderedDict
 import contextlib
 import os.path
+import shutil
+import sys
 import tempfile
 import unittest
 try:  # Python 2
@@ -14,11 +17,12 @@ except ImportError:  # Python 3
 import numpy as np
 import pandas as pd
 
-from xray import Dataset, open_dataset, backends
+from xray import Dataset, open_dataset, open_mfdataset, backends
 from xray.pycompat import iteritems, itervalues, PY3
 
 from . import TestCase, requires_scipy, requires_netCDF4, requires_pydap
 from .test_dataset import create_test_data
+from .test_indexing import RecordedAccessArray
 
 try:
     import netCDF4 as nc4
@@ -120,6 +124,16 @@ class DatasetIOTestCases(object):
         self.assertDatasetAllClose(encoded,
                                    self.roundtrip(encoded, decode_cf=False))
 
+    def test_mask_and_scale_dtype(self):
+        encoded = Dataset({'x': ('t', np.array([-1, 0, 1], dtype=np.int16),
+                                 {'_FillValue': -1,
+                                  'scale_factor': np.float32(0.5)})})
+        actual = self.roundtrip(encoded)
+        self.assertEqual(actual['x'].dtype, np.float64)
+        actual = self.roundtrip(encoded, mask_and_scale_dtype='auto')
+        self.assertEqual(actual['x'].dtype, np.float32)
+        self.assertArrayEqual([np.nan, 0, 0.5], actual['x'])
+
     def test_roundtrip_example_1_netcdf(self):
         expected = open_example_dataset('example_1.nc')
         actual = self.roundtrip(expected)
@@ -272,6 +286,88 @@ class NetCDF4DataTest(DatasetIOTestCases, TestCase):
         for k, v in iteritems(data['var2'].encoding):
             self.assertEqual(v, actual['var2'].encoding[k])
 
+    def test_planned_sparse_reads(self):
+        data = np.random.RandomState(0).randn(100, 30)
+        with create_tmp_file() as tmp_file:
+            nc = nc4.Dataset(tmp_file, mode='w')
+            nc.createDimension('x', 100)
+            nc.createDimension('y', 30)
+            nc.createVariable('foo', 'f8', ('x', 'y'), chunksizes=(10, 10))
+            nc.createVariable('bar', 'f8', ('x', 'y'), contiguous=True)
+            for name in ['foo', 'bar']:
+                nc.variables[name][:] = data
+            nc.close()
+
+            ds = open_dataset(tmp_file)
+            for name in ['foo', 'bar']:
+                for x, y in [([0, 99], [29, 0, 0]),
+                             ([73, 4, 5, 6, 18, -1, 4], slice(None, None, 7)),
+                             ([50, 0], 3),
+                             (np.array([], dtype=int), [1, 2])]:
+                    expected = data[x][:, y]
+                    actual = ds[name].indexed(x=x, y=y)
+                    self.assertArrayEqual(expected, actual.values)
+                with self.assertRaises(IndexError):
+                    ds[name].indexed(x=[0, 100]).values
+
+    def test_chunk_cache(self):
+        data = create_test_data()
+        data['var1'].encoding['chunksizes'] = (10, 10)
+        with create_tmp_file() as tmp_file:
+            data.dump(tmp_file)
+            for chunk_cache, expected in [((2 ** 24, 101, 0.5),
+                                           (2 ** 24, 101, 0.5)),
+                                          ({'var1': (2 ** 24, 101, 0.5)},
+                                           (2 ** 24, 101, 0.5))]:
+                store = backends.NetCDF4DataStore(tmp_file,
+                                                  chunk_cache=chunk_cache)
+                actual = Dataset.load_store(store)
+                var = store.ds.variables['var1']
+                self.assertEqual(expected, var.get_var_chunk_cache())
+                for key, block in actual['var1'].variable.iter_chunks():
+                    self.assertEqual(block.shape, (10, 10))
+                    self.assertArrayEqual(data['var1'].values[key],
+                                          block.values)
+                store.close()
+
+            actual = open_dataset(tmp_file, chunk_cache={'var2': (1, 1, 1)})
+            self.assertDatasetAllClose(data, actual)
+
+    def test_coalesce_indices(self):
+        from xray.backends.netCDF4_ import _coalesce_indices
+        indices = np.array([0, 1, 2, 5, 9, 10, 11, 25])
+        self.assertEqual([(0, 3), (3, 4), (4, 7), (7, 8)],
+                         _coalesce_indices(indices))
+        self.assertEqual([(0, 7), (7, 8)],
+                         _coalesce_indices(indices, chunksize=10))
+
+    def test_planned_read(self):
+        from xray.backends.netCDF4_ import _planned_read, MAX_PLANNED_READS
+        from xray import indexing
+
+        class OrthogonalArray(RecordedAccessArray):
+            # mimics the orthogonal indexing of netCDF4.Variable
+            def __getitem__(self, key):
+                self.keys.append(key)
+                return self.array[indexing.orthogonal_indexer(
+                    key, self.array.shape)]
+
+        values = np.arange(2000.0).reshape(20, 100)
+        array = OrthogonalArray(values)
+        key = (np.array([5, 0, 1]), np.array([3, 2, 50]))
+        actual = _planned_read(array, key, (1, 1), values.dtype)
+        self.assertArrayEqual(values[[5, 0, 1]][:, [3, 2, 50]], actual)
+        # runs [0, 1], [5] times runs [2, 3], [50]
+        self.assertEqual(4, len(array.keys))
+
+        # scattered indices on both axes would need too many reads
+        array = OrthogonalArray(values)
+        key = (np.arange(0, 20, 2), np.arange(0, 100, 2))
+        self.assertGreater(10 * 50, MAX_PLANNED_READS)
+        actual = _planned_read(array, key, (1, 1), values.dtype)
+        self.assertArrayEqual(values[::2, ::2], actual)
+        self.assertEqual([key], array.keys)
+
     def test_mask_and_scale(self):
         with create_tmp_file() as tmp_file:
             nc = nc4.Dataset(tmp_file, mode='w')
@@ -338,6 +434,246 @@ class ScipyDataTest(DatasetIOTestCases, TestCase):
         return open_dataset(BytesIO(serialized), **kwargs)
 
 
+    def test_bytes_roundtrip(self):
+        expected = create_test_data()
+        actual = open_dataset(expected.dumps())
+        self.assertDatasetAllClose(expected, actual)
+
+    def test_lazy_zero_copy_reads(self):
+        expected = create_test_data()
+        serialized = bytearray(expected.dumps())
+        store = backends.ScipyDataStore(serialized)
+        self.assertIsInstance(store.ds, backends.netcdf3.NetCDF3BufferFile)
+        actual = Dataset.load_store(store)
+        self.assertFalse(actual['var1'].variable._in_memory())
+        # data are views of the original buffer
+        data = store.ds.variables['var1'].data
+        self.assertFalse(data.flags.owndata)
+        self.assertDataArrayAllClose(expected['var1'], actual['var1'])
+
+    def test_loaded_data_is_writable(self):
+        expected = create_test_data()
+        serialized = expected.dumps()
+        fobj = BytesIO()
+        fobj.write(serialized)
+        actual = open_dataset(fobj)
+        actual['var1'][0, 0] = 100
+        self.assertEqual(100, actual['var1'][0, 0])
+        # the caller's buffer is not modified, and can still be written
+        self.assertEqual(serialized, fobj.getvalue())
+        fobj.write(b'foo')
+        self.assertEqual(serialized + b'foo', fobj.getvalue())
+
+        actual = open_dataset(serialized)
+        expected = actual['var1'] + 1
+        actual['var1'] += 1
+        self.assertVariableEqual(expected.variable, actual['var1'].variable)
+
+
+@requires_netCDF4
+@requires_scipy
+class ScipyFileDataTest(DatasetIOTestCases, TestCase):
+    @contextlib.contextmanager
+    def create_store(self):
+        with create_tmp_file() as tmp_file:
+            with backends.ScipyDataStore(tmp_file, mode='w') as store:
+                yield store
+
+    def roundtrip(self, data, **kwargs):
+        with create_tmp_file() as tmp_file:
+            with backends.ScipyDataStore(tmp_file, mode='w') as store:
+                data.dump_to_store(store)
+            store = backends.ScipyDataStore(tmp_file)
+            roundtrip_data = Dataset.load_store(store, **kwargs)
+        return roundtrip_data
+
+    def test_mmap_by_default(self):
+        expected = create_test_data()
+        with create_tmp_file() as tmp_file:
+            with backends.ScipyDataStore(tmp_file, mode='w') as store:
+                expected.dump_to_store(store)
+            store = backends.ScipyDataStore(tmp_file)
+            actual = Dataset.load_store(store)
+            self.assertFalse(actual['var1'].variable._in_memory())
+            data = store.ds.variables['var1'].data
+            self.assertFalse(data.flags.owndata or data.flags.writeable)
+            self.assertDataArrayAllClose(expected['var1'], actual['var1'])
+
+
+class NetCDF3DataTest(DatasetIOTestCases, TestCase):
+    @contextlib.contextmanager
+    def create_store(self):
+        with create_tmp_file() as tmp_file:
+            with backends.NetCDF3DataStore(tmp_file, mode='w') as store:
+                yield store
+
+    def roundtrip(self, data, **kwargs):
+        with create_tmp_file() as tmp_file:
+            with backends.NetCDF3DataStore(tmp_file, mode='w') as store:
+                data.dump_to_store(store)
+            store = backends.NetCDF3DataStore(tmp_file)
+            roundtrip_data = Dataset.load_store(store, **kwargs)
+        return roundtrip_data
+
+    def test_bytes_roundtrip(self):
+        expected = create_test_data()
+        with create_tmp_file() as tmp_file:
+            with backends.NetCDF3DataStore(tmp_file, mode='w') as store:
+                expected.dump_to_store(store)
+            with open(tmp_file, 'rb') as f:
+                contents = f.read()
+        store = backends.NetCDF3DataStore(contents)
+        self.assertDatasetAllClose(expected, Dataset.load_store(store))
+
+        # open_dataset reads bytes with this store if scipy is not installed
+        scipy = sys.modules.get('scipy')
+        sys.modules['scipy'] = None
+        try:
+            actual = open_dataset(contents)
+        finally:
+            if scipy is None:
+                del sys.modules['scipy']
+            else:
+                sys.modules['scipy'] = scipy
+        self.assertDatasetAllClose(expected, actual)
+
+    # the example datasets are opened with netCDF4
+    @requires_netCDF4
+    def test_roundtrip_example_1_netcdf(self):
+        super(NetCDF3DataTest, self).test_roundtrip_example_1_netcdf()
+
+    @requires_netCDF4
+    def test_pickle(self):
+        super(NetCDF3DataTest, self).test_pickle()
+
+    @requires_netCDF4
+    def test_netCDF4_compatibility(self):
+        expected = create_test_data()
+        expected['rec'] = ('time', np.arange(20, dtype='int16'))
+        for version, format in [(1, 'NETCDF3_CLASSIC'),
+                                (2, 'NETCDF3_64BIT')]:
+            with create_tmp_file() as tmp_file:
+                with backends.NetCDF3DataStore(
+                        tmp_file, mode='w', version=version,
+                        record_dimension='time') as store:
+                    expected.dump_to_store(store)
+                with nc4.Dataset(tmp_file) as ds:
+                    self.assertTrue(ds.dimensions['time'].isunlimited())
+                    self.assertTrue(ds.file_format.startswith(format))
+                actual = open_dataset(tmp_file)
+                self.assertDatasetAllClose(expected, actual)
+
+                expected.dump(tmp_file, format=format)
+                store = backends.NetCDF3DataStore(tmp_file)
+                self.assertDatasetAllClose(expected, Dataset.load_store(store))
+
+    def test_append_records(self):
+        expected = Dataset({'time': ('time', pd.date_range('2000-01-01',
+                                                           periods=5)),
+                            'x': ('x', [10, 20, 30]),
+                            'foo': (('time', 'x'), np.random.randn(5, 3)),
+                            'bar': ('time', np.arange(5, dtype='int16'))})
+        with create_tmp_file() as tmp_file:
+            with backends.NetCDF3DataStore(
+                    tmp_file, mode='w', record_dimension='time') as store:
+                expected.indexed(time=slice(3)).dump_to_store(store)
+            with open(tmp_file, 'rb') as f:
+                original = f.read()
+
+            store = backends.NetCDF3DataStore(tmp_file, mode='a')
+            store.append(expected.indexed(time=slice(3, 4)))
+            store.append({'time': expected['time'].values[4:],
+                          'foo': expected['foo'].values[4:],
+                          'bar': expected['bar'].values[4:]})
+            with open(tmp_file, 'rb') as f:
+                appended = f.read()
+            # only the number of records in the header is updated
+            self.assertEqual(original[8:], appended[8:len(original)])
+
+            actual = Dataset.load_store(backends.NetCDF3DataStore(tmp_file))
+            self.assertDatasetAllClose(expected, actual)
+
+            with self.assertRaisesRegexp(ValueError, 'record variables'):
+                store.append({'bar': np.arange(2)})
+            with self.assertRaisesRegexp(ValueError, 'cannot modify'):
+                store.set_attribute('title', 'foo')
+            with self.assertRaisesRegexp(ValueError, 'append mode'):
+                backends.NetCDF3DataStore(tmp_file).ds.append_records({})
+
+    def test_append_long_strings(self):
+        expected = Dataset({'s': ('time', np.array([b'ab', b'abc']))})
+        with create_tmp_file() as tmp_file:
+            with backends.NetCDF3DataStore(
+                    tmp_file, mode='w', record_dimension='time') as store:
+                expected.dump_to_store(store)
+            store = backends.NetCDF3DataStore(tmp_file, mode='a')
+            store.append({'time': [2], 's': np.array([b'x'])})
+            with self.assertRaisesRegexp(ValueError, 'longer than'):
+                store.append({'time': [3], 's': np.array([b'yyyy'])})
+            store.close()
+            actual = Dataset.load_store(backends.NetCDF3DataStore(tmp_file))
+            self.assertArrayEqual(actual['s'].values,
+                                  np.array([b'ab', b'abc', b'x']))
+
+    def test_write_records_in_blocks(self):
+        expected = Dataset({'foo': (('time', 'x'), np.random.randn(10, 3)),
+                            'bar': ('time', np.arange(10.0))})
+        original = backends.netcdf3.RECORD_BLOCK_BYTES
+        backends.netcdf3.RECORD_BLOCK_BYTES = 50
+        try:
+            actual = self.roundtrip(expected)
+        finally:
+            backends.netcdf3.RECORD_BLOCK_BYTES = original
+        self.assertDatasetAllClose(expected, actual)
+
+    def test_variable_order(self):
+        expected = Dataset(OrderedDict([
+            ('time', ('time', np.arange(2))),
+            ('rec', ('time', np.arange(2.0))),
+            ('x', ('x', np.arange(3))),
+            ('fixed', ('x', np.arange(3.0)))]))
+        with create_tmp_file() as tmp_file:
+            with backends.NetCDF3DataStore(
+                    tmp_file, mode='w', record_dimension='time') as store:
+                expected.dump_to_store(store)
+            actual = Dataset.load_store(backends.NetCDF3DataStore(tmp_file))
+            self.assertEqual(list(expected), list(actual))
+            self.assertDatasetIdentical(expected, actual)
+
+
+@requires_netCDF4
+class NetCDF3BufferFileTest(TestCase):
+    def test_record_variables(self):
+        with create_tmp_file() as tmp_file:
+            with nc4.Dataset(tmp_file, 'w', format='NETCDF3_CLASSIC') as ds:
+                ds.createDimension('time', None)
+                ds.createDimension('x', 3)
+                ds.title = 'records'
+                t = ds.createVariable('time', 'f8', ('time',))
+                t[:] = np.arange(4.0)
+                t.units = 'days since 2000-01-01'
+                v = ds.createVariable('v', 'i2', ('time', 'x'))
+                v[:] = np.arange(12).reshape(4, 3)
+                c = ds.createVariable('c', 'f4', ('x',))
+                c[:] = [1, 2, 3]
+            with open(tmp_file, 'rb') as f:
+                buf = f.read()
+        actual = backends.netcdf3.NetCDF3BufferFile(memoryview(buf))
+        self.assertEqual(actual.dimensions, {'time': None, 'x': 3})
+        self.assertEqual(actual._attributes['title'], b'records')
+        self.assertEqual(actual.variables['time']._attributes['units'],
+                         b'days since 2000-01-01')
+        self.assertEqual(actual.variables['v'].dimensions, ('time', 'x'))
+        self.assertArrayEqual(actual.variables['time'].data, np.arange(4.0))
+        self.assertArrayEqual(actual.variables['v'].data,
+                              np.arange(12).reshape(4, 3))
+        self.assertArrayEqual(actual.variables['c'].data, [1, 2, 3])
+
+    def test_invalid(self):
+        with self.assertRaisesRegexp(ValueError, 'NetCDF3'):
+            backends.netcdf3.NetCDF3BufferFile(memoryview(b'HDF\x01'))
+
+
 @requires_netCDF4
 class NetCDF3ViaNetCDF4DataTest(DatasetIOTestCases, TestCase):
     @contextlib.contextmanager
@@ -353,6 +689,128 @@ class NetCDF3ViaNetCDF4DataTest(DatasetIOTestCases, TestCase):
         return roundtrip_data
 
 
+@requires_netCDF4
+class OpenMFDatasetTest(TestCase):
+    def test_open_mfdataset(self):
+        expected = Dataset({'foo': (('time', 'x'), np.random.randn(10, 3)),
+                            'time': ('time', pd.date_range('2000-01-01',
+                                                           periods=10)),
+                            'x': ('x', [10, 20, 30]),
+                            'bar': ('x', [1.0, 2.0, 3.0])})
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            # files are ordered by time, not by name
+            for name, times in [('a', slice(6, 10)), ('b', slice(0, 3)),
+                                ('c', slice(3, 6))]:
+                expected.indexed(time=times).dump(
+                    os.path.join(tmp_dir, name + '.nc'))
+            actual = open_mfdataset(os.path.join(tmp_dir, '*.nc'))
+            self.assertFalse(actual['foo'].variable._in_memory())
+            # encoding is taken from the first file
+            first = open_dataset(os.path.join(tmp_dir, 'b.nc'))
+            for name in ['foo', 'time']:
+                self.assertTrue(actual[name].encoding)
+                self.assertEqual(first[name].encoding,
+                                 actual[name].encoding)
+            self.assertDatasetAllClose(expected, actual)
+            for indexers in [{'time': slice(2, 8)}, {'time': [9, 0, 4]},
+                             {'time': 5, 'x': 1}]:
+                self.assertDatasetAllClose(expected.indexed(**indexers),
+                                           actual.indexed(**indexers))
+
+            paths = [os.path.join(tmp_dir, name + '.nc') for name in 'bc']
+            actual = open_mfdataset(paths, n_workers=1)
+            self.assertDatasetAllClose(expected.indexed(time=slice(6)),
+                                       actual)
+
+            # files are opened one by one without concurrent.futures
+            futures = sys.modules.get('concurrent.futures')
+            sys.modules['concurrent.futures'] = None
+            try:
+                actual = open_mfdataset(paths)
+            finally:
+                if futures is None:
+                    del sys.modules['concurrent.futures']
+                else:
+                    sys.modules['concurrent.futures'] = futures
+            self.assertDatasetAllClose(expected.indexed(time=slice(6)),
+                                       actual)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        with self.assertRaisesRegexp(IOError, 'no files'):
+            open_mfdataset(os.path.join(tmp_dir, '*.nc'))
+
+
+class CountingDataStore(backends.InMemoryDataStore):
+    def __init__(self, variables):
+        self._variables = variables
+        self.attrs = {}
+        self.opened = []
+
+    def open_store_variable(self, var):
+        self.opened.append(var)
+        return var
+
+    @property
+    def store_variables(self):
+        return self._variables
+
+
+class TestLazyStoreVariables(TestCase):
+    def test_open_on_access(self):
+        data = create_test_data()
+        store = CountingDataStore(dict(data.variables))
+        self.assertEqual(len(store.variables), len(data.variables))
+        self.assertIn('var1', store.variables)
+        self.assertEqual(store.opened, [])
+
+        actual = store.variables['var1']
+        self.assertVariableIdentical(data['var1'].variable, actual)
+        store.variables['var1'].attrs['new'] = 'attr'
+        self.assertEqual(len(store.opened), 1)
+        self.assertNotIn('new', store.variables['var1'].attrs)
+        self.assertEqual(len(store.opened), 1)
+
+        # replaced store variables are opened again
+        store.store_variables['var1'] = data['var2'].variable
+        self.assertVariableIdentical(data['var2'].variable,
+                                     store.variables['var1'])
+        self.assertEqual(len(store.opened), 2)
+
+    def test_load_store(self):
+        data = create_test_data()
+        store = CountingDataStore(dict(data.variables))
+        actual = Dataset.load_store(store)
+        self.assertDatasetIdentical(data, actual)
+        self.assertEqual(len(store.opened), len(data.variables))
+
+    def test_load_store_projection(self):
+        data = create_test_data()
+        store = CountingDataStore(dict(data.variables))
+        actual = Dataset.load_store(store, variables='var1')
+        expected = data.select('var1')
+        self.assertDatasetIdentical(expected, actual)
+        self.assertEqual(len(store.opened), len(actual.variables))
+
+        store = CountingDataStore(dict(data.variables))
+        actual = Dataset.load_store(store, drop_variables=['var1', 'var2'])
+        self.assertDatasetIdentical(data.unselect('var1', 'var2'), actual)
+        self.assertEqual(len(store.opened), len(actual.variables))
+
+        with self.assertRaisesRegexp(ValueError, 'not found'):
+            Dataset.load_store(store, variables=['foo'])
+
+    @requires_netCDF4
+    def test_open_dataset_projection(self):
+        data = create_test_data()
+        with create_tmp_file() as tmp_file:
+            data.dump(tmp_file)
+            actual = open_dataset(tmp_file, variables=['var2', 'var3'],
+                                  drop_variables='var3')
+        self.assertDatasetAllClose(data.select('var2'), actual)
+
+
 @requires_netCDF4
 @requires_pydap
 class PydapTest(TestCase):
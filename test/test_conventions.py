@@ -1,8 +1,9 @@
 import numpy as np
 import pandas as pd
 import warnings
+from datetime import datetime
 
-from xray import conventions
+from xray import conventions, Variable
 from . import TestCase, requires_netCDF4
 
 
@@ -26,6 +27,33 @@ class TestMaskedAndScaledArray(TestCase):
         expected = np.array([np.nan, 0.99, 1, 1.01, 1.02])
         self.assertArrayEqual(expected, x)
 
+    def test_dtype(self):
+        packed = np.array([-1, 0, 1, 2], dtype=np.int16)
+        x = conventions.MaskedAndScaledArray(packed, -1, np.float32(0.5),
+                                             np.float32(10))
+        self.assertEqual(x.dtype, np.float64)
+        self.assertEqual(x[:].dtype, np.float64)
+
+        x = conventions.MaskedAndScaledArray(packed, -1, np.float32(0.5),
+                                             np.float32(10), dtype='auto')
+        self.assertEqual(x.dtype, np.float32)
+        self.assertEqual(x[:].dtype, np.float32)
+        self.assertArrayEqual([np.nan, 10, 10.5, 11], x)
+
+        for array, scale_factor, add_offset in [
+                (packed, 0.5, np.float32(10)),
+                (packed, None, None),
+                (packed.astype(np.int32), np.float32(0.5), None),
+                (packed.astype(np.float32), np.float32(0.5), None)]:
+            x = conventions.MaskedAndScaledArray(array, -1, scale_factor,
+                                                 add_offset, dtype='auto')
+            self.assertEqual(x.dtype, np.float64)
+            self.assertEqual(x[:].dtype, np.float64)
+
+        x = conventions.MaskedAndScaledArray(packed, -1, 0.5, dtype='f4')
+        self.assertEqual(x[:].dtype, np.float32)
+        self.assertArrayEqual([np.nan, 0, 0.5, 1], x)
+
     def test_0d(self):
         x = conventions.MaskedAndScaledArray(np.array(0), fill_value=0)
         self.assertTrue(np.isnan(x))
@@ -34,6 +62,16 @@ class TestMaskedAndScaledArray(TestCase):
         x = conventions.MaskedAndScaledArray(np.array(0), fill_value=10)
         self.assertEqual(0, x[...])
 
+        for dtype in [np.float32, np.float64]:
+            x = conventions.mask_and_scale(np.array(-1, dtype=np.int16), -1,
+                                           np.float32(0.5), dtype=dtype)
+            self.assertEqual(x.dtype, dtype)
+            self.assertEqual(x.shape, ())
+            self.assertTrue(np.isnan(x))
+            x = conventions.mask_and_scale(np.array(2, dtype=np.int16), -1,
+                                           np.float32(0.5), dtype=dtype)
+            self.assertEqual(1, x)
+
 
 class TestCharToStringArray(TestCase):
     def test(self):
@@ -65,6 +103,76 @@ class TestCharToStringArray(TestCase):
             actual[:, :2]
 
 
+class TestDecodedCFArray(TestCase):
+    def test_concat_characters(self):
+        array = np.array([list('abc'), list('cdf')], dtype='S')
+        actual = conventions.DecodedCFArray(array, [('concat_characters',)])
+        expected = np.array(['abc', 'cdf'], dtype='S')
+        self.assertEqual(actual.dtype, expected.dtype)
+        self.assertEqual(actual.shape, expected.shape)
+        self.assertArrayEqual(expected, actual)
+        self.assertArrayEqual(expected[1:], actual[1:])
+        with self.assertRaises(IndexError):
+            actual[:, :2]
+
+    def test_steps(self):
+        array = np.array([-1, 0, 24, 48], dtype=np.int16)
+        steps = [('mask_and_scale', -1, np.float32(0.5), np.float32(12),
+                  np.dtype(np.float32))]
+        actual = conventions.DecodedCFArray(array, steps)
+        expected = conventions.MaskedAndScaledArray(array, -1, np.float32(0.5),
+                                                    np.float32(12), 'f4')
+        self.assertEqual(actual.dtype, np.float32)
+        self.assertArrayEqual(expected[:], actual[:])
+
+        steps.append(('decode_times', 'hours since 2000-01-01', None))
+        actual = conventions.DecodedCFArray(array, steps)
+        expected = np.array(['NaT', '2000-01-01T12', '2000-01-02',
+                             '2000-01-02T12'], dtype='M8[ns]')
+        self.assertEqual(actual.dtype, expected.dtype)
+        self.assertEqual(actual.shape, expected.shape)
+        self.assertArrayEqual(expected, actual)
+        self.assertArrayEqual(expected[[1, 3]], actual[[1, 3]])
+
+        with self.assertRaisesRegexp(ValueError, 'unknown decoding step'):
+            conventions.DecodedCFArray(array, [('foo',)])
+
+    def test_decode_cf_variable(self):
+        original = Variable(['x', 'string'],
+                            np.array([list('ab'), list('cd')], dtype='S'))
+        decoded = conventions.decode_cf_variable(original)
+        self.assertEqual(decoded.dimensions, ('x',))
+        self.assertIsInstance(decoded._data.array, conventions.DecodedCFArray)
+        self.assertArrayEqual(decoded, np.array(['ab', 'cd'], dtype='S'))
+
+        original = Variable(['t'], np.array([-1, 0, 1], dtype=np.int16),
+                            {'_FillValue': -1, 'scale_factor': np.float32(2),
+                             'units': 'days since 2000-01-01'})
+        decoded = conventions.decode_cf_variable(original)
+        self.assertEqual(decoded.dtype, np.dtype('M8[ns]'))
+        self.assertArrayEqual(decoded, np.array(['NaT', '2000-01-01',
+                                                 '2000-01-03'],
+                                                dtype='M8[ns]'))
+        self.assertEqual(decoded.encoding['scale_factor'], 2)
+
+        original = Variable(['t'], np.array([-1, 0, 1], dtype=np.int16),
+                            {'_FillValue': -1, 'scale_factor': np.float32(2)})
+        decoded = conventions.decode_cf_variable(original)
+        self.assertEqual(decoded.dtype, np.float64)
+        decoded = conventions.decode_cf_variable(original,
+                                                 mask_and_scale_dtype='auto')
+        self.assertEqual(decoded.dtype, np.float32)
+        decoded = conventions.decode_cf_variable(original,
+                                                 mask_and_scale_dtype='f4')
+        self.assertEqual(decoded.dtype, np.float32)
+        self.assertArrayEqual(decoded, [np.nan, 0, 2])
+
+        original = Variable(['t'], np.arange(3))
+        decoded = conventions.decode_cf_variable(original)
+        self.assertNotIsInstance(decoded._data.array,
+                                 conventions.DecodedCFArray)
+
+
 class TestDatetime(TestCase):
     @requires_netCDF4
     def test_cf_datetime(self):
@@ -237,6 +345,23 @@ class TestDatetime(TestCase):
                 self.assertEqual(actual.dtype, np.dtype('O'))
                 self.assertArrayEqual(actual, expected)
 
+    def test_nctime_to_nptime(self):
+        times = np.array([[datetime(1999, 12, 31, 23, 59, 59)],
+                          [datetime(2000, 2, 29, 6)]])
+        expected = np.array([['1999-12-31T23:59:59'], ['2000-02-29T06']],
+                            dtype='M8[ns]')
+        actual = conventions.nctime_to_nptime(times)
+        self.assertEqual(actual.dtype, np.dtype('M8[ns]'))
+        self.assertArrayEqual(expected, actual)
+        self.assertEqual(conventions.nctime_to_nptime([]).shape, (0,))
+
+    @requires_netCDF4
+    def test_nctime_to_nptime_invalid(self):
+        import netCDF4 as nc4
+        times = nc4.num2date([0, 59], 'days since 2000-01-01', '360_day')
+        with self.assertRaisesRegexp(ValueError, 'out of range'):
+            conventions.nctime_to_nptime(times)
+
     @requires_netCDF4
     def test_cf_datetime_nan(self):
         for num_dates, units, expected_list in [
@@ -252,6 +377,76 @@ class TestDatetime(TestCase):
             expected = np.array(expected_list, dtype='datetime64[ns]')
             self.assertArrayEqual(expected, actual)
 
+    def test_decode_cf_datetime_with_numpy(self):
+        # these do not require netCDF4
+        for num_dates, units, expected in [
+                ([0, 1, 2], 'days since 2000-01-01',
+                 pd.date_range('2000-01-01', periods=3)),
+                (np.array([0, 1.5]), 'hours since 2000-01-01T00:00:00Z',
+                 ['2000-01-01', '2000-01-01T01:30']),
+                ([[0, 60]], 'minutes since 1999-12-31 23:00:00',
+                 [['1999-12-31T23:00', '2000-01-01']]),
+                ([np.nan, 1000], 'ms since 2000-01-01',
+                 ['NaT', '2000-01-01T00:00:01']),
+                (np.float32(1), 'seconds since 2000-01-01',
+                 '2000-01-01T00:00:01')]:
+            actual = conventions.decode_cf_datetime(num_dates, units)
+            self.assertEqual(actual.dtype, np.dtype('M8[ns]'))
+            self.assertArrayEqual(np.array(expected, dtype='M8[ns]'), actual)
+
+        # 30 years of hourly data are decoded exactly
+        hours = np.arange(30 * 365 * 24, dtype=float)
+        actual = conventions.decode_cf_datetime(hours,
+                                                'hours since 1980-01-01')
+        expected = pd.date_range('1980-01-01', periods=hours.size, freq='H')
+        self.assertArrayEqual(expected.values, actual)
+
+        for units, calendar in [('days since 1000-01-01', 'standard'),
+                                ('days since 2000-01-01', 'noleap'),
+                                ('years since 2000-01-01', 'standard')]:
+            self.assertIsNone(conventions._decode_datetime_with_numpy(
+                [0], units, calendar))
+        self.assertIsNone(conventions._decode_datetime_with_numpy(
+            [1e6], 'days since 2000-01-01', 'standard'))
+
+    def test_encode_cf_datetime_with_numpy(self):
+        # these do not require netCDF4
+        times = pd.date_range('1980-01-01', periods=30 * 365 * 24, freq='H')
+        num, units, calendar = conventions.encode_cf_datetime(times)
+        self.assertEqual(units, 'hours since 1980-01-01 00:00:00')
+        self.assertEqual(calendar, 'proleptic_gregorian')
+        self.assertArrayEqual(np.arange(times.size), num)
+        self.assertArrayEqual(
+            times.values, conventions.decode_cf_datetime(num, units, calendar))
+
+        for dates, units, expected in [
+                (np.array(['2000-01-01T06', 'NaT'], dtype='M8[h]'),
+                 'days since 2000-01-01', [0.25, np.nan]),
+                (np.array([['1999-12-31']], dtype='M8[ns]'),
+                 'days since 2000-01-01 12:00', [[-1.5]]),
+                (np.datetime64('2000-01-01T00:01'),
+                 'seconds since 2000-01-01', 60)]:
+            num, _, _ = conventions.encode_cf_datetime(dates, units)
+            self.assertArrayEqual(expected, num)
+            self.assertArrayEqual(
+                dates, conventions.decode_cf_datetime(num, units))
+
+        dates = np.array(['2000-01-01T00:00:00.000000001'], dtype='M8[ns]')
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            conventions.encode_cf_datetime(dates, 'days since 1900-01-01')
+            self.assertEqual(len(w), 1)
+            self.assertIn('round-trip', str(w[0].message))
+
+        for dates, units, calendar in [
+                (times.values, 'hours since 1980-01-01', 'noleap'),
+                (times.values, 'hours since 1000-01-01', 'standard'),
+                (times.to_pydatetime(), 'hours since 1980-01-01', 'standard'),
+                (np.array(['1000-01-01'], dtype='M8[D]'),
+                 'hours since 1980-01-01', 'standard')]:
+            self.assertIsNone(conventions._encode_datetime_with_numpy(
+                dates, units, calendar))
+
     def test_guess_time_units(self):
         for dates, expected in [(pd.date_range('1900-01-01', periods=5),
                                  'days since 1900-01-01 00:00:00'),
@@ -260,5 +455,19 @@ class TestDatetime(TestCase):
                                  'hours since 1900-01-01 12:00:00'),
                                 (['1900-01-01', '1900-01-02',
                                   '1900-01-02 00:00:01'],
-                                 'seconds since 1900-01-01 00:00:00')]:
+                                 'seconds since 1900-01-01 00:00:00'),
+                                (np.array(['NaT', '2000-01-02T06',
+                                           '2000-01-01'], dtype='M8[h]'),
+                                 'hours since 2000-01-02 06:00:00')]:
             self.assertEqual(expected, conventions.guess_time_units(dates))
+
+    def test_infer_time_unit(self):
+        day = 86400 * 10 ** 9
+        for deltas, expected in [([0, 2 * day, -day], 'days'),
+                                 ([day, day // 4], 'hours'),
+                                 ([day // 1440], 'minutes'),
+                                 ([10 ** 9], 'seconds'),
+                                 ([], 'days')]:
+            self.assertEqual(expected, conventions.infer_time_unit(deltas))
+        with self.assertRaisesRegexp(ValueError, 'could not automatically'):
+            conventions.infer_time_unit([day, 1])
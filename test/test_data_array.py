@@ -4,10 +4,10 @@ from copy import deepcopy
 from textwrap import dedent
 from collections import OrderedDict
 
-from xray import Dataset, DataArray, Variable, align
+from xray import Dataset, DataArray, Variable, align, indexing, utils
 from xray.data_array import Indexes
 from xray.pycompat import iteritems
-from . import TestCase, ReturnItem, source_ndarray
+from . import TestCase, ReturnItem, source_ndarray, requires_futures
 
 
 class TestIndexes(TestCase):
@@ -21,6 +21,18 @@ class TestIndexes(TestCase):
                          "Indexes(['a', 'b', 'c'], [0, 1, 2])")
 
 
+class RecordedAccessArray(utils.NDArrayMixin):
+    """Array which records the size of every array loaded from it"""
+    def __init__(self, array):
+        self.array = array
+        self.loaded_sizes = []
+
+    def __getitem__(self, key):
+        result = self.array[key]
+        self.loaded_sizes.append(np.size(result))
+        return result
+
+
 class TestDataArray(TestCase):
     def setUp(self):
         self.attrs = {'attr1': 'value1', 'attr2': 2929}
@@ -310,6 +322,28 @@ class TestDataArray(TestCase):
         with self.assertRaisesRegexp(TypeError, 'datasets do not support'):
             a + a.dataset
 
+    def test_math_reuses_coordinates(self):
+        a = self.dv
+        b = DataArray(np.ones(20), [a.coordinates['y']], name='bar')
+        for actual in [a + 1, -a, np.sin(a), a * a, a + b, b - a]:
+            self.assertItemsEqual(actual.dimensions, ['x', 'y'])
+            for dim in ['x', 'y']:
+                self.assertIs(actual.coordinates[dim], a.coordinates[dim])
+            self.assertDataArrayEqual(actual, actual.dataset[actual.name])
+            self.assertEqual(dict(actual.dataset.dimensions),
+                             {'x': 10, 'y': 20})
+
+        # new dimensions from variables get default coordinates
+        actual = a + Variable('z', np.arange(3))
+        self.assertEqual(actual.dimensions, ('x', 'y', 'z'))
+        self.assertVariableEqual(actual.coordinates['z'],
+                                 Variable('z', np.arange(3)))
+        self.assertEqual(actual.dataset.dimensions['z'], 3)
+
+        # results whose name clashes with a coordinate are still validated
+        with self.assertRaisesRegexp(ValueError, '1-dimensional'):
+            a + Variable('foo', np.arange(3))
+
     def test_dataset_math(self):
         # verify that mathematical operators keep around the expected variables
         # when doing math with dataset arrays from one or more aligned datasets
@@ -482,6 +516,92 @@ class TestDataArray(TestCase):
         self.assertDataArrayAllClose(expected_centered,
                                      grouped.apply(center))
 
+    def test_groupby_views(self):
+        self.dv['abc'] = ('y', np.array(list('abcde') * 4))
+        grouped = self.dv.groupby('abc')
+        self.assertEqual(grouped.group_indices,
+                         [slice(n, 16 + n, 5) for n in range(5)])
+        for _, sub in grouped:
+            self.assertIs(source_ndarray(sub.values), source_ndarray(self.x))
+        for sub in grouped._iter_grouped_shortcut():
+            self.assertIs(source_ndarray(sub.values), source_ndarray(self.x))
+
+    def test_groupby_reduce_vectorized(self):
+        self.x[3, 4] = np.nan
+        self.dv['abc'] = ('y', np.array(list('abcab') * 4))
+        self.dv['int'] = (['x', 'y'], np.arange(200).reshape(10, 20))
+        for name in ['foo', 'int']:
+            grouped = self.dv.dataset[name].groupby('abc')
+            for method in ['sum', 'mean', 'std', 'var', 'min', 'max', 'prod',
+                           'ptp', 'all', 'any']:
+                func = getattr(np, method)
+                for dimension in ['y', ['x', 'y'], None]:
+                    def reduce_array(ar):
+                        return ar.reduce(func, dimension)
+                    expected = grouped.apply(reduce_array, shortcut=True)
+                    actual = grouped.reduce(func, dimension)
+                    self.assertEqual(expected.dtype, actual.dtype)
+                    self.assertDataArrayAllClose(expected, actual)
+                    self.assertDataArrayAllClose(
+                        expected, getattr(grouped, method)(dimension))
+
+        grouped = self.dv.groupby('abc')
+        expected = grouped.apply(lambda ar: ar.reduce(np.var, 'y', ddof=1))
+        self.assertDataArrayAllClose(expected,
+                                     grouped.reduce(np.var, 'y', ddof=1))
+        # reductions which do not include the group dimension still work
+        expected = grouped.apply(lambda ar: ar.reduce(np.sum, 'x'))
+        self.assertDataArrayAllClose(expected, grouped.sum('x'))
+
+    def test_groupby_reduce_streaming(self):
+        self.x[3, 4] = np.nan
+        abc = np.array(list('abcab') * 4)
+        self.dv['abc'] = ('y', abc)
+        expected_grouped = self.dv.groupby('abc')
+        for method in ['sum', 'mean', 'std', 'min', 'ptp']:
+            for dimension in ['y', ['x', 'y']]:
+                array = RecordedAccessArray(self.x)
+                lazy = Variable(['x', 'y'], indexing.LazilyIndexedArray(array))
+                ds = Dataset({'foo': lazy, 'abc': ('y', abc)})
+                grouped = ds['foo'].groupby('abc')
+                actual = getattr(grouped, method)(dimension, chunksize=6)
+                self.assertFalse(lazy._in_memory())
+                self.assertEqual(array.loaded_sizes, [60, 60, 60, 20])
+                expected = getattr(expected_grouped, method)(dimension)
+                self.assertDataArrayAllClose(expected, actual)
+
+        array = RecordedAccessArray(self.x)
+        ds = Dataset({'foo': (['x', 'y'], indexing.LazilyIndexedArray(array)),
+                      'abc': ('y', abc)})
+        grouped = ds['foo'].groupby('abc')
+        actual = grouped.apply(lambda ar: ar.sum())
+        self.assertDataArrayAllClose(expected_grouped.apply(lambda ar: ar.sum()),
+                                     actual)
+        self.assertEqual(array.loaded_sizes, [80, 80, 40])
+
+    @requires_futures
+    def test_groupby_apply_parallel(self):
+        self.dv['abc'] = ('y', np.array(list('abcab') * 4))
+        grouped = self.dv.groupby('abc')
+        center = lambda ar: ar - ar.mean()
+        for shortcut in [False, True]:
+            expected = grouped.apply(center, shortcut=shortcut)
+            for executor in ['thread', 'process']:
+                actual = grouped.apply(center, shortcut=shortcut,
+                                       executor=executor, n_workers=2)
+                self.assertDataArrayIdentical(expected, actual)
+            actual = grouped.apply(center, shortcut=shortcut, n_workers=2)
+            self.assertDataArrayIdentical(expected, actual)
+
+        expected = grouped.apply(center)
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(2) as executor:
+            actual = grouped.apply(center, executor=executor)
+        self.assertDataArrayIdentical(expected, actual)
+
+        with self.assertRaisesRegexp(ValueError, 'executor must be'):
+            grouped.apply(center, executor='foo')
+
     def test_concat(self):
         self.ds['bar'] = Variable(['x', 'y'], np.random.randn(10, 20))
         foo = self.ds['foo'].select()
@@ -12,7 +12,7 @@ import pandas as pd
 from xray import Dataset, DataArray, Variable, backends, utils, align, indexing
 from xray.pycompat import iteritems
 
-from . import TestCase
+from . import TestCase, requires_futures
 
 
 _dims = {'dim1': 100, 'dim2': 50, 'dim3': 10}
@@ -181,6 +181,21 @@ class TestDataset(TestCase):
         self.assertTrue(data.attrs['foobar'], 'baz')
         self.assertIsInstance(data.attrs, OrderedDict)
 
+    def test_iter_chunks(self):
+        data = create_test_data()
+        data['var1'].encoding['chunksizes'] = (30, 50)
+        data['var3'].encoding['chunksizes'] = (10, 20)
+        indexers = []
+        for indexer, block in data.iter_chunks('dim1'):
+            self.assertDatasetIdentical(data.indexed(dim1=indexer), block)
+            indexers.append(indexer)
+        self.assertEqual(indexers, [slice(0, 30), slice(30, 60),
+                                    slice(60, 90), slice(90, 120)])
+        self.assertEqual([slice(0, 8), slice(8, 16)],
+                         [k for k, _ in data.iter_chunks('time', 8)][:2])
+        (indexer, block), = data.iter_chunks('dim2')
+        self.assertDatasetIdentical(data, block)
+
     def test_indexed(self):
         data = create_test_data()
         slicers = {'dim1': slice(None, None, 2), 'dim2': slice(0, 2)}
@@ -329,6 +344,12 @@ class TestDataset(TestCase):
         self.assertVariableEqual(data[_testvar], ret[_testvar])
         self.assertTrue(sorted(_vars.keys())[1] not in ret.variables)
         self.assertRaises(ValueError, data.select, (_testvar, 'not_a_var'))
+        # unknown names raise the same error as indexing the dataset
+        for name in ['not_a_var', (_testvar, 'not_a_var')]:
+            with self.assertRaisesRegexp(ValueError, 'must be a variable'):
+                data[name]
+            with self.assertRaisesRegexp(ValueError, 'must be a variable'):
+                data.select(_testvar, name)
 
     def test_unselect(self):
         data = create_test_data()
@@ -365,6 +386,37 @@ class TestDataset(TestCase):
                 v1 = copied.variables[k]
                 self.assertIsNot(v0, v1)
 
+    def test_trusted_constructor(self):
+        data = create_test_data()
+        data.attrs['foo'] = 'bar'
+        for actual in [data.indexed(dim1=slice(3), dim2=0, time=[1, 3]),
+                       data.indexed(),
+                       data.labeled(dim3=['a', 'c']),
+                       data.reindex(dim1=np.arange(-2, 3)),
+                       data.reindex_like(data.indexed(dim2=slice(5))),
+                       data.rename({'var1': 'foo', 'dim1': 'x'}),
+                       data.select('var1', 'time.dayofyear'),
+                       data.unselect('var2', 'dim3'),
+                       data.copy()]:
+            # the result should be the same as if it was fully validated
+            expected = Dataset(actual.variables, actual.attrs)
+            self.assertDatasetIdentical(expected, actual)
+            self.assertEqual(dict(expected.dimensions),
+                             dict(actual.dimensions))
+            self.assertEqual(list(expected.variables),
+                             list(actual.variables))
+            for k, v in iteritems(expected.variables):
+                self.assertIs(type(v), type(actual.variables[k]))
+            actual.attrs['foo'] = 'baz'
+            self.assertEqual(data.attrs['foo'], 'bar')
+
+        # renaming onto an existing name still validates the result
+        with self.assertRaisesRegexp(ValueError, 'dimension'):
+            data.rename({'dim1': 'dim2'})
+
+        with self.assertRaisesRegexp(ValueError, 'one-dimensional'):
+            data.reindex(dim1=Variable('x', np.arange(3)))
+
     def test_rename(self):
         data = create_test_data()
         newnames = {'var1': 'renamed_var1', 'dim2': 'renamed_dim2'}
@@ -528,6 +580,16 @@ class TestDataset(TestCase):
         with self.assertRaisesRegexp(ValueError, 'length does not match'):
             data.groupby(data['dim1'][:3])
 
+    @requires_futures
+    def test_groupby_apply_parallel(self):
+        data = create_test_data()
+        expected = data.groupby('dim1').apply(lambda ds: ds.mean())
+        for executor in ['thread', 'process']:
+            actual = data.groupby('dim1').apply(lambda ds: ds.mean(),
+                                                executor=executor,
+                                                n_workers=2)
+            self.assertDatasetIdentical(expected, actual)
+
     def test_concat(self):
         data = create_test_data()
 
@@ -662,6 +724,11 @@ class TestDataset(TestCase):
             # these should not raise UnexpectedDataAccess:
             ds.indexed(time=10)
             ds.indexed(time=slice(10), dim1=[0]).indexed(dim1=0, dim2=-1)
+            var1 = ds['var1'].variable
+            Variable.concat([var1[:4], var1[4:]], 'dim1')
+            self.assertTrue(var1.equals(var1.copy(deep=False)))
+            self.assertTrue(var1[:4].equals(var1[:4]))
+            self.assertFalse(var1.equals(var1[:4]))
 
     def test_reduce(self):
         data = create_test_data()
@@ -0,0 +1,154 @@
+import numpy as np
+
+from xray import Variable, DataArray, deferred, indexing
+from . import TestCase, requires_numexpr
+from .test_indexing import RecordedAccessArray
+
+
+def _graph(var):
+    return var._data.array
+
+
+class TestDeferred(TestCase):
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.x = Variable(['a', 'b'], rs.rand(4, 5))
+        self.y = Variable(['b', 'c'], rs.rand(5, 3))
+        self.i = Variable(['a'], np.arange(4))
+
+    def test_arithmetic(self):
+        x, y, i = self.x, self.y, self.i
+        xd, yd, id_ = x.deferred(), y.deferred(), i.deferred()
+        for expected, actual in [(x + 1, xd + 1),
+                                 (1 - x, 1 - xd),
+                                 (-x, -xd),
+                                 (abs(x - 0.5), abs(xd - 0.5)),
+                                 (x * y, xd * y),
+                                 (y * x, y * xd),
+                                 (x / y + x, xd / yd + xd),
+                                 (x > 0.5, xd > 0.5),
+                                 (x ** 2 * x.values, xd ** 2 * x.values),
+                                 (i + 1, id_ + 1),
+                                 (i // 2, id_ // 2),
+                                 (i / 2, id_ / 2),
+                                 (i * np.int8(2), id_ * np.int8(2)),
+                                 ((i * x).astype(int), (id_ * x).astype(int)),
+                                 (x.clip(0.2, 0.8), xd.clip(0.2, 0.8))]:
+            self.assertTrue(deferred.is_deferred(actual._data))
+            self.assertEqual(expected.dimensions, actual.dimensions)
+            self.assertEqual(expected.dtype, actual.dtype)
+            self.assertVariableAllClose(expected, actual)
+
+        # operations which are not element-wise are computed immediately
+        self.assertFalse(deferred.is_deferred(xd.argsort()._data))
+        self.assertVariableEqual(x.argsort(), xd.argsort())
+        self.assertVariableAllClose(x.mean('a'), xd.mean('a'))
+
+    def test_errors(self):
+        xd = self.x.deferred()
+        with self.assertRaisesRegexp(ValueError, 'mismatched lengths'):
+            xd + Variable('a', np.arange(3))
+        with self.assertRaisesRegexp(ValueError, 'duplicate dimensions'):
+            xd + Variable(['c', 'c'], np.ones((2, 2)))
+
+    def test_fused_graph(self):
+        xd = self.x.deferred()
+        actual = (xd - xd.mean('a')) / xd.std('a') * (self.y > 0.5)
+        graph = _graph(actual)
+        self.assertIsInstance(graph, deferred.DeferredArray)
+        # all operations are recorded in a single graph
+        self.assertEqual(graph.node.func.__name__.strip('_'), 'mul')
+        # (division is 'div' on Python 2)
+        self.assertIn(graph.node.args[0].func.__name__.strip('_'),
+                      ['div', 'truediv'])
+        x = self.x
+        expected = (x - x.mean('a')) / x.std('a') * (self.y > 0.5)
+        self.assertVariableAllClose(expected, actual)
+
+    def test_lazy_evaluation(self):
+        array = RecordedAccessArray(np.arange(100.0).reshape(10, 10))
+        v = Variable(['x', 'y'], indexing.LazilyIndexedArray(array))
+        actual = (v.deferred() * 2 + 1)[2:4, [1, 5]]
+        self.assertEqual(array.keys, [])
+        expected = (np.arange(100.0).reshape(10, 10) * 2 + 1)[2:4][:, [1, 5]]
+        self.assertArrayEqual(expected, actual.values)
+        # only the selected values were read
+        self.assertEqual(len(array.keys), 1)
+        self.assertArrayEqual(np.arange(10)[array.keys[0][0]], [2, 3])
+        self.assertArrayEqual(array.keys[0][1], [1, 5])
+
+        v0 = (v.deferred() + 1)[3]
+        self.assertEqual(v0.dimensions, ('y',))
+        self.assertArrayEqual(v0.values, np.arange(30.0, 40.0) + 1)
+
+    def test_values_are_cached(self):
+        xd = self.x.deferred()
+        actual = xd * 2
+        values = actual.values
+        self.assertIs(values, actual.values)
+        self.assertTrue(deferred.is_deferred(actual._data))
+        self.assertTrue(deferred.is_deferred((actual + 1)._data))
+        self.assertArrayEqual(self.x.values * 2 + 1, (actual + 1).values)
+        # deferring in-memory data does not copy it
+        self.assertIs(self.x.values, xd.values)
+
+    def test_inplace_arithmetic(self):
+        expected = self.x.values.copy()
+        xd = self.x.deferred()
+        xd += 1
+        self.assertArrayEqual(expected, self.x.values)
+        self.assertArrayEqual(expected + 1, xd.values)
+        self.assertTrue(deferred.is_deferred(xd._data))
+        xd *= 2
+        self.assertArrayEqual(expected, self.x.values)
+        self.assertArrayEqual((expected + 1) * 2, xd.values)
+
+    def test_evaluate_blocks(self):
+        x, y = self.x, self.y
+        graph = _graph(x.deferred() * y + x)
+        expected = (x * y + x).values
+        for block_size in [1, 2, 7, 15, 60, 1000]:
+            for use_numexpr in [False, None]:
+                actual = graph.evaluate(block_size=block_size,
+                                        use_numexpr=use_numexpr)
+                self.assertArrayEqual(expected, actual)
+        self.assertArrayEqual(expected[1, ::-1][:, [0, 2]],
+                              graph.evaluate((1, slice(None, None, -1),
+                                              [0, 2]), block_size=4))
+
+    def test_block_shape(self):
+        self.assertEqual(deferred._block_shape((10, 20, 30), 100),
+                         (1, 3, 30))
+        self.assertEqual(deferred._block_shape((10, 20, 30), 10 ** 6),
+                         (10, 20, 30))
+        self.assertEqual(deferred._block_shape((10, 20, 30), 10), (1, 1, 10))
+        self.assertEqual(deferred._block_shape((), 10), ())
+
+    @requires_numexpr
+    def test_numexpr(self):
+        x, y = self.x, self.y
+        graph = _graph(abs(-(x.deferred() * y) + x ** 2) <= 0.5)
+        names = {}
+        self.assertIsNotNone(deferred._numexpr_expression(graph.node, names))
+        self.assertEqual(len(names), 4)
+        expected = (abs(-(x * y) + x ** 2) <= 0.5).values
+        self.assertArrayEqual(expected, graph.evaluate(use_numexpr=True))
+
+        # unsupported operations are evaluated with numpy
+        graph = _graph(x.deferred() // y)
+        self.assertIsNone(deferred._numexpr_expression(graph.node, {}))
+        self.assertArrayEqual((x // y).values,
+                              graph.evaluate(use_numexpr=True))
+
+    def test_data_array(self):
+        t = DataArray(np.random.RandomState(0).rand(10, 4, 3),
+                      dimensions=['time', 'y', 'x'], name='t')
+        mask = DataArray(np.arange(12).reshape(4, 3) % 2 == 0,
+                         dimensions=['y', 'x'])
+        td = t.deferred()
+        self.assertTrue(deferred.is_deferred(td.variable._data))
+        actual = (td - td.mean('time')) / td.std('time') * mask
+        self.assertTrue(deferred.is_deferred(actual.variable._data))
+        expected = (t - t.mean('time')) / t.std('time') * mask
+        self.assertDataArrayAllClose(expected, actual)
+        self.assertDataArrayAllClose(expected[:, 0], actual[:, 0])
@@ -0,0 +1,118 @@
+import numpy as np
+
+from xray.groupby import (unique_value_groups, grouped_reduce,
+                          streaming_grouped_reduce)
+from . import TestCase
+
+
+def _as_list(indices):
+    if isinstance(indices, slice):
+        indices = range(*indices.indices(indices.stop))
+    return list(indices)
+
+
+class TestUniqueValueGroups(TestCase):
+    def test(self):
+        values, groups = unique_value_groups(np.array([3, 1, 1, 3, 2, 2]))
+        self.assertArrayEqual(values, [1, 2, 3])
+        self.assertEqual([_as_list(g) for g in groups],
+                         [[1, 2], [4, 5], [0, 3]])
+        # contiguous groups are given by slices
+        self.assertEqual(groups[:2], [slice(1, 3), slice(4, 6)])
+
+    def test_strings(self):
+        values, groups = unique_value_groups(np.array(list('abcab')))
+        self.assertArrayEqual(values, ['a', 'b', 'c'])
+        self.assertEqual([_as_list(g) for g in groups],
+                         [[0, 3], [1, 4], [2]])
+
+    def test_evenly_spaced(self):
+        hours = np.arange(72) % 24
+        values, groups = unique_value_groups(hours)
+        self.assertArrayEqual(values, np.arange(24))
+        self.assertEqual(groups,
+                         [slice(h, 72 - 24 + h + 1, 24) for h in range(24)])
+
+        values, groups = unique_value_groups(np.array([3, 1, 1, 3, 2, 2]))
+        self.assertEqual(groups[2], slice(0, 4, 3))
+
+        values, groups = unique_value_groups(np.array([0, 1, 0, 0]))
+        self.assertEqual([_as_list(g) for g in groups], [[0, 2, 3], [1]])
+        self.assertIsInstance(groups[0], np.ndarray)
+        self.assertEqual(groups[1], slice(1, 2))
+
+    def test_empty(self):
+        values, groups = unique_value_groups(np.array([], dtype=int))
+        self.assertEqual(values.size, 0)
+        self.assertEqual(groups, [])
+
+
+class TestGroupedReduce(TestCase):
+    def test(self):
+        values = np.random.RandomState(0).randn(6, 3)
+        codes = np.array([2, 0, 0, 2, 1, 1])
+        for name in ['sum', 'prod', 'mean', 'std', 'var', 'min', 'max',
+                     'ptp', 'all', 'any']:
+            expected = np.array([getattr(np, name)(values[codes == g], axis=0)
+                                 for g in range(3)])
+            actual = grouped_reduce(values, codes, 3, name)
+            self.assertEqual(expected.dtype, actual.dtype)
+            self.assertTrue(np.allclose(expected, actual), name)
+
+            actual = grouped_reduce(values.T, codes, 3, name, axis=-1)
+            self.assertTrue(np.allclose(expected.T, actual), name)
+
+        expected = np.array([np.var(values[codes == g], axis=0, ddof=1)
+                             for g in range(3)])
+        self.assertTrue(np.allclose(
+            expected, grouped_reduce(values, codes, 3, 'var', ddof=1)))
+        self.assertArrayEqual(grouped_reduce(values, codes, 3, 'count'),
+                              2 * np.ones((3, 3)))
+
+    def test_sorted_codes(self):
+        values = np.arange(12.0).reshape(6, 2)
+        codes = np.array([0, 0, 0, 1, 2, 2])
+        expected = np.array([[2, 3], [6, 7], [9, 10]])
+        self.assertArrayEqual(expected,
+                              grouped_reduce(values, codes, 3, 'mean'))
+
+    def test_invalid(self):
+        with self.assertRaisesRegexp(ValueError, 'not supported'):
+            grouped_reduce(np.arange(3), np.arange(3), 3, 'argmax')
+
+
+class TestStreamingGroupedReduce(TestCase):
+    def test(self):
+        values = np.random.RandomState(0).randn(3, 10)
+        values[1, 2] = np.nan
+        codes = np.array([2, 0, 0, 2, 1, 1, 0, 0, 0, 2])
+        for name in ['sum', 'prod', 'mean', 'std', 'var', 'min', 'max',
+                     'ptp', 'all', 'any']:
+            expected = grouped_reduce(values, codes, 3, name, axis=1)
+            for chunksize in [1, 3, 10]:
+                chunks = [(values[:, n:n + chunksize], codes[n:n + chunksize])
+                          for n in range(0, 10, chunksize)]
+                actual = streaming_grouped_reduce(chunks, 3, name, axis=1)
+                self.assertEqual(expected.dtype, actual.dtype)
+                np.testing.assert_allclose(expected, actual, err_msg=name)
+
+        chunks = [(values[:, :4], codes[:4]), (values[:, 4:], codes[4:])]
+        np.testing.assert_allclose(
+            grouped_reduce(values, codes, 3, 'var', axis=1, ddof=1),
+            streaming_grouped_reduce(chunks, 3, 'var', axis=1, ddof=1))
+
+    def test_integers(self):
+        values = np.arange(10)
+        codes = np.array([0, 1] * 5)
+        chunks = [(values[:5], codes[:5]), (values[5:], codes[5:])]
+        for name in ['sum', 'mean', 'max']:
+            expected = grouped_reduce(values, codes, 2, name)
+            actual = streaming_grouped_reduce(chunks, 2, name)
+            self.assertEqual(expected.dtype, actual.dtype)
+            self.assertArrayEqual(expected, actual)
+
+    def test_missing_group(self):
+        with self.assertRaisesRegexp(ValueError, 'every group'):
+            streaming_grouped_reduce([(np.arange(3), np.arange(3))], 4, 'sum')
+        with self.assertRaisesRegexp(ValueError, 'not supported'):
+            streaming_grouped_reduce([], 1, 'median')
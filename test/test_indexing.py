@@ -1,9 +1,19 @@
 import numpy as np
 
-from xray import indexing, variable, Dataset, Variable, Coordinate
+from xray import indexing, utils, variable, Dataset, Variable, Coordinate
 from . import TestCase, ReturnItem
 
 
+class RecordedAccessArray(utils.NDArrayMixin):
+    def __init__(self, array):
+        self.array = array
+        self.keys = []
+
+    def __getitem__(self, key):
+        self.keys.append(key)
+        return self.array[key]
+
+
 class TestIndexers(TestCase):
     def set_to_zero(self, x, i):
         x = x.copy()
@@ -94,6 +104,49 @@ class TestLazyArray(TestCase):
                 actual = x[new_slice]
                 self.assertArrayEqual(expected, actual)
 
+        # slices are composed arithmetically, so huge dimensions are fine
+        self.assertEqual(slice(10 ** 12 + 2, 10 ** 12 + 8, 2),
+                         indexing.slice_slice(I[10 ** 12:], I[2:8:2],
+                                              size=10 ** 13))
+
+    def test_slice_array(self):
+        I = ReturnItem()
+        x = np.arange(100)
+        slices = [I[:3], I[2:4], I[:-1], I[5:-1], I[::-1], I[5::-1],
+                  I[:30:-1], I[::4], I[:4:-4]]
+        for i in slices:
+            n = x[i].size
+            for j in [0, n - 1, -1, -n, np.arange(n), np.arange(n)[::-2],
+                      np.array([0, -1, 0]), np.array([], dtype=int)]:
+                expected = x[i][j]
+                actual = indexing.slice_array(i, j, size=100)
+                self.assertArrayEqual(expected, actual)
+                self.assertArrayEqual(expected, x[actual])
+            for j in [n, -n - 1, np.array([0, n])]:
+                with self.assertRaises(IndexError):
+                    indexing.slice_array(i, j, size=100)
+
+    def test_bounding_slice_indexer(self):
+        key = (0, slice(None), np.array([3, 5, 4]), np.array([2, 3]),
+               np.array([0, 100]))
+        new_key, local_key = indexing._bounding_slice_indexer(key)
+        self.assertEqual(new_key[:2], key[:2])
+        self.assertEqual(new_key[2:4], (slice(3, 6), slice(2, 4)))
+        self.assertArrayEqual(new_key[4], key[4])
+        self.assertEqual(local_key[0], slice(None))
+        self.assertArrayEqual(local_key[1], [0, 2, 1])
+        self.assertEqual(local_key[2:4], (slice(None), slice(None)))
+
+        key = (slice(None), np.array([0, 100]))
+        self.assertEqual(indexing._bounding_slice_indexer(key), (key, None))
+
+    def test_lazily_indexed_array_reads_slices(self):
+        x = RecordedAccessArray(np.random.rand(10, 20))
+        lazy = indexing.LazilyIndexedArray(x)
+        actual = lazy[[7, 5, 6], 1:][:, [0, 2, 1]]
+        self.assertArrayEqual(x.array[[7, 5, 6]][:, [1, 3, 2]], actual)
+        self.assertEqual(x.keys, [(slice(5, 8), slice(1, 4))])
+
     def test_lazily_indexed_array(self):
         x = variable.NumpyArrayAdapter(np.random.rand(10, 20, 30))
         lazy = indexing.LazilyIndexedArray(x)
@@ -117,3 +170,61 @@ class TestLazyArray(TestCase):
             actual = lazy[i][j]
             self.assertEqual(expected.shape, actual.shape)
             self.assertArrayEqual(expected, actual)
+
+    def test_lazily_concatenated_array(self):
+        x = variable.NumpyArrayAdapter(np.random.rand(10, 20, 30))
+        for axis in [0, 1, 2]:
+            splits = [0, 3, 4, 4, x.shape[axis]]
+            arrays = [indexing.LazilyIndexedArray(variable.NumpyArrayAdapter(
+                np.take(x.array, np.arange(start, stop), axis=axis)))
+                for start, stop in zip(splits[:-1], splits[1:])]
+            concatenated = indexing.LazilyConcatenatedArray(arrays, axis)
+            self.assertEqual(concatenated.shape, x.shape)
+            self.assertEqual(concatenated.dtype, x.dtype)
+            lazy = indexing.LazilyIndexedArray(concatenated)
+            I = ReturnItem()
+            indexers = [I[:], 0, -2, I[2:5], I[::-3], [3, 0, 3, 9],
+                        np.arange(10) < 5, np.array([], dtype=int)]
+            for i in indexers:
+                for j in indexers:
+                    expected = np.asarray(x[i, j, 1:])
+                    actual = lazy[i, j, 1:]
+                    self.assertEqual(expected.shape, actual.shape)
+                    self.assertArrayEqual(expected, actual)
+
+    def test_lazily_concatenated_array_new_axis(self):
+        x = np.random.rand(4, 3)
+        arrays = [variable.NumpyArrayAdapter(x[0]),
+                  variable.NumpyArrayAdapter(x[1:3]),
+                  variable.NumpyArrayAdapter(x[3])]
+        concatenated = indexing.LazilyConcatenatedArray(arrays)
+        self.assertEqual(concatenated.shape, x.shape)
+        for key in [0, 3, slice(None), [3, 0, 1], slice(None, None, -1),
+                    np.array([], dtype=int)]:
+            self.assertArrayEqual(x[key], concatenated[key])
+            self.assertArrayEqual(x[key, 1], concatenated[key, 1])
+
+        concatenated = indexing.LazilyConcatenatedArray(
+            arrays, indexers=[[2], [0, 3], [1]])
+        expected = x[[1, 3, 0, 2]]
+        for key in [0, 3, slice(None), [3, 0, 1], slice(None, None, -1)]:
+            self.assertArrayEqual(expected[key], concatenated[key])
+
+        with self.assertRaisesRegexp(ValueError, 'does not match'):
+            indexing.LazilyConcatenatedArray(arrays, indexers=[[2], [0], [1]])
+        with self.assertRaisesRegexp(ValueError, 'cover'):
+            indexing.LazilyConcatenatedArray(arrays,
+                                             indexers=[[2], [0, 2], [1]])
+
+    def test_lazily_concatenated_array_reads_overlap(self):
+        x = np.arange(20).reshape(10, 2)
+        arrays = [RecordedAccessArray(x[:4]), RecordedAccessArray(x[4:])]
+        concatenated = indexing.LazilyConcatenatedArray(arrays)
+        self.assertArrayEqual(x[5:8], concatenated[5:8])
+        self.assertEqual(arrays[0].keys, [])
+        self.assertEqual(arrays[1].keys, [(slice(1, 4), slice(None))])
+
+        with self.assertRaisesRegexp(ValueError, 'same shape'):
+            indexing.LazilyConcatenatedArray([x, x.T])
+        with self.assertRaises(IndexError):
+            concatenated[10]
@@ -8,7 +8,9 @@ import pandas as pd
 
 from xray import Variable, Dataset, DataArray, indexing
 from xray.variable import (Coordinate, as_variable, NumpyArrayAdapter,
-                           PandasIndexAdapter, _as_compatible_data)
+                           PandasIndexAdapter, _as_compatible_data,
+                           _content_digest, _EqualityChecker,
+                           _blocked_reduce)
 from xray.pycompat import PY3
 
 from . import TestCase, source_ndarray
@@ -359,6 +361,79 @@ class TestVariable(TestCase, VariableSubclassTestCases):
         self.assertFalse(v1.identical(None))
         self.assertFalse(v1.identical(d))
 
+    def test_content_digest(self):
+        x = np.array([0.0, np.nan, 1.0])
+        y = np.array([-0.0, -np.nan, 1.0])
+        self.assertEqual(_content_digest(x), _content_digest(y))
+        self.assertNotEqual(_content_digest(x), _content_digest(x[::-1]))
+        self.assertEqual(_content_digest(np.arange(6).reshape(2, 3).T),
+                         _content_digest(np.array([0, 3, 1, 4, 2, 5])))
+        times = pd.date_range('2000-01-01', periods=3).values
+        self.assertIsNotNone(_content_digest(times))
+        self.assertIsNone(_content_digest(np.array(['a', 'b'], dtype=object)))
+
+    def test_equality_checker(self):
+        class CountingChecker(_EqualityChecker):
+            def __init__(self):
+                super(CountingChecker, self).__init__()
+                self.hashed = []
+
+            def _digest(self, var):
+                if id(var) not in self._digests:
+                    self.hashed.append(var)
+                return super(CountingChecker, self)._digest(var)
+
+        d = np.random.rand(10, 3)
+        d[0, 0] = np.nan
+        v1 = Variable(('x', 'y'), d, {'foo': 'bar'})
+        v2 = Variable(('x', 'y'), d.copy())
+        v3 = Variable(('x', 'y'), d + 1)
+
+        checker = CountingChecker()
+        self.assertTrue(checker.equals(v1, v1))
+        self.assertTrue(checker.equals(v1, v1.copy(deep=False)))
+        self.assertFalse(checker.equals(v1, v1[:5]))
+        self.assertFalse(checker.equals(v1, v1.T))
+        self.assertEqual(checker.hashed, [])
+
+        for other in [v2, v3, v2, v3]:
+            self.assertEqual(v1.equals(other), checker.equals(v1, other))
+        self.assertEqual(len(checker.hashed), 3)
+
+        ints = Variable('x', np.arange(3))
+        self.assertTrue(checker.equals(ints, Variable('x', [0.0, 1.0, 2.0])))
+        self.assertFalse(checker.identical(v1, v2))
+        self.assertTrue(checker.identical(v1, DataArray(v1)))
+        self.assertFalse(checker.equals(v1, None))
+
+        strings = Variable('x', np.array(['a', 'b'], dtype=object))
+        self.assertTrue(checker.equals(strings, strings.copy()))
+
+    def test_equality_checker_skips_full_comparisons(self):
+        compared = []
+        original_equals = Variable.equals
+
+        def counting_equals(self, other):
+            compared.append(self)
+            return original_equals(self, other)
+
+        v1 = Variable(('x', 'y'), np.random.rand(10, 3))
+        v2 = Variable(('x', 'y'), v1.values.copy())
+        strings = Variable('x', np.array(['a', 'b'], dtype=object))
+        Variable.equals = counting_equals
+        try:
+            self.assertTrue(_EqualityChecker().equals(v1, v2))
+            self.assertEqual(compared, [])
+            # values are only compared in full on request
+            self.assertTrue(_EqualityChecker(verify=True).equals(v1, v2))
+            self.assertEqual(compared, [v1])
+            # or if they cannot be hashed
+            self.assertTrue(_EqualityChecker().equals(strings,
+                                                      strings.copy()))
+            self.assertEqual(compared, [v1, strings])
+        finally:
+            Variable.equals = original_equals
+
     def test_as_variable(self):
         data = np.arange(10)
         expected = Variable('x', data)
@@ -436,6 +511,118 @@ class TestVariable(TestCase, VariableSubclassTestCases):
         with self.assertRaisesRegexp(ValueError, 'do not exist'):
             v.indexed(not_a_dim=0)
 
+    def test_iter_chunks(self):
+        v = Variable(['x', 'y'], np.arange(35).reshape(5, 7))
+        v.encoding['chunksizes'] = (2, 4)
+        keys = [key for key, _ in v.iter_chunks()]
+        self.assertEqual(keys, [(slice(0, 2), slice(0, 4)),
+                                (slice(0, 2), slice(4, 8)),
+                                (slice(2, 4), slice(0, 4)),
+                                (slice(2, 4), slice(4, 8)),
+                                (slice(4, 6), slice(0, 4)),
+                                (slice(4, 6), slice(4, 8))])
+        for key, block in v.iter_chunks():
+            self.assertVariableIdentical(v[key], block)
+
+        self.assertEqual([(slice(0, 5), slice(0, 3)),
+                          (slice(0, 5), slice(3, 6)),
+                          (slice(0, 5), slice(6, 9))],
+                         [key for key, _ in v.iter_chunks({'y': 3})])
+        del v.encoding['chunksizes']
+        (key, block), = v.iter_chunks()
+        self.assertVariableIdentical(v, block)
+        with self.assertRaisesRegexp(ValueError, 'one item for each'):
+            list(v.iter_chunks([1]))
+
+    def test_concat_lazy(self):
+        def lazy(var):
+            return Variable(var.dimensions, indexing.LazilyIndexedArray(
+                NumpyArrayAdapter(var.values)), var.attrs)
+
+        v = Variable(['time', 'x'], np.random.random((10, 8)), {'foo': 'bar'})
+        encoded = lazy(v)
+        encoded.encoding = {'dtype': np.dtype('int16'), 'scale_factor': 0.1}
+        actual = Variable.concat([encoded[:5], encoded[5:]], 'time')
+        self.assertFalse(actual._in_memory())
+        self.assertEqual(encoded.encoding, actual.encoding)
+        # generators are accepted on the lazy and the eager paths
+        actual = Variable.concat((lazy(p) for p in [v[:5], v[5:]]), 'time')
+        self.assertFalse(actual._in_memory())
+        self.assertVariableIdentical(v, actual)
+        self.assertVariableIdentical(
+            v, Variable.concat((p for p in [v[:5], v[5:]]), 'time'))
+
+        for pieces, dim in [([v[:5], v[5:]], 'time'),
+                            ([v[:5], v[5], v[6:]], 'time'),
+                            ([v[:, :5], v[:, 5:]], 'x')]:
+            actual = Variable.concat([lazy(p) for p in pieces], dim)
+            self.assertFalse(actual._in_memory())
+            self.assertVariableIdentical(v, actual)
+            self.assertVariableIdentical(v[2:7, [0, 3]], actual[2:7, [0, 3]])
+
+        x = Variable(['a'], np.arange(5))
+        y = Variable(['a'], np.ones(5))
+        actual = Variable.concat([lazy(x), y], 'b')
+        self.assertFalse(actual._in_memory())
+        self.assertVariableIdentical(Variable.concat([x, y], 'b'), actual)
+
+        indexers = [[0, 2, 4, 6, 8], [1, 3, 5, 7, 9]]
+        actual = Variable.concat([lazy(x), lazy(y)], 'a', indexers=indexers)
+        self.assertFalse(actual._in_memory())
+        self.assertVariableIdentical(
+            Variable.concat([x, y], 'a', indexers=indexers), actual)
+
+        # variables that would need to be transposed are loaded
+        actual = Variable.concat([lazy(v[:, :5]), lazy(v[:, 5:].T)], 'x')
+        self.assertTrue(actual._in_memory())
+        self.assertVariableIdentical(v, actual)
+
+    def test_blocked_reduce(self):
+        rs = np.random.RandomState(0)
+        values = rs.randn(7, 4, 3)
+        values[2, 1, 0] = np.nan
+        ints = rs.randint(10, size=(7, 4, 3))
+
+        def lazy(values):
+            return Variable(['x', 'y', 'z'], indexing.LazilyIndexedArray(
+                NumpyArrayAdapter(values)))
+
+        for data in [values, ints, values > 0]:
+            v = lazy(data)
+            for name in ['all', 'any', 'argmax', 'argmin', 'max', 'mean',
+                         'min', 'prod', 'ptp', 'std', 'sum', 'var']:
+                func = getattr(np, name)
+                if data.dtype == bool and name in ['ptp', 'std', 'var']:
+                    continue
+                for axis in [None, 0, 1, -1, (0, 2), (1, 2)]:
+                    if name.startswith('arg') and isinstance(axis, tuple):
+                        continue
+                    with np.errstate(invalid='ignore'):
+                        expected = func(data, axis=axis)
+                    for chunksize in [1, 3, 7]:
+                        with np.errstate(invalid='ignore'):
+                            actual = _blocked_reduce(v, func, axis, chunksize)
+                        self.assertEqual(np.asarray(expected).dtype,
+                                         actual.dtype)
+                        np.testing.assert_allclose(expected, actual,
+                                                   err_msg=name)
+
+        v = lazy(values)
+        np.testing.assert_allclose(
+            np.var(values, axis=0, ddof=1),
+            _blocked_reduce(v, np.var, 0, chunksize=2, ddof=1))
+        self.assertIsNone(_blocked_reduce(v, np.median, 0))
+        self.assertIsNone(_blocked_reduce(v, np.argmin, (0, 1)))
+        self.assertIsNone(_blocked_reduce(v, np.sum, 0, dtype=int))
+
+        # reducing doesn't load the data into memory
+        actual = v.reduce(np.mean, 'y')
+        self.assertFalse(v._in_memory())
+        self.assertVariableAllClose(Variable(['x', 'z'], values.mean(1)),
+                                    actual)
+        self.assertVariableAllClose(Variable([], np.argmax(ints)),
+                                    lazy(ints).argmax())
+
     def test_index_0d_numpy_string(self):
         # regression test to verify our work around for indexing 0d strings
         v = Variable([], np.string_('asdf'))
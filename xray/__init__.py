@@ -1,5 +1,5 @@
 from .variable import Variable, Coordinate
-from .dataset import Dataset, open_dataset
+from .dataset import Dataset, open_dataset, open_mfdataset
 from .data_array import DataArray, align
 
 from .version import version as __version__
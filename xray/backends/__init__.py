@@ -5,5 +5,6 @@ formats. They should not be used directly, but rather through Dataset objects.
 """
 from .memory import InMemoryDataStore
 from .netCDF4_ import NetCDF4DataStore
+from .netcdf3 import NetCDF3DataStore
 from .pydap_ import PydapDataStore
 from .scipy_ import ScipyDataStore
@@ -1,4 +1,5 @@
-from xray.utils import FrozenOrderedDict
+from collections import Mapping
+
 from xray.pycompat import iteritems
 
 
@@ -17,6 +18,42 @@ def _decode_variable_name(name):
     return name
 
 
+class LazyStoreVariables(Mapping):
+    """Read-only mapping from variable names to the variables of a store.
+
+    Variables are only opened (with `open_store_variable`) when they are
+    first accessed, and are then memoized, so accessing a few variables of a
+    store with many variables is cheap. A cached variable is opened again if
+    the underlying store variable is replaced. Each access returns a shallow
+    copy, so changes to the attributes of returned variables do not affect
+    the cache.
+    """
+    def __init__(self, store):
+        self.store = store
+        self._cache = {}
+
+    def __getitem__(self, key):
+        store_var = self.store.store_variables[_encode_variable_name(key)]
+        cached = self._cache.get(key)
+        if cached is None or cached[0] is not store_var:
+            cached = (store_var, self.store.open_store_variable(store_var))
+            self._cache[key] = cached
+        return cached[1].copy(deep=False)
+
+    def __iter__(self):
+        for k in self.store.store_variables:
+            yield _decode_variable_name(k)
+
+    def __len__(self):
+        return len(self.store.store_variables)
+
+    def __contains__(self, key):
+        return _encode_variable_name(key) in self.store.store_variables
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, list(self))
+
+
 class AbstractDataStore(object):
     def open_store_variable(self, v):
         raise NotImplementedError
@@ -27,9 +64,13 @@ class AbstractDataStore(object):
 
     @property
     def variables(self):
-        return FrozenOrderedDict((_decode_variable_name(k),
-                                  self.open_store_variable(v))
-                                 for k, v in iteritems(self.store_variables))
+        variables = getattr(self, '_lazy_variables', None)
+        if variables is None:
+            variables = self._lazy_variables = LazyStoreVariables(self)
+        return variables
+
+    def _invalidate_variables(self):
+        self._lazy_variables = None
 
     def sync(self):
         pass
@@ -50,10 +91,12 @@ class AbstractWritableDataStore(AbstractDataStore):
             self.set_dimension(d, l)
 
     def set_attributes(self, attributes):
+        self._invalidate_variables()
         for k, v in iteritems(attributes):
             self.set_attribute(k, v)
 
     def set_variables(self, variables):
+        self._invalidate_variables()
         for vn, v in iteritems(variables):
             self.set_variable(_encode_variable_name(vn), v)
 
@@ -1,4 +1,5 @@
 from collections import OrderedDict
+import itertools
 import warnings
 
 import numpy as np
@@ -9,7 +10,7 @@ import xray
 from xray.conventions import encode_cf_variable
 from xray.utils import FrozenOrderedDict, NDArrayMixin
 from xray import indexing
-from xray.pycompat import iteritems, basestring
+from xray.pycompat import iteritems, basestring, xrange
 
 
 class NetCDF4ArrayWrapper(NDArrayMixin):
@@ -26,6 +27,12 @@ class NetCDF4ArrayWrapper(NDArrayMixin):
             dtype = np.dtype('O')
         return dtype
 
+    def _chunksizes(self):
+        chunking = self.array.chunking()
+        if chunking is None or chunking == 'contiguous':
+            return (1,) * self.ndim
+        return tuple(chunking)
+
     def __getitem__(self, key):
         if self.ndim == 0:
             # work around for netCDF4-python's broken handling of 0-d
@@ -33,10 +40,103 @@ class NetCDF4ArrayWrapper(NDArrayMixin):
             # https://github.com/Unidata/netcdf4-python/pull/220
             data = np.asscalar(self.array[key])
         else:
-            data = self.array[key]
+            key = indexing.canonicalize_indexer(key, self.ndim)
+            if any(isinstance(k, np.ndarray) for k in key):
+                data = _planned_read(self.array, key, self._chunksizes(),
+                                     self.dtype)
+            else:
+                data = self.array[key]
         return data
 
 
+def _coalesce_indices(indices, chunksize=1):
+    """Given a sorted array of unique indices, split it into runs which can
+    each be read with one slice.
+
+    A new run starts wherever the next index is neither adjacent to the
+    previous index nor in the same chunk (of size `chunksize`), so reads line
+    up with the chunks of the variable. Returns a list of `(lo, hi)` tuples,
+    where `indices[lo:hi]` are the indices in each run.
+    """
+    breaks = ((indices[1:] != indices[:-1] + 1)
+              & (indices[1:] // chunksize != indices[:-1] // chunksize))
+    bounds = np.concatenate([[0], np.nonzero(breaks)[0] + 1, [indices.size]])
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# maximum number of separate reads made by _planned_read; scattered indices
+# along several axes could otherwise require a read for every combination of
+# runs
+MAX_PLANNED_READS = 256
+
+
+def _planned_read(array, key, chunksizes, dtype):
+    """Read an orthogonal indexer including integer arrays from a
+    netCDF4.Variable with one contiguous slice per run of nearby indices,
+    instead of letting netCDF4 read each index separately.
+
+    The requested indices along each axis are sorted, deduplicated and
+    coalesced into runs aligned to the variable's chunks. The results of
+    reading each run are then scattered into place in the requested order.
+    One read is needed for every combination of runs along the indexed axes;
+    if that would be more than `MAX_PLANNED_READS`, the key is passed on to
+    netCDF4 in a single orthogonal read instead.
+    """
+    shape = []
+    read_axes = []
+    plans = []
+    for n, (k, size, chunksize) in enumerate(zip(key, array.shape,
+                                                 chunksizes)):
+        if isinstance(k, np.ndarray):
+            k = np.where(k < 0, k + size, k)
+            if k.size and (k.min() < 0 or k.max() >= size):
+                raise IndexError('index out of bounds for axis %s with size %s'
+                                 % (n, size))
+            unique, inverse = np.unique(k, return_inverse=True)
+            read_axes.append(n)
+            plans.append((unique, inverse, _coalesce_indices(unique,
+                                                             chunksize)))
+            shape.append(unique.size)
+        elif isinstance(k, slice):
+            shape.append(len(xrange(*k.indices(size))))
+
+    num_reads = 1
+    for plan in plans:
+        num_reads *= len(plan[2])
+    if num_reads > MAX_PLANNED_READS:
+        return np.asarray(array[key])
+
+    data = np.empty(shape, dtype=dtype)
+    # position of each axis of the variable in the result
+    result_axis = dict((n, i) for i, n in enumerate(
+        n for n, k in enumerate(key) if not isinstance(k, (int, np.integer))))
+
+    if data.size:
+        for runs in itertools.product(*[plan[2] for plan in plans]):
+            read_key = list(key)
+            local_key = [slice(None)] * data.ndim
+            result_key = [slice(None)] * data.ndim
+            for n, (unique, _, _), (lo, hi) in zip(read_axes, plans, runs):
+                start = unique[lo]
+                read_key[n] = slice(start, unique[hi - 1] + 1)
+                local_key[result_axis[n]] = unique[lo:hi] - start
+                result_key[result_axis[n]] = slice(lo, hi)
+            block = np.asarray(array[tuple(read_key)])
+            block = block[indexing.orthogonal_indexer(tuple(local_key),
+                                                      block.shape)]
+            data[tuple(result_key)] = block
+
+    # restore the requested order (including any repeated indices)
+    order_key = [slice(None)] * data.ndim
+    for n, (unique, inverse, _) in zip(read_axes, plans):
+        if unique.size != inverse.size or (np.diff(inverse) != 1).any():
+            order_key[result_axis[n]] = inverse
+    if any(isinstance(k, np.ndarray) for k in order_key):
+        data = data[indexing.orthogonal_indexer(tuple(order_key),
+                                                data.shape)]
+    return data
+
+
 def _version_check(actual, required):
     actual_tup = tuple(int(p) if p.isdigit() else p for p in actual.split('.'))
     try:
@@ -85,9 +185,16 @@ class NetCDF4DataStore(AbstractWritableDataStore):
     """Store for reading and writing data via the Python-NetCDF4 library.
 
     This store supports NetCDF3, NetCDF4 and OpenDAP datasets.
+
+    The HDF5 chunk cache of each variable can be tuned with the `chunk_cache`
+    argument, either as a tuple `(size, nelems, preemption)` (see
+    `netCDF4.Variable.set_var_chunk_cache`) to use for every variable, or as
+    a dictionary mapping variable names to such tuples. Items given as None
+    keep the library default.
     """
     def __init__(self, filename, mode='r', clobber=True, diskless=False,
-                 persist=False, format='NETCDF4', group=None):
+                 persist=False, format='NETCDF4', group=None,
+                 chunk_cache=None):
         import netCDF4 as nc4
         if not _version_check(nc4.__version__, (1, 0, 6)):
             warnings.warn('python-netCDF4 %s detected; '
@@ -100,9 +207,19 @@ class NetCDF4DataStore(AbstractWritableDataStore):
         # support use of groups
         self.ds = _nc4_group(ds, group)
         self.format = format
+        self.chunk_cache = chunk_cache
+
+    def _set_chunk_cache(self, var):
+        if isinstance(self.chunk_cache, dict):
+            settings = self.chunk_cache.get(var.name)
+        else:
+            settings = self.chunk_cache
+        if settings is not None:
+            var.set_var_chunk_cache(*settings)
 
     def open_store_variable(self, var):
         var.set_auto_maskandscale(False)
+        self._set_chunk_cache(var)
         dimensions = var.dimensions
         data = indexing.LazilyIndexedArray(NetCDF4ArrayWrapper(var))
         attributes = OrderedDict((k, var.getncattr(k))
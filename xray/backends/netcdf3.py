@@ -1,10 +1,15 @@
+from collections import OrderedDict
+import mmap
+import struct
 import unicodedata
 
 import numpy as np
 
 import xray
-from xray.pycompat import basestring, unicode_type
-from xray import conventions, utils
+from xray.backends.common import AbstractWritableDataStore
+from xray.utils import Frozen, NDArrayMixin
+from xray.pycompat import iteritems, basestring, unicode_type
+from xray import conventions, indexing, utils
 
 # Special characters that are permitted in netCDF names except in the
 # 0th position of the string
@@ -98,3 +103,698 @@ def is_valid_nc3_name(s):
             (s[-1] != ' ') and
             (_isalnumMUTF8(s[0]) or (s[0] == '_')) and
             all((_isalnumMUTF8(c) or c in _specialchars for c in s)))
+
+
+# Tags and data types of the NetCDF3 file format, see:
+# http://www.unidata.ucar.edu/software/netcdf/docs/file_format_specifications.html
+_NC_DIMENSION = 10
+_NC_VARIABLE = 11
+_NC_ATTRIBUTE = 12
+_NC3_DTYPES = {1: np.dtype('>i1'), 2: np.dtype('S1'), 3: np.dtype('>i2'),
+               4: np.dtype('>i4'), 5: np.dtype('>f4'), 6: np.dtype('>f8')}
+_NC3_TYPE_CODES = dict((v.str[1:], k) for k, v in _NC3_DTYPES.items())
+
+# approximate number of bytes of records to interleave in memory at once when
+# writing record variables
+RECORD_BLOCK_BYTES = 2 ** 26
+
+
+def _nc3_type(dtype):
+    """Return the NetCDF3 type code and big-endian dtype for storing values
+    of the given numpy dtype"""
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'S':
+        dtype = dtype.newbyteorder('>')
+    try:
+        return _NC3_TYPE_CODES[dtype.str[1:]], dtype
+    except KeyError:
+        raise ValueError('cannot store values of dtype %s in a NetCDF3 file'
+                         % dtype)
+
+
+def _padded(nbytes):
+    # values are padded to 4 byte boundaries
+    return nbytes + (-nbytes % 4)
+
+
+def _as_byte_array(buf):
+    """Return a read-only 1-dimensional uint8 numpy array viewing an object
+    which supports the buffer protocol, without copying it"""
+    if isinstance(buf, memoryview):
+        # on Python 2, numpy can only view memoryviews through the array
+        # interface
+        array = np.asarray(buf)
+    else:
+        array = np.frombuffer(buf, dtype=np.uint8)
+    # reshape always returns a new array object, so marking it read-only does
+    # not affect the caller's array
+    array = array.reshape(-1).view(np.uint8)
+    array.flags.writeable = False
+    return array
+
+
+def _mmap_file(filename):
+    """Memory map a file for reading, as a read-only numpy array of bytes.
+
+    The file descriptor is closed immediately: the map stays valid (and
+    open) for as long as any array viewing it is alive.
+    """
+    with open(filename, 'rb') as f:
+        return _as_byte_array(mmap.mmap(f.fileno(), 0,
+                                        access=mmap.ACCESS_READ))
+
+
+def _in_memory_buffer(obj):
+    """Return a read-only numpy array of the bytes of an in-memory NetCDF3
+    file, or None if the object is not one"""
+    if hasattr(obj, 'getvalue'):
+        # BytesIO: unlike getbuffer, getvalue does not lock the object
+        # against further writes (on Python 3.5+, it does not copy the
+        # contents either, unless the object is modified later)
+        obj = obj.getvalue()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        array = _as_byte_array(obj)
+        if array[:3].tostring() == b'CDF':
+            return array
+    return None
+
+
+def _writable(data):
+    """Copy data read from a read-only buffer, so it can be modified without
+    affecting (or being refused by) the buffer"""
+    if isinstance(data, np.ndarray) and not data.flags.writeable:
+        data = data.copy()
+    return data
+
+
+def _decode_string(s):
+    if isinstance(s, bytes):
+        return s.decode('utf-8', 'replace')
+    return s
+
+
+def _decode_values(d):
+    return OrderedDict((k, _decode_string(v)) for (k, v) in iteritems(d))
+
+
+class _NetCDF3HeaderReader(object):
+    """Parse the header of a NetCDF3 file from a buffer"""
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+
+    def read(self, fmt):
+        values = struct.unpack_from(fmt, self.buf, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values
+
+    def read_int(self):
+        return self.read('>i')[0]
+
+    def read_bytes(self, n):
+        value = self.buf[self.pos:self.pos + n].tostring()
+        self.pos += _padded(n)
+        return value
+
+    def read_name(self):
+        return self.read_bytes(self.read_int()).decode('utf-8')
+
+    def read_list(self, tag, read_item):
+        list_tag, n_items = self.read('>ii')
+        if list_tag not in (0, tag):
+            raise ValueError('invalid NetCDF3 header: unexpected tag %r'
+                             % list_tag)
+        return [read_item() for _ in range(n_items)]
+
+    def read_attribute(self):
+        name = self.read_name()
+        nc_type, n_values = self.read('>ii')
+        dtype = _NC3_DTYPES[nc_type]
+        raw = self.read_bytes(n_values * dtype.itemsize)
+        if dtype.kind == 'S':
+            value = raw.rstrip(b'\x00')
+        else:
+            value = np.frombuffer(raw, dtype=dtype)
+            if value.shape == (1,):
+                value = value[0]
+        return name, value
+
+    def read_attributes(self):
+        return OrderedDict(self.read_list(_NC_ATTRIBUTE, self.read_attribute))
+
+
+class _NetCDF3HeaderWriter(object):
+    """Serialize the header of a NetCDF3 file"""
+    def __init__(self):
+        self.parts = []
+
+    def write(self, fmt, *values):
+        self.parts.append(struct.pack(fmt, *values))
+
+    def write_bytes(self, value):
+        self.parts.append(value + b'\x00' * (-len(value) % 4))
+
+    def write_name(self, name):
+        if not isinstance(name, bytes):
+            name = name.encode('utf-8')
+        self.write('>i', len(name))
+        self.write_bytes(name)
+
+    def write_list(self, tag, items, write_item):
+        if items:
+            self.write('>ii', tag, len(items))
+            for item in items:
+                write_item(item)
+        else:
+            # ABSENT
+            self.write('>ii', 0, 0)
+
+    def write_attribute(self, item):
+        name, value = item
+        self.write_name(name)
+        if isinstance(value, basestring):
+            if isinstance(value, unicode_type):
+                value = value.encode('utf-8')
+            nc_type, n_values = 2, len(value)
+        else:
+            value = coerce_nc3_dtype(np.atleast_1d(value))
+            if value.ndim > 1:
+                raise ValueError('netCDF attributes must be 1-dimensional')
+            nc_type, dtype = _nc3_type(value.dtype)
+            n_values = value.size
+            value = value.astype(dtype).tostring()
+        self.write('>ii', nc_type, n_values)
+        self.write_bytes(value)
+
+    def write_attributes(self, attributes):
+        self.write_list(_NC_ATTRIBUTE, list(iteritems(attributes)),
+                        self.write_attribute)
+
+    def getvalue(self):
+        return b''.join(self.parts)
+
+
+def _read_header(buf):
+    """Parse the header of the NetCDF3 file in a buffer.
+
+    Returns
+    -------
+    version : int
+        1 for the classic format, 2 for the 64-bit offset format.
+    numrecs : int
+        Number of records, or -1 if not recorded (streaming).
+    dimensions : list of (name, length) tuples
+        The length of the record dimension is 0.
+    attributes : OrderedDict
+    variables : list of (name, dimensions, attributes, dtype, vsize, begin)
+        The dimensions of each variable are given as (name, length) tuples.
+    """
+    reader = _NetCDF3HeaderReader(buf)
+    magic, version = reader.read('>3sB')
+    if magic != b'CDF' or version not in (1, 2):
+        raise ValueError('not a valid NetCDF3 file')
+    numrecs = reader.read_int()
+
+    def read_dimension():
+        name = reader.read_name()
+        return name, reader.read_int()
+    dims = reader.read_list(_NC_DIMENSION, read_dimension)
+    attributes = reader.read_attributes()
+
+    def read_variable():
+        name = reader.read_name()
+        dim_ids = [reader.read_int() for _ in range(reader.read_int())]
+        var_attributes = reader.read_attributes()
+        nc_type, vsize = reader.read('>ii')
+        begin, = reader.read('>i' if version == 1 else '>q')
+        return (name, [dims[i] for i in dim_ids], var_attributes,
+                _NC3_DTYPES[nc_type], vsize, begin)
+    variables = reader.read_list(_NC_VARIABLE, read_variable)
+    return version, numrecs, dims, attributes, variables
+
+
+def _record_size(record_vsizes):
+    """Size in bytes of a record, given (unpadded) per-record sizes of the
+    record variables"""
+    if len(record_vsizes) == 1:
+        # a single record variable is not padded
+        return record_vsizes[0]
+    return sum(_padded(n) for n in record_vsizes)
+
+
+def _record_dtype(fields, recsize):
+    """Structured dtype of a record, given (offset, dtype, shape) of each
+    record variable within the record"""
+    return np.dtype({'names': ['f%d' % n for n in range(len(fields))],
+                     'formats': [(dtype, shape) if shape else dtype
+                                 for _, dtype, shape in fields],
+                     'offsets': [offset for offset, _, _ in fields],
+                     'itemsize': recsize})
+
+
+def _write_records(f, fields, recsize, values):
+    """Interleave the values of all record variables into records and write
+    them to a file object, in blocks of about RECORD_BLOCK_BYTES"""
+    dtype = _record_dtype(fields, recsize)
+    numrecs = len(values[0]) if values else 0
+    block = max(1, RECORD_BLOCK_BYTES // max(recsize, 1))
+    for start in range(0, numrecs, block):
+        records = np.zeros(min(block, numrecs - start), dtype)
+        for name, value in zip(dtype.names, values):
+            records[name] = value[start:start + block]
+        records.tofile(f)
+
+
+class _NetCDF3Layout(object):
+    """Locations of the variables of a NetCDF3 file"""
+    def __init__(self, numrecs, variables):
+        self.numrecs = numrecs
+        self.record_variables = [v for v in variables
+                                 if v[1] and v[1][0][1] == 0]
+        self.recsize = _record_size(
+            [dtype.itemsize * int(np.prod([l for _, l in var_dims[1:]]))
+             for _, var_dims, _, dtype, _, _ in self.record_variables])
+        self.record_begin = min([v[5] for v in self.record_variables] or [0])
+        self.record_fields = [
+            (begin - self.record_begin, dtype,
+             tuple(l for _, l in var_dims[1:]))
+            for _, var_dims, _, dtype, _, begin in self.record_variables]
+
+    def views(self, buf, variables):
+        """Yield (name, dimensions, attributes, data) for each variable,
+        where data is a numpy view of the buffer"""
+        for name, var_dims, attributes, dtype, vsize, begin in variables:
+            shape = [length for _, length in var_dims]
+            if var_dims and shape[0] == 0:
+                # records of all record variables are interleaved, so
+                # successive records are recsize bytes apart
+                shape[0] = self.numrecs
+                strides = []
+                step = dtype.itemsize
+                for length in reversed(shape[1:]):
+                    strides.insert(0, step)
+                    step *= length
+                strides.insert(0, self.recsize)
+            else:
+                strides = None
+            data = np.ndarray(tuple(shape), dtype, buffer=buf, offset=begin,
+                              strides=strides)
+            yield name, tuple(d for d, _ in var_dims), attributes, data
+
+
+class NetCDF3Variable(object):
+    """A variable in a NetCDF3BufferFile or NetCDF3File"""
+    def __init__(self, data, dimensions, attributes):
+        self.data = data
+        self.dimensions = dimensions
+        self._attributes = attributes
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+
+def _load_buffer(nc_file, buf):
+    """Parse a NetCDF3 file in a buffer into the dimensions, attributes and
+    variables of a NetCDF3BufferFile or NetCDF3File"""
+    version, numrecs, dims, attributes, variables = _read_header(buf)
+    layout = _NetCDF3Layout(numrecs, variables)
+    if numrecs == -1:
+        # streaming: infer the number of records from the file size
+        layout.numrecs = ((len(buf) - layout.record_begin)
+                          // max(layout.recsize, 1)
+                          if layout.record_variables else 0)
+    nc_file.version_byte = version
+    nc_file.numrecs = layout.numrecs
+    nc_file._layout = layout
+    # like netcdf_file, use None for the length of the record dimension
+    nc_file.dimensions = OrderedDict((name, length or None)
+                                     for name, length in dims)
+    nc_file._attributes = attributes
+    nc_file.variables = OrderedDict(
+        (name, NetCDF3Variable(data, var_dims, var_attributes))
+        for name, var_dims, var_attributes, data
+        in layout.views(buf, variables))
+
+
+class NetCDF3BufferFile(object):
+    """Read-only NetCDF3 file held in an in-memory buffer.
+
+    The header is parsed directly from the buffer, and the data of every
+    variable is a read-only numpy view of the buffer, so no data is copied.
+    This object provides the subset of the interface of
+    `scipy.io.netcdf.netcdf_file` used for reading by `ScipyDataStore`.
+
+    Parameters
+    ----------
+    buf : bytes, memoryview or other object supporting the buffer protocol
+        Contents of a NetCDF3 file (classic or 64-bit offset format).
+    """
+    mode = 'r'
+
+    def __init__(self, buf):
+        buf = _as_byte_array(buf)
+        self.buf = buf
+        _load_buffer(self, buf)
+
+    def _check_writable(self):
+        if self.mode != 'w':
+            raise ValueError('cannot modify the header of a NetCDF3 file '
+                             'opened in mode %r' % self.mode)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        # the buffer is freed once no more arrays refer to it
+        pass
+
+
+class NetCDF3File(NetCDF3BufferFile):
+    """NetCDF3 file on disk, read and written with numpy alone.
+
+    In read and append mode, the file is memory mapped and the data of every
+    variable is a read-only view of the map. In write mode, variables are
+    held in memory until `flush` (or `close`) writes the complete file in a
+    single pass. In append mode, records can be appended to the record
+    (unlimited) dimension with `append_records`, without rewriting the rest
+    of the file.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the file.
+    mode : {'r', 'w', 'a'}, optional
+        Read, write or append mode.
+    version : {1, 2}, optional
+        Format of new files: 1 for the classic format, 2 for the 64-bit
+        offset format.
+    """
+    def __init__(self, filename, mode='r', version=1):
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError("mode must be 'r', 'w' or 'a'")
+        if version not in (1, 2):
+            raise ValueError('version must be 1 or 2')
+        self.filename = filename
+        self.mode = mode
+        if mode == 'w':
+            self.version_byte = version
+            self.numrecs = 0
+            self.dimensions = OrderedDict()
+            self._attributes = OrderedDict()
+            self.variables = OrderedDict()
+        else:
+            _load_buffer(self, _mmap_file(filename))
+        self._modified = mode == 'w'
+
+    def createDimension(self, name, length):
+        """Add a dimension; a length of None creates the record dimension"""
+        self._check_writable()
+        if length is None and None in self.dimensions.values():
+            raise ValueError('NetCDF3 files can only have one record '
+                             'dimension')
+        self.dimensions[name] = length
+        self._modified = True
+
+    def createVariable(self, name, data, dimensions, attributes=None):
+        """Add a variable holding the given values (in memory)"""
+        self._check_writable()
+        _nc3_type(data.dtype)
+        for dim, length in zip(dimensions, data.shape):
+            if self.dimensions[dim] not in (None, length):
+                raise ValueError('shape of variable %r does not match the '
+                                 'length of dimension %r' % (name, dim))
+        if any(self.dimensions[d] is None for d in dimensions[1:]):
+            raise ValueError('only the first dimension of a variable can be '
+                             'the record dimension')
+        self.variables[name] = NetCDF3Variable(
+            data, tuple(dimensions), OrderedDict(attributes or {}))
+        self._modified = True
+
+    def _write(self):
+        dim_names = list(self.dimensions)
+        numrecs = set(var.shape[0] for var in self.variables.values()
+                      if var.dimensions
+                      and self.dimensions[var.dimensions[0]] is None)
+        if len(numrecs) > 1:
+            raise ValueError('record variables have different lengths: %s'
+                             % sorted(numrecs))
+        self.numrecs = numrecs.pop() if numrecs else 0
+
+        all_vars = []
+        fixed_vars = []
+        record_vars = []
+        for name, var in iteritems(self.variables):
+            nc_type, dtype = _nc3_type(var.dtype)
+            is_record = (bool(var.dimensions)
+                         and self.dimensions[var.dimensions[0]] is None)
+            inner_shape = var.shape[1:] if is_record else var.shape
+            vsize = dtype.itemsize * int(np.prod(inner_shape))
+            item = (name, var, nc_type, dtype, vsize)
+            all_vars.append(item)
+            (record_vars if is_record else fixed_vars).append(item)
+        recsize = _record_size([v[4] for v in record_vars])
+
+        def header(begins):
+            writer = _NetCDF3HeaderWriter()
+            writer.write('>3sBi', b'CDF', self.version_byte, self.numrecs)
+
+            def write_dimension(item):
+                name, length = item
+                writer.write_name(name)
+                # the record dimension is stored with length 0
+                writer.write('>i', length or 0)
+            writer.write_list(_NC_DIMENSION, list(iteritems(self.dimensions)),
+                              write_dimension)
+            writer.write_attributes(self._attributes)
+
+            def write_variable(item):
+                name, var, nc_type, dtype, vsize = item
+                writer.write_name(name)
+                writer.write('>i', len(var.dimensions))
+                for dim in var.dimensions:
+                    writer.write('>i', dim_names.index(dim))
+                writer.write_attributes(var._attributes)
+                writer.write('>iI', nc_type, min(_padded(vsize), 2 ** 32 - 1))
+                begin = begins.get(name, 0)
+                if self.version_byte == 1 and begin >= 2 ** 31:
+                    raise ValueError('file is too large for the classic '
+                                     'NetCDF3 format; use version=2')
+                writer.write('>i' if self.version_byte == 1 else '>q', begin)
+            # the header lists the variables in their original order, even
+            # though the data of record variables is stored at the end
+            writer.write_list(_NC_VARIABLE, all_vars, write_variable)
+            return writer.getvalue()
+
+        # the size of the header does not depend on the offsets, so we can
+        # lay out the variables after serializing the header once
+        begins = {}
+        offset = len(header(begins))
+        for name, _, _, _, vsize in fixed_vars:
+            begins[name] = offset
+            offset += _padded(vsize)
+        record_begin = offset
+        record_fields = []
+        for name, var, _, dtype, vsize in record_vars:
+            begins[name] = offset
+            record_fields.append((offset - record_begin, dtype,
+                                  var.shape[1:]))
+            offset += _padded(vsize)
+
+        with open(self.filename, 'wb') as f:
+            f.write(header(begins))
+            for _, var, _, dtype, vsize in fixed_vars:
+                np.ascontiguousarray(var.data, dtype).tofile(f)
+                f.write(b'\x00' * (-vsize % 4))
+            _write_records(f, record_fields, recsize,
+                           [var.data for _, var, _, _, _ in record_vars])
+
+    def append_records(self, values):
+        """Append records to the record dimension of a file opened in append
+        mode.
+
+        Parameters
+        ----------
+        values : dict-like
+            Mapping from the name of each record variable to an array of new
+            values, with the new records along the first axis.
+        """
+        if self.mode != 'a':
+            raise ValueError('records can only be appended in append mode')
+        layout = self._layout
+        if not layout.record_variables:
+            raise ValueError('file has no record variables')
+        names = [v[0] for v in layout.record_variables]
+        if set(values) != set(names):
+            raise ValueError('values must be provided for exactly the '
+                             'record variables %r' % names)
+        arrays = []
+        for name, (_, dtype, shape) in zip(names, layout.record_fields):
+            array = np.asarray(values[name])
+            if array.shape[1:] != shape:
+                raise ValueError('records of variable %r must have shape %r'
+                                 % (name, shape))
+            arrays.append(array.astype(dtype, copy=False))
+        n_new = set(len(a) for a in arrays)
+        if len(n_new) > 1:
+            raise ValueError('record variables have different numbers of new '
+                             'records: %s' % sorted(n_new))
+
+        with open(self.filename, 'r+b') as f:
+            f.seek(layout.record_begin + layout.numrecs * layout.recsize)
+            _write_records(f, layout.record_fields, layout.recsize, arrays)
+            f.seek(4)
+            f.write(struct.pack('>i', layout.numrecs + n_new.pop()))
+        # map the file again to see the new records
+        _load_buffer(self, _mmap_file(self.filename))
+
+    def flush(self):
+        if self._modified:
+            self._write()
+            self._modified = False
+
+    def close(self):
+        self.flush()
+
+
+class NetCDF3ArrayWrapper(NDArrayMixin):
+    """Wrapper around the data of a variable in a NetCDF3DataStore"""
+    def __init__(self, variable):
+        self.variable = variable
+
+    @property
+    def array(self):
+        return self.variable.data
+
+    def __getitem__(self, key):
+        return _writable(self.array[key])
+
+
+class NetCDF3DataStore(AbstractWritableDataStore):
+    """Store for reading and writing NetCDF3 files with numpy alone.
+
+    Unlike ScipyDataStore, this store does not require scipy. Files are
+    read through a memory map, new files are written in a single pass, and
+    records can be appended to the record dimension of existing files (see
+    `append`) without rewriting them.
+
+    Parameters
+    ----------
+    filename_or_obj : str, bytes or io.BytesIO
+        Path to a file, or (in read mode) the contents of a NetCDF3 file.
+    mode : {'r', 'w', 'a'}, optional
+        Read, write or append mode.
+    version : {1, 2}, optional
+        Format of new files: 1 for the classic format, 2 for the 64-bit
+        offset format.
+    record_dimension : str, optional
+        Name of the dimension to store as the record (unlimited) dimension
+        when writing a new file.
+    """
+    def __init__(self, filename_or_obj, mode='r', version=1,
+                 record_dimension=None):
+        buf = _in_memory_buffer(filename_or_obj) if mode == 'r' else None
+        if buf is not None:
+            self.ds = NetCDF3BufferFile(buf)
+        else:
+            self.ds = NetCDF3File(filename_or_obj, mode=mode, version=version)
+        self.record_dimension = record_dimension
+
+    def open_store_variable(self, var):
+        data = indexing.LazilyIndexedArray(NetCDF3ArrayWrapper(var))
+        return xray.Variable(var.dimensions, data,
+                             _decode_values(var._attributes))
+
+    @property
+    def attrs(self):
+        return Frozen(_decode_values(self.ds._attributes))
+
+    @property
+    def dimensions(self):
+        return Frozen(self.ds.dimensions)
+
+    def set_dimension(self, name, length):
+        self.ds._check_writable()
+        if name == self.record_dimension:
+            length = None
+        self.ds.createDimension(name, length)
+
+    def set_attribute(self, key, value):
+        if not is_valid_nc3_name(key):
+            raise ValueError('Not a valid attribute name')
+        self.ds._check_writable()
+        self.ds._attributes[key] = value
+        self.ds._modified = True
+
+    def set_variable(self, name, variable):
+        variable = encode_nc3_variable(
+            conventions.encode_cf_variable(variable))
+        for key in variable.attrs:
+            if not is_valid_nc3_name(key):
+                raise ValueError('Not a valid attribute name')
+        self.ds._check_writable()
+        self.set_necessary_dimensions(variable)
+        self.ds.createVariable(name, variable.values, variable.dimensions,
+                               variable.attrs)
+
+    def del_attribute(self, key):
+        self.ds._check_writable()
+        del self.ds._attributes[key]
+        self.ds._modified = True
+
+    def append(self, variables):
+        """Append records to the record dimension of a file opened in append
+        mode.
+
+        Parameters
+        ----------
+        variables : Dataset or dict-like
+            New values of every record variable in the file, with the record
+            dimension first. Other variables (e.g., fixed coordinates of a
+            Dataset) are ignored. Values are encoded with the encoding
+            (units, scale and offset, fill value and data type) already used
+            by the file, so, e.g., datetimes can be appended to a time
+            variable.
+        """
+        variables = getattr(variables, 'variables', variables)
+        values = OrderedDict()
+        for record_var in self.ds._layout.record_variables:
+            name = record_var[0]
+            if name in variables:
+                values[name] = self._encode_records(
+                    name, variables[name], self.ds.variables[name])
+        self.ds.append_records(values)
+
+    def _encode_records(self, name, var, stored):
+        if hasattr(var, 'variable'):
+            var = var.variable
+        elif not isinstance(var, xray.Variable):
+            var = xray.Variable(stored.dimensions[:np.ndim(var)], var)
+        attrs = _decode_values(stored._attributes)
+        encoding = dict((k, attrs[k]) for k in ['units', 'calendar',
+                                                 'scale_factor', 'add_offset',
+                                                 '_FillValue'] if k in attrs)
+        if stored.dtype.kind != 'S':
+            encoding['dtype'] = stored.dtype.newbyteorder('=')
+        var = xray.Variable(var.dimensions, var.values, encoding=encoding)
+        data = coerce_nc3_dtype(conventions.encode_cf_variable(var).values)
+        if (stored.dtype.kind == 'S'
+                and data.ndim < len(stored.dimensions)):
+            # pad strings to the length stored in the file
+            length = stored.shape[-1]
+            if data.size and np.char.str_len(data).max() > length:
+                raise ValueError('cannot append strings longer than the '
+                                 'length %s of variable %r in the file'
+                                 % (length, name))
+            data = conventions.string_to_char(data.astype('S%s' % length))
+        return data
+
+    def sync(self):
+        self.ds.flush()
+
+    def close(self):
+        self.ds.close()
@@ -1,4 +1,3 @@
-from collections import OrderedDict
 try: # Python 2
     from cStringIO import StringIO as BytesIO
 except ImportError: # Python 3
@@ -8,21 +7,33 @@ import warnings
 
 import xray
 from xray.backends.common import AbstractWritableDataStore
-from xray.utils import Frozen
+from xray.utils import Frozen, NDArrayMixin
 from xray.pycompat import iteritems, basestring, unicode_type
 
 from .. import conventions
-from .netcdf3 import is_valid_nc3_name, coerce_nc3_dtype, encode_nc3_variable
+from .. import indexing
+from .netcdf3 import (is_valid_nc3_name, coerce_nc3_dtype, encode_nc3_variable,
+                      NetCDF3BufferFile, _mmap_file, _in_memory_buffer,
+                      _writable, _decode_values)
 
 
-def _decode_string(s):
-    if isinstance(s, bytes):
-        return s.decode('utf-8', 'replace')
-    return s
+class ScipyArrayWrapper(NDArrayMixin):
+    """Wrapper around the data of a variable in a ScipyDataStore.
 
+    Holding a reference to the datastore (instead of only to the array) keeps
+    the file, and any memory map of it, open for as long as the data might
+    still be accessed.
+    """
+    def __init__(self, variable, datastore):
+        self.variable = variable
+        self.datastore = datastore
+
+    @property
+    def array(self):
+        return self.variable.data
 
-def _decode_values(d):
-    return OrderedDict((k, _decode_string(v)) for (k, v) in iteritems(d))
+    def __getitem__(self, key):
+        return _writable(self.array[key])
 
 
 class ScipyDataStore(AbstractWritableDataStore):
@@ -31,6 +42,12 @@ class ScipyDataStore(AbstractWritableDataStore):
     This store has the advantage of being able to be initialized with a
     StringIO object, allow for serialization without writing to disk.
 
+    Files on disk are read with memory mapping (unless `mmap=False`), and
+    in-memory NetCDF3 data (bytes or BytesIO objects) are parsed in place
+    through a read-only view, without copying the whole file. In both cases,
+    variables are loaded lazily: only the values selected by indexing are
+    copied out of the file, into arrays which can be modified freely.
+
     It only supports the NetCDF3 file-format.
     """
     def __init__(self, filename_or_obj, mode='r', mmap=None, version=1):
@@ -43,6 +60,15 @@ class ScipyDataStore(AbstractWritableDataStore):
                           % scipy.__version__, ImportWarning)
 
         import scipy.io
+        if mode == 'r':
+            buf = _in_memory_buffer(filename_or_obj)
+            if buf is not None:
+                self.ds = NetCDF3BufferFile(buf)
+                return
+            if (mmap is not False and isinstance(filename_or_obj, basestring)
+                    and not filename_or_obj.startswith('CDF')):
+                self.ds = NetCDF3BufferFile(_mmap_file(filename_or_obj))
+                return
         # if filename is a NetCDF3 bytestring we store it in a StringIO
         if (isinstance(filename_or_obj, basestring)
                 and filename_or_obj.startswith('CDF')):
@@ -53,7 +79,8 @@ class ScipyDataStore(AbstractWritableDataStore):
             filename_or_obj, mode=mode, mmap=mmap, version=version)
 
     def open_store_variable(self, var):
-        return xray.Variable(var.dimensions, var.data,
+        data = indexing.LazilyIndexedArray(ScipyArrayWrapper(var, self))
+        return xray.Variable(var.dimensions, data,
                              _decode_values(var._attributes))
 
     @property
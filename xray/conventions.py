@@ -6,14 +6,15 @@ from datetime import datetime
 
 from . import indexing
 from . import utils
-from .pycompat import iteritems
+from .pycompat import iteritems, basestring
 import xray
 
 # standard calendars recognized by netcdftime
 _STANDARD_CALENDARS = {'standard', 'gregorian', 'proleptic_gregorian'}
 
 
-def mask_and_scale(array, fill_value=None, scale_factor=None, add_offset=None):
+def mask_and_scale(array, fill_value=None, scale_factor=None, add_offset=None,
+                   dtype=float):
     """Scale and mask array values according to CF conventions for packed and
     missing values
 
@@ -34,6 +35,8 @@ def mask_and_scale(array, fill_value=None, scale_factor=None, add_offset=None):
     add_offset : number, optional
         After applying scale_factor, add this number to entries in the
         original array.
+    dtype : np.dtype, optional
+        Floating point dtype of the result.
 
     Returns
     -------
@@ -44,37 +47,173 @@ def mask_and_scale(array, fill_value=None, scale_factor=None, add_offset=None):
     ----------
     http://www.unidata.ucar.edu/software/netcdf/docs/BestPractices.html
     """
-    # cast to float to insure NaN is meaningful
-    values = np.array(array, dtype=float, copy=True)
-    if fill_value is not None and not np.isnan(fill_value):
-        if values.ndim > 0:
-            values[values == fill_value] = np.nan
-        elif values == fill_value:
-            values = np.array(np.nan)
+    array = np.asarray(array)
+    # allocate the result once, and then scale, offset and mask it in place
+    values = np.empty(array.shape, dtype=dtype)
     if scale_factor is not None:
-        values *= scale_factor
+        np.multiply(array, scale_factor, out=values, dtype=values.dtype)
+    else:
+        values[...] = array
     if add_offset is not None:
-        values += add_offset
+        np.add(values, add_offset, out=values, dtype=values.dtype)
+    if fill_value is not None and not np.isnan(fill_value):
+        # compare against the original (packed) values
+        if values.ndim > 0:
+            values[array == fill_value] = np.nan
+        elif array == fill_value:
+            values[...] = np.nan
     return values
 
 
+def _choose_float_dtype(dtype, scale_factor=None, add_offset=None):
+    """Return the floating point dtype to use for unpacking an array of the
+    given dtype with mask_and_scale.
+
+    Following the CF conventions, values packed into small (8 or 16 bit)
+    integers with float32 scale_factor and add_offset attributes are
+    unpacked to float32, which represents them without any loss of
+    precision. Everything else is unpacked to float64.
+    """
+    params = [p for p in [scale_factor, add_offset] if p is not None]
+    if (dtype.kind in 'iu' and dtype.itemsize <= 2 and params
+            and all(np.asarray(p).dtype == np.float32 for p in params)):
+        return np.dtype(np.float32)
+    return np.dtype(float)
+
+
+def _mask_and_scale_dtype(decoded_dtype, dtype, scale_factor=None,
+                          add_offset=None):
+    """Resolve the `dtype` (or `mask_and_scale_dtype`) argument for decoding
+    an array of the given dtype into a floating point dtype: None means
+    float64, and 'auto' means the dtype chosen by `_choose_float_dtype`.
+    """
+    if decoded_dtype is None:
+        return np.dtype(float)
+    elif isinstance(decoded_dtype, basestring) and decoded_dtype == 'auto':
+        return _choose_float_dtype(dtype, scale_factor, add_offset)
+    else:
+        return np.dtype(decoded_dtype)
+
+
+# the number of nanoseconds in each of the time units allowed by CF (and
+# udunits) in time unit strings like "days since 2000-01-01"
+_NS_PER_TIME_UNIT = {}
+for _names, _ns in [(['microseconds', 'microsecond', 'us'], 10 ** 3),
+                    (['milliseconds', 'millisecond', 'msec', 'ms'], 10 ** 6),
+                    (['seconds', 'second', 'secs', 'sec', 's'], 10 ** 9),
+                    (['minutes', 'minute', 'mins', 'min'], 60 * 10 ** 9),
+                    (['hours', 'hour', 'hrs', 'hr', 'h'], 3600 * 10 ** 9),
+                    (['days', 'day', 'd'], 86400 * 10 ** 9)]:
+    for _name in _names:
+        _NS_PER_TIME_UNIT[_name] = _ns
+del _names, _ns, _name
+
+_parsed_time_units = {}
+
+
+def _parse_time_units(units):
+    """Parse a CF time unit string like "hours since 2000-01-01 00:00:00"
+    into the number of nanoseconds per unit and the reference date as a
+    pandas.Timestamp.
+
+    Results are cached, since the same units are typically decoded many
+    times. Raises ValueError if the units are not supported.
+    """
+    try:
+        return _parsed_time_units[units]
+    except KeyError:
+        pass
+    try:
+        delta, ref_date = units.split(' since ')
+        ns_per_unit = _NS_PER_TIME_UNIT[delta.strip().lower()]
+        ref_date = pd.Timestamp(ref_date.strip())
+    except (ValueError, KeyError, OverflowError):
+        # pandas.tslib.OutOfBoundsDatetime is a subclass of ValueError
+        raise ValueError('unable to parse time units %r' % units)
+    if ref_date is pd.NaT:
+        raise ValueError('unable to parse time units %r' % units)
+    if ref_date.tz is not None:
+        ref_date = ref_date.tz_convert('UTC').tz_localize(None)
+    _parsed_time_units[units] = parsed = (ns_per_unit, ref_date)
+    return parsed
+
+
+def _decode_datetime_with_numpy(num_dates, units, calendar):
+    """Decode numeric dates into a datetime64[ns] array by calculating
+    `ref_date + num_dates * unit` directly with int64 nanoseconds.
+
+    Returns None if the dates cannot be decoded this way (e.g., because of
+    a non-standard calendar or dates outside the range of datetime64[ns]), in
+    which case netCDF4.num2date needs to be used instead.
+    """
+    if calendar not in _STANDARD_CALENDARS:
+        return None
+    try:
+        # the reference date is within the range of datetime64[ns] (after
+        # 1677), so the 'standard' calendar's switch from Julian dates in 1582
+        # does not matter
+        ns_per_unit, ref_date = _parse_time_units(units)
+    except ValueError:
+        return None
+
+    num_dates = np.asarray(num_dates)
+    flat_num_dates = num_dates.reshape(-1)
+    if flat_num_dates.dtype.kind in 'iu':
+        missing = None
+        whole = flat_num_dates
+        fraction = None
+    elif flat_num_dates.dtype.kind == 'f':
+        missing = np.isnan(flat_num_dates)
+        if np.isinf(flat_num_dates).any():
+            return None
+        # split off the fractional part of each number, so whole numbers are
+        # converted exactly instead of with floating point arithmetic
+        whole = np.trunc(np.where(missing, 0, flat_num_dates))
+        fraction = flat_num_dates - whole
+    else:
+        return None
+
+    if whole.size:
+        # check for overflow with floating point arithmetic before casting
+        ref_ns = float(ref_date.value)
+        if (float(whole.min()) * ns_per_unit + ref_ns < pd.Timestamp.min.value
+                or (float(whole.max()) + 1) * ns_per_unit + ref_ns
+                > pd.Timestamp.max.value):
+            return None
+
+    ns = whole.astype(np.int64) * ns_per_unit + ref_date.value
+    if fraction is not None:
+        ns += np.around(np.where(missing, 0, fraction)
+                        * ns_per_unit).astype(np.int64)
+    dates = ns.view('M8[ns]')
+    if missing is not None:
+        dates[missing] = np.datetime64('NaT')
+    return dates.reshape(num_dates.shape)
+
+
 def decode_cf_datetime(num_dates, units, calendar=None):
     """Given an array of numeric dates in netCDF format, convert it into a
     numpy array of date time objects.
 
-    For standard (Gregorian) calendars, this function uses vectorized
-    operations, which makes it much faster than netCDF4.num2date. In such a
-    case, the returned array will be of type np.datetime64.
+    For standard (Gregorian) calendars, dates are calculated directly in
+    int64 nanoseconds with vectorized operations, which is much faster than
+    netCDF4.num2date and does not require netCDF4. In such a case, the
+    returned array will be of type np.datetime64.
 
     See also
     --------
     netCDF4.num2date
     """
-    import netCDF4 as nc4
-    num_dates = np.asarray(num_dates).astype(float)
     if calendar is None:
         calendar = 'standard'
 
+    dates = _decode_datetime_with_numpy(num_dates, units, calendar)
+    if dates is not None:
+        return dates
+
+    import netCDF4 as nc4
+    num_dates = np.asarray(num_dates).astype(float)
+
     def nan_safe_num2date(num):
         return pd.NaT if np.isnan(num) else nc4.num2date(num, units, calendar)
 
@@ -145,53 +284,150 @@ def decode_cf_datetime(num_dates, units, calendar=None):
     return dates
 
 
+def infer_time_unit(deltas):
+    """Given an array of time differences in integer nanoseconds, return the
+    first of 'days', 'hours', 'minutes' or 'seconds' which evenly divides all
+    of them.
+
+    This takes a single linear pass over `deltas` (to find their greatest
+    common divisor), so it is cheap to call on large arrays.
+    """
+    deltas = np.asarray(deltas, dtype=np.int64).reshape(-1)
+    if hasattr(np, 'gcd'):
+        divisor = np.gcd.reduce(deltas) if deltas.size else 0
+        divides = lambda unit_ns: divisor % unit_ns == 0
+    else:
+        # numpy < 1.15
+        divides = lambda unit_ns: not (deltas % unit_ns).any()
+    for time_unit in ['days', 'hours', 'minutes', 'seconds']:
+        if divides(_NS_PER_TIME_UNIT[time_unit]):
+            return time_unit
+    raise ValueError('could not automatically determine time units')
+
+
 def guess_time_units(dates):
     """Given an array of dates suitable for input to `pandas.DatetimeIndex`,
     returns a CF compatible time-unit string of the form "{time_unit} since
     {date[0]}", where `time_unit` is 'days', 'hours', 'minutes' or 'seconds'
-    (the first one that can evenly divide all unique time deltas in `dates`)
+    (the first one that can evenly divide all time deltas in `dates`)
     """
-    dates = pd.DatetimeIndex(np.asarray(dates).reshape(-1))
-    unique_timedeltas = np.unique(np.diff(dates.values))
-    for time_unit, delta in [('days', '1 days'), ('hours', '3600s'),
-                             ('minutes', '60s'), ('seconds', '1s')]:
-        unit_delta = pd.to_timedelta(delta)
-        diffs = unique_timedeltas / unit_delta
-        if np.all(diffs == diffs.astype(int)):
-            break
-    else:
-        raise ValueError('could not automatically determine time units')
-    return '%s since %s' % (time_unit, dates[0])
+    dates = np.asarray(dates).reshape(-1)
+    if not np.issubdtype(dates.dtype, np.datetime64):
+        dates = pd.DatetimeIndex(dates).values
+    ns = dates.astype('M8[ns]').view(np.int64)
+    ns = ns[~pd.isnull(dates)]
+    if not ns.size:
+        return 'days since 1970-01-01 00:00:00'
+    time_unit = infer_time_unit(ns - ns[0])
+    return '%s since %s' % (time_unit, pd.Timestamp(ns[0]))
 
 
 def nctime_to_nptime(times):
     """Given an array of netCDF4.datetime objects, return an array of
-    numpy.datetime64 objects of the same size"""
+    numpy.datetime64 objects of the same size
+
+    The date fields of every object are extracted into integer arrays, from
+    which the datetime64 values are calculated with vectorized arithmetic.
+    Raises ValueError if any of the dates does not exist in the standard
+    calendar (e.g., February 30th in a 360 day calendar).
+    """
     times = np.asarray(times)
-    new = np.empty(times.shape, dtype='M8[ns]')
-    for i, t in np.ndenumerate(times):
-        new[i] = np.datetime64(datetime(*t.timetuple()[:6]))
-    return new
+    fields = np.array([(t.year, t.month, t.day, t.hour, t.minute, t.second)
+                       for t in times.flat], dtype=np.int64).reshape(-1, 6)
+    year, month, day, hour, minute, second = fields.T
+
+    if ((month < 1) | (month > 12)).any():
+        raise ValueError('month must be in 1..12')
+    months = (year - 1970) * 12 + (month - 1)
+    month_start = months.astype('M8[M]').astype('M8[D]').view(np.int64)
+    next_month_start = (months + 1).astype('M8[M]').astype('M8[D]').view(
+        np.int64)
+    if ((day < 1) | (day > next_month_start - month_start)).any():
+        raise ValueError('day is out of range for month')
+
+    days = month_start + (day - 1)
+    seconds = ((days * 24 + hour) * 60 + minute) * 60 + second
+    return (seconds * 10 ** 9).view('M8[ns]').reshape(times.shape)
+
+
+def _encode_datetime_with_numpy(dates, units, calendar):
+    """Encode datetime64 dates as numbers in the given units by subtracting
+    the reference date and dividing by the unit with int64 nanoseconds.
+
+    Returns None if the dates cannot be encoded this way (e.g., because of a
+    non-standard calendar), in which case netCDF4.date2num needs to be used
+    instead.
+    """
+    if calendar not in _STANDARD_CALENDARS:
+        return None
+    dates = np.asarray(dates)
+    if not np.issubdtype(dates.dtype, np.datetime64):
+        return None
+    try:
+        ns_per_unit, ref_date = _parse_time_units(units)
+    except ValueError:
+        return None
+
+    flat_dates = dates.reshape(-1)
+    missing = pd.isnull(flat_dates)
+    valid_dates = flat_dates[~missing]
+    if dates.dtype != np.dtype('M8[ns]') and valid_dates.size:
+        # casting to ns precision silently overflows for out of range dates
+        # (compare with day precision bounds, so the comparison itself does
+        # not cast to ns)
+        if (valid_dates.min() < np.datetime64('1678-01-01', 'D')
+                or valid_dates.max() >= np.datetime64('2262-01-01', 'D')):
+            return None
+    ns = flat_dates.astype('M8[ns]').view(np.int64)
+    if valid_dates.size:
+        # make sure subtracting the reference date cannot overflow (Python
+        # integers have arbitrary precision)
+        int64_info = np.iinfo(np.int64)
+        if (int(ns[~missing].min()) - ref_date.value <= int64_info.min
+                or int(ns[~missing].max()) - ref_date.value > int64_info.max):
+            return None
+
+    delta = ns - ref_date.value
+    whole = delta // ns_per_unit
+    remainder = delta - whole * ns_per_unit
+    num = whole.astype(float) + remainder / float(ns_per_unit)
+    num[missing] = np.nan
+    return num.reshape(dates.shape)
 
 
 def encode_cf_datetime(dates, units=None, calendar=None):
     """Given an array of datetime objects, returns the tuple `(num, units,
     calendar)` suitable for a CF complient time variable.
 
-    Unlike encode_cf_datetime, this function does not (yet) speedup encoding
-    of datetime64 arrays. However, unlike `date2num`, it can handle datetime64
-    arrays.
+    Arrays of datetime64 values (including pandas.DatetimeIndex objects) with
+    standard calendars are encoded with vectorized int64 arithmetic, which is
+    much faster than `date2num` and does not require netCDF4. Otherwise,
+    dates are encoded with `netCDF4.date2num`, although unlike `date2num`, it
+    can still handle datetime64 arrays.
 
     See also
     --------
     netCDF4.date2num
     """
-    import netCDF4 as nc4
     if units is None:
         units = guess_time_units(dates)
     if calendar is None:
         calendar = 'proleptic_gregorian'
 
+    num = _encode_datetime_with_numpy(dates, units, calendar)
+    if num is not None:
+        # the numeric dates should decode to exactly the original dates; this
+        # only fails if the units are too coarse to represent the dates
+        # exactly with float64 numbers
+        expected = np.asarray(dates).astype('M8[ns]')
+        decoded = decode_cf_datetime(num, units, calendar)
+        if not ((decoded == expected) | pd.isnull(expected)).all():
+            warnings.warn('times encoded with units %r do not exactly '
+                          'round-trip to the original dates; consider using '
+                          'finer units' % units, RuntimeWarning, stacklevel=2)
+        return (num, units, calendar)
+
+    import netCDF4 as nc4
     if (isinstance(dates, np.ndarray)
             and np.issubdtype(dates.dtype, np.datetime64)):
         # for now, don't bother doing any trickery like decode_cf_datetime to
@@ -229,7 +465,7 @@ class MaskedAndScaledArray(utils.NDArrayMixin):
     http://www.unidata.ucar.edu/software/netcdf/docs/BestPractices.html
     """
     def __init__(self, array, fill_value=None, scale_factor=None,
-                 add_offset=None):
+                 add_offset=None, dtype=None):
         """
         Parameters
         ----------
@@ -243,19 +479,26 @@ class MaskedAndScaledArray(utils.NDArrayMixin):
         add_offset : number, optional
             After applying scale_factor, add this number to entries in the
             original array.
+        dtype : np.dtype or 'auto', optional
+            Floating point dtype of the decoded values. Defaults to float64.
+            If 'auto', float32 is used for values packed into 8 or 16 bit
+            integers with float32 scale_factor and add_offset (as recommended
+            by the CF conventions), and float64 otherwise.
         """
         self.array = array
         self.fill_value = fill_value
         self.scale_factor = scale_factor
         self.add_offset = add_offset
+        self._dtype = _mask_and_scale_dtype(dtype, array.dtype, scale_factor,
+                                            add_offset)
 
     @property
     def dtype(self):
-        return np.dtype('float')
+        return self._dtype
 
     def __getitem__(self, key):
         return mask_and_scale(self.array[key], self.fill_value,
-                              self.scale_factor, self.add_offset)
+                              self.scale_factor, self.add_offset, self.dtype)
 
     def __repr__(self):
         return ("%s(%r, fill_value=%r, scale_factor=%r, add_offset=%r)" %
@@ -330,6 +573,90 @@ class CharToStringArray(utils.NDArrayMixin):
         return values
 
 
+class DecodedCFArray(utils.NDArrayMixin):
+    """Wrapper around array-like objects to create a new indexable object where
+    values, when accessed, are decoded according to CF conventions by a
+    sequence of decoding steps.
+
+    This is equivalent to nesting CharToStringArray, MaskedAndScaledArray and
+    DecodedCFDatetimeArray objects, except that indexing reads the original
+    values once and then applies every step directly to them, without
+    walking through a chain of wrapper objects.
+
+    The steps are not fused into a single output buffer: concatenating
+    characters returns a view (or a contiguous copy of interleaved records),
+    masking and scaling allocates its floating point result once and applies
+    the scale, offset and mask to it in place, but decoding times always
+    allocates a new datetime64 array. A variable which is both scaled and
+    decoded as times therefore still creates one intermediate array.
+
+    >>> x = DecodedCFArray(np.array([-99, -1, 0, 1, 2]),
+    ...                    [('mask_and_scale', -99, 0.01, 1, np.dtype(float))])
+    >>> x[:]
+    array([  nan,  0.99,  1.  ,  1.01,  1.02])
+    """
+    def __init__(self, array, steps):
+        """
+        Parameters
+        ----------
+        array : array-like
+            Original array of values to wrap.
+        steps : list of tuple
+            Decoding steps to apply (in order), each given by a tuple of the
+            name of the step and its arguments. Valid steps are
+            `('concat_characters',)`,
+            `('mask_and_scale', fill_value, scale_factor, add_offset, dtype)`
+            and `('decode_times', units, calendar)`.
+        """
+        self.array = array
+        self.steps = list(steps)
+
+        dtype = array.dtype
+        shape = array.shape
+        for step in self.steps:
+            name = step[0]
+            if name == 'concat_characters':
+                if shape:
+                    dtype = np.dtype('S' + str(shape[-1]))
+                    shape = shape[:-1]
+            elif name == 'mask_and_scale':
+                dtype = np.dtype(step[4])
+            elif name == 'decode_times':
+                dtype = np.dtype('datetime64[ns]')
+            else:
+                raise ValueError('unknown decoding step %r' % name)
+        self._dtype = dtype
+        self._shape = shape
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def shape(self):
+        return self._shape
+
+    def __repr__(self):
+        return '%s(%r, steps=%r)' % (type(self).__name__, self.array,
+                                     self.steps)
+
+    def __getitem__(self, key):
+        if self.array.ndim > len(self.shape):
+            # characters are always concatenated along the full last dimension
+            key = indexing.expanded_indexer(key, self.ndim) + (slice(None),)
+        values = self.array[key]
+        for step in self.steps:
+            name = step[0]
+            if name == 'concat_characters':
+                if np.ndim(values) > 0:
+                    values = char_to_string(values)
+            elif name == 'mask_and_scale':
+                values = mask_and_scale(values, *step[1:])
+            else:
+                values = decode_cf_datetime(values, *step[1:])
+        return values
+
+
 def string_to_char(arr):
     """Like netCDF4.stringtochar, but faster and more flexible.
     """
@@ -344,7 +671,9 @@ def char_to_string(arr):
     """Like netCDF4.chartostring, but faster and more flexible.
     """
     # based on: http://stackoverflow.com/a/10984878/809705
-    arr = np.asarray(arr)
+    # (records of netCDF3 record variables are interleaved, so they need to be
+    # copied into a contiguous array before they can be viewed as strings)
+    arr = np.ascontiguousarray(arr)
     kind = arr.dtype.kind
     if kind not in ['U', 'S']:
         raise ValueError('argument must be a string')
@@ -412,7 +741,7 @@ def encode_cf_variable(var):
 
 
 def decode_cf_variable(var, concat_characters=True, mask_and_scale=True,
-                       decode_times=True):
+                       decode_times=True, mask_and_scale_dtype=None):
     # use _data instead of data so as not to trigger loading data
     var = xray.variable.as_variable(var)
     data = var._data
@@ -438,10 +767,14 @@ def decode_cf_variable(var, concat_characters=True, mask_and_scale=True,
             raise ValueError("Refused to overwrite dtype")
     encoding['dtype'] = data.dtype
 
+    # the decoding steps are collected into a single DecodedCFArray, so each
+    # read only fetches the original values once
+    steps = []
+
     if concat_characters:
         if data.dtype.kind == 'S' and data.dtype.itemsize == 1:
             dimensions = dimensions[:-1]
-            data = CharToStringArray(data)
+            steps.append(('concat_characters',))
 
     if mask_and_scale:
         fill_value = pop_to(attributes, encoding, '_FillValue')
@@ -449,21 +782,26 @@ def decode_cf_variable(var, concat_characters=True, mask_and_scale=True,
         add_offset = pop_to(attributes, encoding, 'add_offset')
         if ((fill_value is not None and not np.isnan(fill_value))
                 or scale_factor is not None or add_offset is not None):
-            data = MaskedAndScaledArray(data, fill_value, scale_factor,
-                                        add_offset)
+            dtype = _mask_and_scale_dtype(mask_and_scale_dtype, data.dtype,
+                                          scale_factor, add_offset)
+            steps.append(('mask_and_scale', fill_value, scale_factor,
+                          add_offset, dtype))
 
     if decode_times:
         if 'units' in attributes and 'since' in attributes['units']:
             units = pop_to(attributes, encoding, 'units')
             calendar = pop_to(attributes, encoding, 'calendar')
-            data = DecodedCFDatetimeArray(data, units, calendar)
+            steps.append(('decode_times', units, calendar))
+
+    if steps:
+        data = DecodedCFArray(data, steps)
 
     return xray.Variable(dimensions, indexing.LazilyIndexedArray(data),
                          attributes, encoding=encoding)
 
 
 def decode_cf_variables(variables, concat_characters=True, mask_and_scale=True,
-                        decode_times=True):
+                        decode_times=True, mask_and_scale_dtype=None):
     """Decode a bunch of CF variables together.
     """
     dimensions_used_by = defaultdict(list)
@@ -486,5 +824,6 @@ def decode_cf_variables(variables, concat_characters=True, mask_and_scale=True,
                   stackable(v.dimensions[-1]))
         new_vars[k] = decode_cf_variable(
             v, concat_characters=concat, mask_and_scale=mask_and_scale,
-            decode_times=decode_times)
+            decode_times=decode_times,
+            mask_and_scale_dtype=mask_and_scale_dtype)
     return new_vars
@@ -368,6 +368,15 @@ class DataArray(AbstractArray):
         self.dataset.load_data()
         return self
 
+    def deferred(self):
+        """Return a new DataArray whose element-wise arithmetic is deferred.
+
+        See `Variable.deferred` for details. Coordinates are never deferred.
+        """
+        ds = self.dataset.copy()
+        ds[self.name] = self.variable.deferred()
+        return ds[self.name]
+
     def copy(self, deep=True):
         """Returns a copy of this array.
 
@@ -775,16 +784,52 @@ class DataArray(AbstractArray):
     def _select_coordinates(self):
         return xray.Dataset(self.coordinates)
 
+    def _from_variable(self, new_var, name, other_coordinates=None):
+        """Create a new DataArray from the result of an operation on this
+        array (and possibly another array with `other_coordinates`, which
+        must already be checked for compatibility).
+
+        The existing Coordinate objects are reused, and the new dataset is
+        created without re-validating them, unless the result does not fit
+        these coordinates (in which case the slow path raises a useful
+        error).
+        """
+        variables = OrderedDict((dim, self.dataset.variables[dim])
+                                for dim in self.dimensions)
+        if other_coordinates is not None:
+            for k, v in iteritems(other_coordinates):
+                if k not in variables:
+                    variables[k] = v
+        for dim, size in zip(new_var.dimensions, new_var.shape):
+            if dim not in variables:
+                variables[dim] = variable.Coordinate(dim, np.arange(size))
+
+        if (name in variables
+                or not all(isinstance(v, variable.Coordinate)
+                           and v.dimensions == (k,)
+                           for k, v in iteritems(variables))
+                or any(variables[dim].shape[0] != size for dim, size
+                       in zip(new_var.dimensions, new_var.shape))):
+            ds = self._select_coordinates()
+            if other_coordinates is not None:
+                ds.merge(other_coordinates, inplace=True)
+            ds[name] = new_var
+            return ds[name]
+
+        dimensions = utils.SortedKeysDict(
+            dict((k, v.shape[0]) for k, v in iteritems(variables)))
+        variables[name] = new_var
+        ds = xray.Dataset._from_vars_and_dims(variables, dimensions)
+        return ds[name]
+
     def __array_wrap__(self, obj, context=None):
         new_var = self.variable.__array_wrap__(obj, context)
-        ds = self._select_coordinates()
         if (self.name,) == self.dimensions:
             # use a new name for coordinate variables
             name = None
         else:
             name = self.name
-        ds[name] = new_var
-        return ds[name]
+        return self._from_variable(new_var, name)
 
     @staticmethod
     def _unary_op(f):
@@ -796,10 +841,12 @@ class DataArray(AbstractArray):
     def _check_coordinates_compat(self, other):
         # TODO: possibly automatically select index intersection instead?
         if hasattr(other, 'coordinates'):
+            other_coords = other.coordinates
             for k, v in iteritems(self.coordinates):
-                if (k in other.coordinates
-                        and not v.equals(other.coordinates[k])):
-                    raise ValueError('coordinate %r is not aligned' % k)
+                if k in other_coords:
+                    other_coord = other_coords[k]
+                    if v is not other_coord and not v.equals(other_coord):
+                        raise ValueError('coordinate %r is not aligned' % k)
 
     @staticmethod
     def _binary_op(f, reflexive=False):
@@ -808,18 +855,16 @@ class DataArray(AbstractArray):
             # TODO: automatically group by other variable dimensions to allow
             # for broadcasting dimensions like 'dayofyear' against 'time'
             self._check_coordinates_compat(other)
-            ds = self._select_coordinates()
-            if hasattr(other, 'coordinates'):
-                ds.merge(other.coordinates, inplace=True)
             other_array = getattr(other, 'variable', other)
             if hasattr(other, 'name') or (self.name,) == self.dimensions:
                 name = None
             else:
                 name = self.name
-            ds[name] = (f(self.variable, other_array)
-                        if not reflexive
-                        else f(other_array, self.variable))
-            return ds[name]
+            new_var = (f(self.variable, other_array)
+                       if not reflexive
+                       else f(other_array, self.variable))
+            return self._from_variable(new_var, name,
+                                       getattr(other, 'coordinates', None))
         return func
 
     @staticmethod
@@ -22,7 +22,8 @@ from .pycompat import iteritems, itervalues, basestring
 
 
 def open_dataset(nc, decode_cf=True, mask_and_scale=True, decode_times=True,
-                 concat_characters=True, *args, **kwargs):
+                 concat_characters=True, variables=None, drop_variables=None,
+                 mask_and_scale_dtype=None, *args, **kwargs):
     """Load a dataset from a file or file-like object.
 
     Parameters
@@ -30,7 +31,8 @@ def open_dataset(nc, decode_cf=True, mask_and_scale=True, decode_times=True,
     nc : str or file
         Path to a netCDF4 file or an OpenDAP URL (opened with python-netCDF4)
         or a file object or string serialization of a netCDF3 file (opened with
-        scipy.io.netcdf).
+        scipy.io.netcdf, or with `backends.NetCDF3DataStore` if scipy is not
+        installed).
     decode_cf : bool, optional
         Whether to decode these variables, assuming they were saved according
         to CF conventions.
@@ -47,8 +49,21 @@ def open_dataset(nc, decode_cf=True, mask_and_scale=True, decode_times=True,
         form string arrays. Dimensions will only be concatenated over (and
         removed) if they have no corresponding variable and if they are only
         used as the last dimension of character arrays.
+    variables : str or sequence of str, optional
+        If provided, only load these variables (and the coordinates along
+        their dimensions). Other variables are never opened or decoded.
+    drop_variables : str or sequence of str, optional
+        If provided, do not load these variables.
+    mask_and_scale_dtype : np.dtype or 'auto', optional
+        Floating point dtype of variables decoded by `mask_and_scale`.
+        Defaults to float64. If 'auto', values packed into 8 or 16 bit
+        integers with float32 `scale_factor` and `add_offset` are decoded to
+        float32 (as recommended by the CF conventions), which halves their
+        memory use, and all other variables to float64.
     *args, **kwargs : optional
-        Format specific loading options passed on to the datastore.
+        Format specific loading options passed on to the datastore (e.g.,
+        `chunk_cache` to tune the HDF5 chunk cache of variables read with
+        netCDF4; see `backends.NetCDF4DataStore`).
 
     Returns
     -------
@@ -65,12 +80,128 @@ def open_dataset(nc, decode_cf=True, mask_and_scale=True, decode_times=True,
         store = backends.NetCDF4DataStore(nc, *args, **kwargs)
     else:
         # If nc is a file-like object we read it using
-        # the scipy.io.netcdf package
-        store = backends.ScipyDataStore(nc, *args, **kwargs)
+        # the scipy.io.netcdf package, or with numpy alone if scipy is not
+        # installed
+        try:
+            import scipy
+        except ImportError:
+            store = backends.NetCDF3DataStore(nc, *args, **kwargs)
+        else:
+            store = backends.ScipyDataStore(nc, *args, **kwargs)
     return Dataset.load_store(store, decode_cf=decode_cf,
                               mask_and_scale=mask_and_scale,
                               decode_times=decode_times,
-                              concat_characters=concat_characters)
+                              concat_characters=concat_characters,
+                              variables=variables,
+                              drop_variables=drop_variables,
+                              mask_and_scale_dtype=mask_and_scale_dtype)
+
+
+def open_mfdataset(paths, dimension='time', n_workers=None, **kwargs):
+    """Open multiple files as a single dataset, concatenated along a
+    dimension.
+
+    File headers are read in parallel with a pool of threads. Variables along
+    `dimension` are virtual concatenations of the lazily loaded variables in
+    each file, so their data is only read when indexed. All other variables
+    (and the global attributes) are taken from the first file, without
+    comparing them across files.
+
+    Parameters
+    ----------
+    paths : str or sequence of str
+        Either a glob pattern (e.g., "path/to/*.nc") or a sequence of paths
+        to files.
+    dimension : str, optional
+        Name of the dimension along which to concatenate the files. If each
+        file has a coordinate along this dimension, files are ordered by its
+        first value; otherwise, files are concatenated in the given order (or
+        sorted by name, for a glob pattern).
+    n_workers : int, optional
+        Maximum number of threads used to open files. Files are opened one at
+        a time if the concurrent.futures module is not available (on Python
+        2, it is provided by the futures backport).
+    **kwargs : optional
+        Additional arguments passed on to `open_dataset` for each file.
+
+    Returns
+    -------
+    dataset : Dataset
+        The newly created dataset.
+    """
+    if isinstance(paths, basestring):
+        import glob
+        paths = sorted(glob.glob(paths))
+    paths = list(paths)
+    if not paths:
+        raise IOError('no files to open')
+
+    def open_one(path):
+        return open_dataset(path, **kwargs)
+
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+    except ImportError:
+        # Python 2 without the futures backport
+        datasets = [open_one(p) for p in paths]
+    else:
+        with ThreadPoolExecutor(n_workers or min(len(paths), 32)) as pool:
+            datasets = list(pool.map(open_one, paths))
+
+    if all(dimension in ds.variables and ds[dimension].size
+           for ds in datasets):
+        order = np.argsort([ds.variables[dimension].values[0]
+                            for ds in datasets], kind='mergesort')
+        datasets = [datasets[n] for n in order]
+
+    first = datasets[0]
+    variables = OrderedDict()
+    for name, var in iteritems(first.variables):
+        if dimension not in var.dimensions:
+            variables[name] = var
+            continue
+        try:
+            to_concat = [ds.variables[name] for ds in datasets]
+        except KeyError:
+            raise ValueError('variable %r along dimension %r is not found in '
+                             'every file' % (name, dimension))
+        # variables that are not loaded yet are concatenated lazily
+        variables[name] = variable.Variable.concat(to_concat, dimension)
+    return Dataset(variables, first.attrs)
+
+
+def _as_name_list(names):
+    if names is None:
+        return []
+    if isinstance(names, basestring):
+        return [names]
+    return list(names)
+
+
+def _project_variables(variables, names=None, drop_names=None):
+    """Select variables from a (possibly lazy) mapping without accessing the
+    variables that are not selected.
+
+    The selected variables are the given names (or all variables if names is
+    None) plus the coordinates along their dimensions, excluding the names in
+    drop_names. The order of the original mapping is preserved.
+    """
+    if names is None and drop_names is None:
+        return variables
+    drop_names = set(_as_name_list(drop_names))
+    if names is None:
+        selected = set(k for k in variables if k not in drop_names)
+    else:
+        names = _as_name_list(names)
+        missing = [k for k in names if k not in variables]
+        if missing:
+            raise ValueError('variables not found: %s' % missing)
+        names = [k for k in names if k not in drop_names]
+        selected = set(names)
+        for k in names:
+            selected.update(d for d in variables[k].dimensions
+                            if d in variables and d not in drop_names)
+    return OrderedDict((k, variables[k]) for k in variables if k in selected)
 
 
 # list of attributes of pd.DatetimeIndex that are ndarrays of time info
@@ -210,6 +341,17 @@ def _calculate_dimensions(variables):
     return dimensions
 
 
+def _coordinate_dimensions(variables):
+    """Calculate the dimensions of a set of variables which are already known
+    to be consistent, from the sizes of their coordinate variables.
+
+    Every dimension of a Dataset has a coordinate variable, so this is much
+    cheaper than `_calculate_dimensions`, but it does no validation.
+    """
+    return SortedKeysDict(dict((k, v.size) for k, v in iteritems(variables)
+                               if v.dimensions == (k,)))
+
+
 def _get_dataset_vars_and_attrs(obj):
     """Returns the variables and attributes associated with a dataset
 
@@ -314,6 +456,27 @@ class Dataset(Mapping):
         self._dimensions = dimensions
         self._add_missing_coordinates()
 
+    @classmethod
+    def _from_vars_and_dims(cls, variables, dimensions, attributes=None):
+        """Create a new dataset from variables and dimensions which are
+        already known to be consistent, skipping __init__ to avoid costly
+        validation.
+
+        This is only for internal use: every variable must already be a
+        Variable (or a Coordinate, for each dimension), and `dimensions` must
+        give the size of each dimension of the variables. Neither argument is
+        copied.
+        """
+        obj = cls.__new__(cls)
+        if not isinstance(variables, VariablesDict):
+            variables = VariablesDict(variables)
+        obj._variables = variables
+        obj._dimensions = dimensions
+        obj._attributes = OrderedDict()
+        if attributes is not None:
+            obj._attributes.update(attributes)
+        return obj
+
     def _set_init_vars_and_dims(self, variables):
         """Set the initial value of Dataset variables and dimensions
         """
@@ -322,15 +485,22 @@ class Dataset(Mapping):
 
     @classmethod
     def load_store(cls, store, decode_cf=True, mask_and_scale=True,
-                   decode_times=True, concat_characters=True):
+                   decode_times=True, concat_characters=True, variables=None,
+                   drop_variables=None, mask_and_scale_dtype=None):
         """Create a new dataset from the contents of a backends.*DataStore
         object
+
+        If `variables` is provided, only these variables and the coordinates
+        along their dimensions are loaded from the store; variables in
+        `drop_variables` are never loaded.
         """
-        variables = store.variables
+        variables = _project_variables(store.variables, variables,
+                                       drop_variables)
         if decode_cf:
             variables = conventions.decode_cf_variables(
-                store.variables, mask_and_scale=mask_and_scale,
-                decode_times=decode_times, concat_characters=concat_characters)
+                variables, mask_and_scale=mask_and_scale,
+                decode_times=decode_times, concat_characters=concat_characters,
+                mask_and_scale_dtype=mask_and_scale_dtype)
         return cls(variables, store.attrs)
 
     @property
@@ -401,12 +571,8 @@ class Dataset(Mapping):
                                       for k, v in iteritems(self.variables))
         else:
             variables = self._variables.copy()
-        # skip __init__ to avoid costly validation
-        obj = self.__new__(type(self))
-        obj._variables = variables
-        obj._dimensions = self._dimensions.copy()
-        obj._attributes = self._attributes.copy()
-        return obj
+        return self._from_vars_and_dims(variables, self._dimensions.copy(),
+                                        self._attributes)
 
     def __copy__(self):
         return self.copy(deep=False)
@@ -606,7 +772,45 @@ class Dataset(Mapping):
             var_indexers = {k: v for k, v in iteritems(indexers)
                             if k in var.dimensions}
             variables[name] = var.indexed(**var_indexers)
-        return type(self)(variables, self.attrs)
+        if indexers:
+            dimensions = _coordinate_dimensions(variables)
+        else:
+            dimensions = self._dimensions.copy()
+        return self._from_vars_and_dims(variables, dimensions, self.attrs)
+
+    def iter_chunks(self, dimension, chunksize=None):
+        """Iterate over blocks of this dataset along one dimension, aligned
+        to the chunks of its variables.
+
+        Parameters
+        ----------
+        dimension : str
+            Name of the dimension to split into blocks.
+        chunksize : int, optional
+            Length of each block along `dimension`. By default, the largest
+            native chunk size along `dimension` of any variable (from
+            `encoding['chunksizes']`) is used, or the dataset is yielded as a
+            single block if no variable is chunked.
+
+        Yields
+        ------
+        indexer : slice
+            Indexer for the block along `dimension`, such that `block` is
+            `self.indexed(**{dimension: indexer})`.
+        block : Dataset
+            Block of this dataset. Data which has not yet been loaded into
+            memory is only loaded for this block when it is accessed.
+        """
+        size = self.dimensions[dimension]
+        if chunksize is None:
+            chunksize = max([var.encoding['chunksizes'][
+                                 var.dimensions.index(dimension)]
+                             for var in itervalues(self.variables)
+                             if dimension in var.dimensions
+                             and var.encoding.get('chunksizes')] or [size])
+        for start in range(0, size, max(chunksize, 1)):
+            indexer = slice(start, start + chunksize)
+            yield indexer, self.indexed(**{dimension: indexer})
 
     def labeled(self, **indexers):
         """Return a new dataset with each variable indexed by coordinate labels
@@ -768,8 +972,14 @@ class Dataset(Mapping):
                         hasattr(new_var, 'values')):
                     new_var = variable.Coordinate(var.dimensions, new_var,
                                                   var.attrs, var.encoding)
-                elif copy:
-                    new_var = variable.as_variable(new_var).copy()
+                else:
+                    new_var = _as_dataset_variable(name, new_var)
+                    if new_var.dimensions != (name,):
+                        raise ValueError('new coordinate %r must be '
+                                         'one-dimensional along %r'
+                                         % (name, name))
+                    if copy:
+                        new_var = new_var.copy()
             else:
                 assign_to = var_indexers(var, to_indexers)
                 assign_from = var_indexers(var, from_indexers)
@@ -795,7 +1005,8 @@ class Dataset(Mapping):
                     # we neither created a new ndarray nor used fancy indexing
                     new_var = var.copy() if copy else var
             variables[name] = new_var
-        return type(self)(variables, self.attrs)
+        return self._from_vars_and_dims(
+            variables, _coordinate_dimensions(variables), self.attrs)
 
     def rename(self, name_dict):
         """Returns a new object with renamed variables and dimensions.
@@ -822,7 +1033,15 @@ class Dataset(Mapping):
             var = v.copy(deep=False)
             var.dimensions = dims
             variables[name] = var
-        return type(self)(variables, self.attrs)
+
+        dimensions = SortedKeysDict()
+        for k, size in iteritems(self.dimensions):
+            dimensions[name_dict.get(k, k)] = size
+        if (len(variables) < len(self.variables)
+                or len(dimensions) < len(self.dimensions)):
+            # names collided, so the new variables need to be validated
+            return type(self)(variables, self.attrs)
+        return self._from_vars_and_dims(variables, dimensions, self.attrs)
 
     def update(self, other, inplace=True):
         """Update this dataset's variables and attributes with those from
@@ -926,8 +1145,20 @@ class Dataset(Mapping):
             The returned object has the same attributes as the original. Only
             the names variables and their coordinates are included.
         """
-        variables = OrderedDict((k, self[k]) for k in names)
-        return type(self)(variables, self.attrs)
+        variables = OrderedDict()
+        for name in names:
+            if name not in self and name not in self.virtual_variables:
+                raise ValueError('name %r must be a variable in dataset %s'
+                                 % (name, self))
+            var = self.variables[name]
+            for dim in var.dimensions:
+                if dim != name and dim not in variables:
+                    variables[dim] = self.variables[dim]
+            variables[name] = var
+        dimensions = SortedKeysDict(dict((k, v) for k, v in
+                                         iteritems(self.dimensions)
+                                         if k in variables))
+        return self._from_vars_and_dims(variables, dimensions, self.attrs)
 
     def unselect(self, *names):
         """Returns a new dataset without the named variables.
@@ -952,7 +1183,10 @@ class Dataset(Mapping):
                  if any(name in v.dimensions for name in names)}
         variables = OrderedDict((k, v) for k, v in iteritems(self.variables)
                                 if k not in drop)
-        return type(self)(variables, self.attrs)
+        dimensions = SortedKeysDict(dict((k, v) for k, v in
+                                         iteritems(self.dimensions)
+                                         if k not in drop))
+        return self._from_vars_and_dims(variables, dimensions, self.attrs)
 
     def groupby(self, group, squeeze=True):
         """Group this dataset by unique values of the indicated group.
@@ -1159,13 +1393,19 @@ class Dataset(Mapping):
         else:
             concat_over = set(concat_over)
 
+        # compare variables with cheap checks (identity, shape and cached
+        # content digests) before resorting to comparing all their values
+        checker = variable._EqualityChecker()
+
         # add variables to concat_over depending on the mode
         if mode == 'different':
             def differs(vname, v):
                 # simple helper function which compares a variable
                 # across all datasets and indicates whether that
-                # variable differs or not.
-                return any(not ds[vname].equals(v) for ds in datasets[1:])
+                # variable differs or not. Coordinates of the variable
+                # which differ are caught by the compatibility check below.
+                return any(not checker.equals(ds.variables[vname], v)
+                           for ds in datasets[1:])
             non_coords = iteritems(datasets[0].noncoordinates)
             # all noncoordinates that are not the same in each dataset
             concat_over.update(k for k, v in non_coords if differs(k, v))
@@ -1208,7 +1448,7 @@ class Dataset(Mapping):
                 if k not in concatenated and k not in concat_over:
                     raise ValueError('encountered unexpected variable %r' % k)
                 elif (k in concatenated and k != dim_name and
-                          not getattr(v, compat)(concatenated[k])):
+                          not getattr(checker, compat)(v, concatenated[k])):
                     verb = 'equal' if compat == 'equals' else compat
                     raise ValueError(
                         'variable %r not %s across datasets' % (k, verb))
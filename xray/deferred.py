@@ -0,0 +1,304 @@
+"""Deferred evaluation of element-wise arithmetic on Variable objects.
+
+Operations on deferred variables (see `Variable.deferred`) are recorded in an
+expression graph instead of being computed immediately. The graph is
+evaluated in a single fused pass over cache-sized blocks when its values are
+needed, so no full-size temporary arrays are created for intermediate
+results.
+"""
+import itertools
+
+import numpy as np
+
+from . import indexing
+from . import utils
+from .ops import UNARY_OPS, CMP_BINARY_OPS, NUM_BINARY_OPS
+
+
+# number of elements in each block of a fused evaluation: the temporary
+# arrays for one block should fit in the CPU cache
+BLOCK_SIZE = 2 ** 16
+
+# numpy methods which act element-wise, so they can be deferred
+ELEMENTWISE_METHODS = ['astype', 'clip', 'conj', 'conjugate', 'round']
+
+_NUMEXPR_OPS = {'add': '+', 'sub': '-', 'mul': '*', 'truediv': '/',
+                'pow': '**', 'lt': '<', 'le': '<=', 'eq': '==', 'ne': '!=',
+                'ge': '>=', 'gt': '>'}
+_NUMEXPR_DTYPES = set(map(np.dtype, [bool, np.int32, np.int64, np.float32,
+                                     np.float64, np.complex128]))
+
+
+class _Leaf(object):
+    """An array in an expression graph. `axes` gives the axis of the result
+    corresponding to each axis of the array"""
+    def __init__(self, array, axes):
+        self.array = array
+        self.axes = tuple(axes)
+
+
+class _Apply(object):
+    """A function applied element-wise to the results of other nodes"""
+    def __init__(self, func, args, extra_args=(), kwargs=None):
+        self.func = func
+        self.args = list(args)
+        self.extra_args = tuple(extra_args)
+        self.kwargs = {} if kwargs is None else kwargs
+
+    @property
+    def name(self):
+        return self.func.__name__.strip('_')
+
+
+def _remap(node, axes):
+    """Return a copy of an expression graph with the axes of its leaves
+    moved according to `axes`"""
+    if isinstance(node, _Leaf):
+        return _Leaf(node.array, [axes[a] for a in node.axes])
+    elif isinstance(node, _Apply):
+        return _Apply(node.func, [_remap(arg, axes) for arg in node.args],
+                      node.extra_args, node.kwargs)
+    else:
+        return node
+
+
+def _evaluate(node, read):
+    if isinstance(node, _Leaf):
+        return read(node)
+    elif isinstance(node, _Apply):
+        args = [_evaluate(arg, read) for arg in node.args]
+        return node.func(*(args + list(node.extra_args)), **node.kwargs)
+    else:
+        return node
+
+
+def _numexpr_expression(node, names):
+    """Translate an expression graph into a numexpr expression string, or
+    return None if it uses operations which numexpr does not support.
+
+    `names` is a dictionary which is filled with the leaves and constants
+    referred to in the expression.
+    """
+    if isinstance(node, _Leaf):
+        if node.array.dtype not in _NUMEXPR_DTYPES:
+            return None
+        name = 'x%s' % len(names)
+        names[name] = node
+        return name
+    elif isinstance(node, _Apply):
+        if node.extra_args or node.kwargs:
+            return None
+        args = [_numexpr_expression(arg, names) for arg in node.args]
+        if any(arg is None for arg in args):
+            return None
+        if node.name == 'neg':
+            return '(-%s)' % args[0]
+        elif node.name == 'pos':
+            return args[0]
+        elif node.name == 'abs':
+            return 'abs(%s)' % args[0]
+        elif node.name in _NUMEXPR_OPS and len(args) == 2:
+            return '(%s %s %s)' % (args[0], _NUMEXPR_OPS[node.name], args[1])
+        return None
+    else:
+        if np.asarray(node).dtype not in _NUMEXPR_DTYPES:
+            return None
+        name = 'x%s' % len(names)
+        names[name] = node
+        return name
+
+
+def _block_shape(shape, block_size):
+    """Shape of the blocks used to evaluate an array of the given shape, such
+    that each block has at most `block_size` elements (unless blocks of a
+    single element along all but the last axis are still larger)"""
+    chunks = []
+    size = 1
+    for length in reversed(shape):
+        chunk = max(1, min(length, block_size // size))
+        chunks.append(chunk)
+        size *= chunk
+    return tuple(reversed(chunks))
+
+
+def _as_slice_if_unit_step(indices):
+    if indices.size and (indices.size == 1 or (np.diff(indices) == 1).all()):
+        return slice(int(indices[0]), int(indices[-1]) + 1)
+    return indices
+
+
+class DeferredArray(utils.NDArrayMixin):
+    """Array whose values are given by an unevaluated expression graph.
+
+    Indexing with an orthogonal key evaluates the expression on the selected
+    values only, reading the arrays in the graph block by block. Wrap this
+    object in a LazilyIndexedArray to make indexing lazy.
+    """
+    def __init__(self, node, shape, dtype=None):
+        self.node = node
+        self._shape = tuple(shape)
+        if dtype is None:
+            dtype = self._infer_dtype()
+        self._dtype = np.dtype(dtype)
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    def _infer_dtype(self):
+        # evaluate the expression on one element of each array, so numpy's
+        # casting rules (including value based casting for scalars and
+        # 0-dimensional arrays) are applied exactly as for eager arithmetic
+        def read(leaf):
+            if not leaf.axes:
+                return np.asarray(leaf.array[()])
+            return np.ones(1, dtype=leaf.array.dtype)
+        with np.errstate(all='ignore'):
+            return np.asarray(_evaluate(self.node, read)).dtype
+
+    def evaluate(self, key=Ellipsis, block_size=None, use_numexpr=None):
+        """Evaluate the expression for the values selected by an orthogonal
+        indexer, in a fused pass over blocks of at most `block_size` elements.
+
+        Parameters
+        ----------
+        key : indexer, optional
+            Orthogonal indexer of integers, slices and 1-dimensional integer
+            arrays selecting the values to evaluate. By default, all values
+            are evaluated.
+        block_size : int, optional
+            Number of elements in each block. Defaults to `BLOCK_SIZE`.
+        use_numexpr : bool, optional
+            Whether to evaluate each block with numexpr, if it is installed
+            and supports all operations in the expression. By default, numexpr
+            is used if possible.
+
+        Returns
+        -------
+        values : np.ndarray
+        """
+        if block_size is None:
+            block_size = BLOCK_SIZE
+        key = indexing.canonicalize_indexer(key, self.ndim)
+
+        # indices of the selected values along each axis which is not
+        # removed by an integer key
+        axes = [n for n, k in enumerate(key)
+                if not isinstance(k, (int, np.integer))]
+        indices = [np.arange(self.shape[n])[key[n]] for n in axes]
+        out = np.empty([i.size for i in indices], dtype=self.dtype)
+
+        expression = None
+        names = {}
+        if use_numexpr or use_numexpr is None:
+            try:
+                import numexpr
+            except ImportError:
+                if use_numexpr:
+                    raise
+            else:
+                expression = _numexpr_expression(self.node, names)
+
+        chunks = _block_shape(out.shape, block_size)
+        starts = [range(0, size, chunk)
+                  for size, chunk in zip(out.shape, chunks)]
+        for start in itertools.product(*starts):
+            out_key = tuple(slice(s, s + c) for s, c in zip(start, chunks))
+            block_key = list(key)
+            for n, idx, k in zip(axes, indices, out_key):
+                block_key[n] = _as_slice_if_unit_step(idx[k])
+
+            def read(leaf):
+                values = np.asarray(leaf.array[tuple(block_key[a]
+                                                     for a in leaf.axes)])
+                present = [a for a in leaf.axes if a in axes]
+                values = values.transpose(np.argsort(present))
+                shape = [values.shape[sorted(present).index(a)]
+                         if a in present else 1 for a in axes]
+                return values.reshape(shape)
+
+            if expression is not None:
+                local_dict = dict((k, read(v) if isinstance(v, _Leaf) else v)
+                                  for k, v in names.items())
+                out[out_key] = numexpr.evaluate(expression, local_dict)
+            else:
+                out[out_key] = _evaluate(self.node, read)
+        return out
+
+    def __getitem__(self, key):
+        return self.evaluate(key)
+
+    def __repr__(self):
+        return '%s(shape=%r, dtype=%r)' % (type(self).__name__, self.shape,
+                                           self.dtype)
+
+
+def as_deferred(data):
+    """Wrap orthogonally indexable array data into a lazily indexed
+    DeferredArray"""
+    node = _Leaf(data, range(data.ndim))
+    return indexing.LazilyIndexedArray(DeferredArray(node, data.shape,
+                                                     data.dtype))
+
+
+def is_deferred(data):
+    """Whether Variable data is a (lazily indexed) DeferredArray"""
+    return (isinstance(data, indexing.LazilyIndexedArray)
+            and isinstance(data.array, DeferredArray))
+
+
+def _is_full_key(key):
+    return all(isinstance(k, slice) and k == slice(None) for k in key)
+
+
+def leaf_array(data):
+    """Return the array wrapped by deferred data if no operations or indexing
+    have been applied to it, or None otherwise"""
+    node = data.array.node
+    if (isinstance(node, _Leaf) and _is_full_key(data.key)
+            and node.axes == tuple(range(len(node.axes)))):
+        return node.array
+    return None
+
+
+def _as_node(data, axes):
+    if is_deferred(data) and _is_full_key(data.key):
+        # inline the graph of deferred operands, so it's evaluated in the same
+        # fused pass
+        return _remap(data.array.node, axes)
+    return _Leaf(data, axes)
+
+
+def unary_op(func, data, args=(), kwargs=None):
+    """Defer an element-wise unary operation on orthogonally indexable data,
+    returning new (lazily indexed) data"""
+    node = _Apply(func, [_as_node(data, range(data.ndim))], args, kwargs)
+    return indexing.LazilyIndexedArray(DeferredArray(node, data.shape))
+
+
+def binary_op(func, first, first_dims, second, second_dims, dimensions,
+              shape, reflexive=False):
+    """Defer an element-wise binary operation on orthogonally indexable data,
+    broadcast according to the dimension names of both operands.
+
+    `second_dims` should be None if `second` is a scalar constant. Returns new
+    (lazily indexed) data with the given `dimensions` and `shape`.
+    """
+    positions = dict((d, n) for n, d in enumerate(dimensions))
+    args = [_as_node(first, [positions[d] for d in first_dims])]
+    if second_dims is None:
+        args.append(second)
+    else:
+        args.append(_as_node(second, [positions[d] for d in second_dims]))
+    if reflexive:
+        args.reverse()
+    node = _Apply(func, args)
+    return indexing.LazilyIndexedArray(DeferredArray(node, shape))
+
+
+DEFERRED_OPS = set(UNARY_OPS + CMP_BINARY_OPS + NUM_BINARY_OPS
+                   + ELEMENTWISE_METHODS)
@@ -1,3 +1,4 @@
+import functools
 import itertools
 try:  # Python 2
     from itertools import izip
@@ -5,11 +6,59 @@ except ImportError: # Python 3
     izip = zip
 
 from .common import ImplementsReduce
-from .ops import inject_reduce_methods
+from .ops import inject_reduce_methods, NUMPY_REDUCE_METHODS
+from .pycompat import basestring
 import xray
 import numpy as np
 
 
+def _group_indices_from_codes(codes, num_groups):
+    """Given integer group codes (as returned by
+    `np.unique(..., return_inverse=True)`), return a list of the integer
+    indices belonging to each group.
+
+    The indices are found with a single stable sort of the codes, so each
+    group's indices are a slice of one sorted array of element positions (a
+    view, not a copy). Groups whose elements are evenly spaced (e.g., because
+    they are contiguous) are instead given by `slice` objects, so indexing
+    with them results in views instead of copies.
+    """
+    codes = np.asarray(codes)
+    order = np.argsort(codes, kind='mergesort')
+    counts = np.bincount(codes, minlength=num_groups)
+    stops = np.cumsum(counts)
+    starts = stops - counts
+
+    nonempty = counts > 0
+    first = np.zeros(num_groups, dtype=order.dtype)
+    last = np.zeros(num_groups, dtype=order.dtype)
+    first[nonempty] = order[starts[nonempty]]
+    last[nonempty] = order[stops[nonempty] - 1]
+
+    # the stable sort keeps the indices within each group in ascending order,
+    # so a group is evenly spaced if every difference between its consecutive
+    # indices is equal to the first one
+    diffs = np.diff(order)
+    sorted_codes = codes[order]
+    within_group = sorted_codes[1:] == sorted_codes[:-1]
+    steps = np.ones(num_groups, dtype=order.dtype)
+    multiple = counts > 1
+    steps[multiple] = diffs[starts[multiple]]
+    irregular = within_group & (diffs != steps[sorted_codes[:-1]])
+    regular = nonempty & (np.bincount(sorted_codes[:-1][irregular],
+                                      minlength=num_groups) == 0)
+
+    groups = []
+    for g in range(num_groups):
+        if regular[g]:
+            step = int(steps[g])
+            groups.append(slice(int(first[g]), int(last[g]) + 1,
+                                step if step != 1 else None))
+        else:
+            groups.append(order[starts[g]:stops[g]])
+    return groups
+
+
 def unique_value_groups(ar):
     """Group an array by its unique values.
 
@@ -22,17 +71,305 @@ def unique_value_groups(ar):
     -------
     values : np.ndarray
         Sorted, unique values as returned by `np.unique`.
-    indices : list of lists of int
+    indices : list of slices or 1d integer arrays
         Each element provides the integer indices in `ar` with values given by
-        the corresponding value in `unique_values`.
+        the corresponding value in `unique_values`, as a slice if these
+        indices are contiguous.
     """
     values, inverse = np.unique(ar, return_inverse=True)
-    groups = [[] for _ in range(len(values))]
-    for n, g in enumerate(inverse):
-        groups[g].append(n)
+    groups = _group_indices_from_codes(inverse, len(values))
     return values, groups
 
 
+# map from numpy reduction functions to their names, so we can recognize when
+# a function passed to reduce can be handled by `grouped_reduce`
+_NUMPY_REDUCE_NAMES = dict((getattr(np, name), name)
+                           for name in NUMPY_REDUCE_METHODS)
+
+GROUPED_REDUCE_METHODS = frozenset(['all', 'any', 'max', 'mean', 'min',
+                                    'prod', 'ptp', 'std', 'sum', 'var'])
+
+
+def _float_dtype(dtype):
+    """Return the floating point dtype numpy uses for the mean of an array of
+    the given dtype"""
+    return np.dtype(float) if dtype.kind in 'biu' else dtype
+
+
+def grouped_reduce(values, codes, num_groups, name, axis=0, ddof=0):
+    """Reduce an array along one axis separately for every group, in a single
+    vectorized pass.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Array of values to reduce.
+    codes : np.ndarray
+        1-dimensional array of integer group codes (as returned by
+        `np.unique(..., return_inverse=True)`), with one entry for each
+        element of `values` along `axis`. Every code in `range(num_groups)`
+        must appear at least once.
+    num_groups : int
+        Number of groups.
+    name : str
+        Name of the reduction to calculate. Must be one of
+        `GROUPED_REDUCE_METHODS`, or 'count' for the number of values in each
+        group.
+    axis : int, optional
+        Axis along which to reduce.
+    ddof : int, optional
+        Delta degrees of freedom for 'var' and 'std'.
+
+    Returns
+    -------
+    reduced : np.ndarray
+        Array with the same shape as `values`, except with length `num_groups`
+        along `axis`. The values should match calling the corresponding numpy
+        function on each group separately.
+    """
+    if name not in GROUPED_REDUCE_METHODS and name != 'count':
+        raise ValueError('grouped reduction %r not supported' % name)
+    values = np.asarray(values)
+    codes = np.asarray(codes)
+    axis = axis % values.ndim
+
+    if (codes[1:] < codes[:-1]).any():
+        # sort the values into contiguous groups, so each group can be reduced
+        # with ufunc.reduceat
+        order = np.argsort(codes, kind='mergesort')
+        values = values.take(order, axis=axis)
+    # otherwise the groups are already contiguous (e.g., grouping by month
+    # along a sorted time axis), so we can reduce the original values without
+    # a copy
+    counts = np.bincount(codes, minlength=num_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    count_shape = [1] * values.ndim
+    count_shape[axis] = num_groups
+    counts_b = counts.reshape(count_shape)
+
+    def reduceat(ufunc, arr, dtype=None):
+        return ufunc.reduceat(arr, starts, axis=axis, dtype=dtype)
+
+    if name == 'count':
+        shape = list(values.shape)
+        shape[axis] = num_groups
+        result = np.empty(shape, dtype=int)
+        result[...] = counts_b
+    elif name == 'sum':
+        dtype = np.sum(values[:0], axis=0).dtype
+        result = reduceat(np.add, values, dtype)
+    elif name == 'prod':
+        dtype = np.prod(values[:0], axis=0).dtype
+        result = reduceat(np.multiply, values, dtype)
+    elif name == 'min':
+        result = reduceat(np.minimum, values)
+    elif name == 'max':
+        result = reduceat(np.maximum, values)
+    elif name == 'ptp':
+        result = reduceat(np.maximum, values) - reduceat(np.minimum, values)
+    elif name == 'all':
+        result = reduceat(np.logical_and, values)
+    elif name == 'any':
+        result = reduceat(np.logical_or, values)
+    else:
+        dtype = _float_dtype(values.dtype)
+        mean = reduceat(np.add, values, dtype) / counts_b
+        if name == 'mean':
+            result = mean
+        else:
+            deviations = values - np.repeat(mean, counts, axis=axis)
+            deviations *= deviations
+            result = reduceat(np.add, deviations) / (counts_b - ddof)
+            if name == 'std':
+                result = np.sqrt(result)
+        result = result.astype(dtype, copy=False)
+    return result
+
+
+# Approximate number of bytes to load at once when streaming a grouped
+# reduction over an array which is not yet loaded into memory
+STREAMING_CHUNK_BYTES = 2 ** 26
+
+_MERGE_UFUNCS = {'sum': np.add, 'prod': np.multiply,
+                 'min': np.minimum, 'max': np.maximum,
+                 'all': np.logical_and, 'any': np.logical_or}
+
+
+def _partial_grouped_reduce(values, codes, num_groups, name, axis):
+    """Calculate the intermediate state of a streaming grouped reduction for
+    one chunk of values, as a tuple of arrays"""
+    if name in ['mean', 'var', 'std']:
+        count = grouped_reduce(values, codes, num_groups, 'count', axis)
+        mean = grouped_reduce(values, codes, num_groups, 'mean', axis)
+        m2 = grouped_reduce(values, codes, num_groups, 'var', axis) * count
+        return count, mean, m2
+    elif name == 'ptp':
+        return (grouped_reduce(values, codes, num_groups, 'min', axis),
+                grouped_reduce(values, codes, num_groups, 'max', axis))
+    else:
+        return (grouped_reduce(values, codes, num_groups, name, axis),)
+
+
+def _merge_moments(a, b):
+    """Combine the counts, means and sums of squared deviations from the mean
+    of two sets of observations, with the pairwise update of Chan et al.
+    (1979)"""
+    count_a, mean_a, m2_a = a
+    count_b, mean_b, m2_b = b
+    count = count_a + count_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * np.true_divide(count_b, count)
+    m2 = m2_a + m2_b + delta ** 2 * np.true_divide(count_a * count_b, count)
+    return count, mean, m2
+
+
+def _merge_partials(name, a, b):
+    """Combine the intermediate states of a streaming grouped reduction for
+    two chunks of values"""
+    if name in ['mean', 'var', 'std']:
+        return _merge_moments(a, b)
+    elif name == 'ptp':
+        return np.minimum(a[0], b[0]), np.maximum(a[1], b[1])
+    else:
+        return (_MERGE_UFUNCS[name](a[0], b[0]),)
+
+
+def _finalize_partial(name, state, dtype, ddof=0):
+    if name in ['mean', 'var', 'std']:
+        count, mean, m2 = state
+        if name == 'mean':
+            result = mean
+        else:
+            result = m2 / (count - ddof)
+            if name == 'std':
+                result = np.sqrt(result)
+        return result.astype(_float_dtype(dtype), copy=False)
+    elif name == 'ptp':
+        return state[1] - state[0]
+    else:
+        return state[0]
+
+
+def streaming_grouped_reduce(chunks, num_groups, name, axis=0, ddof=0):
+    """Reduce an array along one axis separately for every group, one chunk
+    at a time.
+
+    Each chunk is reduced with `grouped_reduce` and folded into running
+    per-group accumulators (counts, sums, minima, maxima or means and sums of
+    squared deviations), so only one chunk of the array needs to be in memory
+    at once.
+
+    Parameters
+    ----------
+    chunks : iterable of (np.ndarray, np.ndarray)
+        Pairs of array values and their group codes, where each array of
+        values is a consecutive chunk of the full array along `axis`. All
+        chunks must have the same shape along the other axes.
+    num_groups : int
+        Total number of groups. Every code in `range(num_groups)` must
+        appear in at least one chunk.
+    name, axis, ddof :
+        See `grouped_reduce`.
+
+    Returns
+    -------
+    reduced : np.ndarray
+        The same result as calling `grouped_reduce` on the concatenated
+        chunks.
+    """
+    if name not in GROUPED_REDUCE_METHODS:
+        raise ValueError('grouped reduction %r not supported' % name)
+    state = None
+    for values, codes in chunks:
+        values = np.asarray(values)
+        axis = axis % values.ndim
+        present, codes = np.unique(codes, return_inverse=True)
+        if present.size == 0:
+            continue
+        partial = _partial_grouped_reduce(values, codes, present.size, name,
+                                          axis)
+
+        if state is None:
+            dtype = values.dtype
+            seen = np.zeros(num_groups, dtype=bool)
+            state = []
+            for array in partial:
+                shape = list(array.shape)
+                shape[axis] = num_groups
+                state.append(np.zeros(shape, dtype=array.dtype))
+
+        index = [slice(None)] * values.ndim
+        index[axis] = present
+        index = tuple(index)
+        merged = _merge_partials(name, [s[index] for s in state], partial)
+        # groups appearing for the first time take their values directly from
+        # this chunk
+        first_shape = [1] * values.ndim
+        first_shape[axis] = present.size
+        first = ~seen[present].reshape(first_shape)
+        for s, m, p in zip(state, merged, partial):
+            s[index] = np.where(first, p, m)
+        seen[present] = True
+
+    if state is None or not seen.all():
+        raise ValueError('every group must appear in at least one chunk')
+    return _finalize_partial(name, state, dtype, ddof)
+
+
+# GroupBy objects (and the functions to apply to them) shared with the worker
+# processes of a forked process pool. Workers inherit this dictionary via
+# fork, so they can index their groups directly out of the parent's
+# (copy-on-write) memory instead of receiving pickled copies of each group.
+_SHARED_GROUPBYS = {}
+_shared_groupby_tokens = itertools.count()
+
+
+def _apply_to_group(func, kwargs, obj):
+    return func(obj, **kwargs)
+
+
+def _apply_to_shared_group(token, n):
+    grouped, func, kwargs, shortcut = _SHARED_GROUPBYS[token]
+    indices = [grouped.group_indices[n]]
+    if shortcut:
+        obj, = grouped._iter_grouped_shortcut(indices)
+    else:
+        obj, = grouped._iter_grouped(indices)
+    return func(obj, **kwargs)
+
+
+def _import_futures():
+    try:
+        from concurrent import futures
+    except ImportError:
+        raise ImportError('parallel GroupBy.apply requires the '
+                          'concurrent.futures module (on Python 2, install '
+                          'the futures backport)')
+    return futures
+
+
+def _forked_process_pool(n_workers):
+    """Create a concurrent.futures.ProcessPoolExecutor whose worker processes
+    are created with fork"""
+    import multiprocessing
+    ProcessPoolExecutor = _import_futures().ProcessPoolExecutor
+    try:
+        context = multiprocessing.get_context('fork')
+    except AttributeError:
+        # Python 2: multiprocessing always uses fork on posix
+        return ProcessPoolExecutor(n_workers)
+    except ValueError:
+        raise ValueError("executor='process' requires a platform which "
+                         'supports creating processes with fork')
+    try:
+        return ProcessPoolExecutor(n_workers, mp_context=context)
+    except TypeError:
+        # Python < 3.7 does not support mp_context, but uses fork by default
+        # on posix
+        return ProcessPoolExecutor(n_workers)
+
+
 def peek_at(iterable):
     """Returns the first value from iterable, as well as a new iterable with
     the same content as the original iterable
@@ -99,9 +436,13 @@ class GroupBy(object):
                 # use slices to do views instead of fancy indexing
                 group_indices = [slice(i, i + 1) for i in group_indices]
             unique_coord = group_coord
+            group_codes = None
         else:
             # look through group_coord to find the unique values
-            unique_values, group_indices = unique_value_groups(group_coord)
+            unique_values, group_codes = np.unique(group_coord.values,
+                                                   return_inverse=True)
+            group_indices = _group_indices_from_codes(group_codes,
+                                                      len(unique_values))
             # TODO: switch this to using the new DataArray constructor when we
             # get around to writing it:
             # unique_coord = xary.DataArray(unique_values, name=group_coord.name)
@@ -110,6 +451,9 @@ class GroupBy(object):
 
         self.group_indices = group_indices
         self.unique_coord = unique_coord
+        # integer code of the group to which each element along group_dim
+        # belongs, if the group indices are not trivial
+        self._group_codes = group_codes
         self._groups = None
 
     @property
@@ -126,11 +470,56 @@ class GroupBy(object):
     def __iter__(self):
         return izip(self.unique_coord.values, self._iter_grouped())
 
-    def _iter_grouped(self):
+    def _iter_grouped(self, group_indices=None):
         """Iterate over each element in this group"""
-        for indices in self.group_indices:
+        if group_indices is None:
+            group_indices = self.group_indices
+        for indices in group_indices:
             yield self.obj.indexed(**{self.group_dim: indices})
 
+    def _map_groups(self, func, kwargs, shortcut=False, executor=None,
+                    n_workers=None):
+        """Call `func(obj, **kwargs)` on each grouped object, possibly in
+        parallel, and return an iterable of the results in order
+        """
+        if executor is None and n_workers is None:
+            if shortcut:
+                grouped = self._iter_grouped_shortcut()
+            else:
+                grouped = self._iter_grouped()
+            return (func(obj, **kwargs) for obj in grouped)
+
+        if n_workers is None:
+            import multiprocessing
+            n_workers = multiprocessing.cpu_count()
+
+        if executor == 'process':
+            token = next(_shared_groupby_tokens)
+            _SHARED_GROUPBYS[token] = (self, func, kwargs, shortcut)
+            try:
+                with _forked_process_pool(n_workers) as pool:
+                    call = functools.partial(_apply_to_shared_group, token)
+                    return list(pool.map(call, range(len(self))))
+            finally:
+                del _SHARED_GROUPBYS[token]
+
+        if shortcut:
+            grouped = self._iter_grouped_shortcut()
+        else:
+            grouped = self._iter_grouped()
+        call = functools.partial(_apply_to_group, func, kwargs)
+        if executor is None or executor == 'thread':
+            ThreadPoolExecutor = _import_futures().ThreadPoolExecutor
+            with ThreadPoolExecutor(n_workers) as pool:
+                return list(pool.map(call, grouped))
+        elif hasattr(executor, 'map'):
+            return list(executor.map(call, grouped))
+        else:
+            raise ValueError("executor must be 'thread', 'process' or an "
+                             'object with a map method like '
+                             'concurrent.futures.Executor; got %r'
+                             % (executor,))
+
     def _infer_concat_args(self, applied_example):
         if self.group_dim in applied_example.dimensions:
             concat_dim = self.group_coord
@@ -148,12 +537,14 @@ class GroupBy(object):
 class ArrayGroupBy(GroupBy, ImplementsReduce):
     """GroupBy object specialized to grouping DataArray objects
     """
-    def _iter_grouped_shortcut(self):
+    def _iter_grouped_shortcut(self, group_indices=None):
         """Fast version of `_iter_grouped` that yields Variables without
         metadata
         """
         from .variable import as_variable
         array = as_variable(self.obj)
+        if group_indices is None:
+            group_indices = self.group_indices
 
         # build the new dimensions
         if isinstance(self.group_indices[0], (int, np.integer)):
@@ -162,17 +553,26 @@ class ArrayGroupBy(GroupBy, ImplementsReduce):
         else:
             dims = array.dimensions
 
-        # slice the data and build the new Arrays directly
+        # slice the data and build the new Arrays directly. If the array is
+        # not yet loaded into memory, only load one group at a time.
+        if array._in_memory():
+            data = array.values
+        else:
+            data = array._data
         indexer = [slice(None)] * array.ndim
         group_axis = array.get_axis_num(self.group_dim)
-        for indices in self.group_indices:
+        for indices in group_indices:
             indexer[group_axis] = indices
-            data = array.values[tuple(indexer)]
-            yield xray.Variable(dims, data)
+            yield xray.Variable(dims, np.asarray(data[tuple(indexer)]))
 
     def _combine_shortcut(self, applied, concat_dim, indexers):
         stacked = xray.Variable.concat(
             applied, concat_dim, indexers, shortcut=True)
+        return self._wrap_stacked(stacked, concat_dim)
+
+    def _wrap_stacked(self, stacked, concat_dim):
+        """Wrap a stacked Variable into a DataArray with the metadata of the
+        grouped array"""
         stacked.attrs.update(self.obj.attrs)
 
         name = self.obj.name
@@ -198,7 +598,8 @@ class ArrayGroupBy(GroupBy, ImplementsReduce):
         new_order = sorted(stacked.dimensions, key=lookup_order)
         return stacked.transpose(*new_order)
 
-    def apply(self, func, shortcut=False, **kwargs):
+    def apply(self, func, shortcut=False, executor=None, n_workers=None,
+              **kwargs):
         """Apply a function over each array in the group and concatenate them
         together into a new array.
 
@@ -227,6 +628,21 @@ class ArrayGroupBy(GroupBy, ImplementsReduce):
             If these conditions are satisfied `shortcut` provides significant
             speedup. This should be the case for many common groupby operations
             (e.g., applying numpy ufuncs).
+        executor : {'thread', 'process'} or concurrent.futures.Executor, optional
+            If provided, call `func` on the groups in parallel. 'thread' uses
+            a pool of threads, which is a good choice if `func` spends most of
+            its time in numpy functions that release the GIL. 'process' uses
+            a pool of forked processes, which index their groups out of
+            memory shared with this process, so only the results of `func`
+            need to be pickled (`func` itself need not be picklable). Any
+            other object with a `map` method (like an existing executor) is
+            used to map `func` over the grouped arrays directly. Results are
+            always combined in the order of the groups. 'thread' and
+            'process' require the concurrent.futures module (on Python 2,
+            the futures backport).
+        n_workers : int, optional
+            Number of threads or processes to use. If provided without
+            `executor`, a thread pool is used. Defaults to the number of CPUs.
         **kwargs
             Used to call `func(ar, **kwargs)` for each array `ar.
 
@@ -235,11 +651,8 @@ class ArrayGroupBy(GroupBy, ImplementsReduce):
         applied : DataArray
             The result of splitting, applying and combining this array.
         """
-        if shortcut:
-            grouped = self._iter_grouped_shortcut()
-        else:
-            grouped = self._iter_grouped()
-        applied = (func(arr, **kwargs) for arr in grouped)
+        applied = self._map_groups(func, kwargs, shortcut, executor,
+                                   n_workers)
 
         # peek at applied to determine which coordinate to stack over
         applied_example, applied = peek_at(applied)
@@ -253,7 +666,7 @@ class ArrayGroupBy(GroupBy, ImplementsReduce):
         return reordered
 
     def reduce(self, func, dimension=None, axis=None, shortcut=True,
-               **kwargs):
+               chunksize=None, **kwargs):
         """Reduce the items in this group by applying `func` along some
         dimension(s).
 
@@ -269,6 +682,11 @@ class ArrayGroupBy(GroupBy, ImplementsReduce):
             Axis(es) over which to apply `func`. Only one of the 'dimension'
             and 'axis' arguments can be supplied. If neither are supplied, then
             `func` is calculated over all dimension for each group item.
+        chunksize : int, optional
+            Number of elements along the grouped dimension to load into memory
+            at once when streaming a reduction over an array which has not yet
+            been loaded (see Notes). By default, chunks of roughly
+            `STREAMING_CHUNK_BYTES` are used.
         **kwargs : dict
             Additional keyword arguments passed on to `func`.
 
@@ -277,11 +695,114 @@ class ArrayGroupBy(GroupBy, ImplementsReduce):
         reduced : Array
             Array with summarized data and the indicated dimension(s)
             removed.
+
+        Notes
+        -----
+        If `func` is one of the numpy reductions in `GROUPED_REDUCE_METHODS`
+        (e.g., `np.mean` or `np.std`) and the reduction is over the grouped
+        dimension, it is calculated for every group at once with vectorized
+        operations instead of by looping over the groups. If the array has not
+        yet been loaded into memory (e.g., because it was lazily loaded from a
+        netCDF file), it is read in chunks along the grouped dimension which
+        are folded into running per-group accumulators, so that the full array
+        is never loaded into memory at once.
         """
+        name = _NUMPY_REDUCE_NAMES.get(func)
+        if name in GROUPED_REDUCE_METHODS:
+            reduced = self._fast_reduce(name, dimension, axis, chunksize,
+                                        **kwargs)
+            if reduced is not None:
+                return reduced
+
         def reduce_array(ar):
             return ar.reduce(func, dimension, axis, **kwargs)
         return self.apply(reduce_array, shortcut=shortcut)
 
+    def _fast_reduce(self, name, dimension=None, axis=None, chunksize=None,
+                     **kwargs):
+        """Calculate a reduction over the group dimension for every group at
+        once with `grouped_reduce` (or `streaming_grouped_reduce`, if the
+        array is not in memory), instead of looping over the groups.
+
+        Returns None if this reduction cannot be vectorized, in which case the
+        caller should fall back to `apply`.
+        """
+        if self._group_codes is None:
+            return None
+        if set(kwargs) - set(['ddof']) or ('ddof' in kwargs
+                                           and name not in ['var', 'std']):
+            return None
+        if dimension is not None and axis is not None:
+            raise ValueError("cannot supply both 'axis' and 'dimension' "
+                             "arguments")
+
+        from .variable import as_variable
+        var = as_variable(self.obj)
+        if var.dtype.kind not in 'biuf':
+            return None
+
+        # every grouped array has the same dimensions as this array
+        if axis is not None:
+            reduce_dims = [var.dimensions[n] for n in np.atleast_1d(axis)]
+        elif dimension is None:
+            reduce_dims = list(var.dimensions)
+        elif isinstance(dimension, basestring):
+            reduce_dims = [dimension]
+        else:
+            reduce_dims = list(dimension)
+        if self.group_dim not in reduce_dims:
+            return None
+        other_dims = [d for d in var.dimensions
+                      if d in reduce_dims and d != self.group_dim]
+        # checks that each dimension exists
+        var.get_axis_num(reduce_dims)
+
+        keep_dims = [d for d in var.dimensions if d not in reduce_dims]
+        if other_dims:
+            dims = [self.group_dim] + keep_dims
+            group_axis = 0
+        else:
+            dims = list(var.dimensions)
+            group_axis = var.get_axis_num(self.group_dim)
+
+        def prepare(var, codes):
+            if other_dims:
+                # flatten the other reduced dimensions into the group
+                # dimension, so a single grouped reduction can handle all of
+                # them
+                transposed = var.transpose(*([self.group_dim] + other_dims
+                                             + keep_dims))
+                values = transposed.values
+                values = values.reshape((-1,) + values.shape[1 +
+                                                             len(other_dims):])
+                codes = np.repeat(codes, values.shape[0] // max(codes.size, 1))
+            else:
+                values = var.values
+            return values, codes
+
+        num_groups = self.unique_coord.size
+        codes = self._group_codes
+        if var._in_memory():
+            values, codes = prepare(var, codes)
+            data = grouped_reduce(values, codes, num_groups, name,
+                                  axis=group_axis, **kwargs)
+        else:
+            size = var.shape[var.get_axis_num(self.group_dim)]
+            if chunksize is None:
+                chunk_bytes = var.dtype.itemsize * var.size // max(size, 1)
+                chunksize = max(STREAMING_CHUNK_BYTES // max(chunk_bytes, 1),
+                                1)
+            chunks = (prepare(var.indexed(**{self.group_dim: k}).load_data(),
+                              codes[k])
+                      for k in (slice(start, start + chunksize)
+                                for start in range(0, size, chunksize)))
+            data = streaming_grouped_reduce(chunks, num_groups, name,
+                                            axis=group_axis, **kwargs)
+        dims[group_axis] = self.unique_coord.name
+        stacked = xray.Variable(dims, data)
+        combined = self._wrap_stacked(stacked, self.unique_coord)
+        return self._restore_dim_order(combined, self.unique_coord)
+
     _reduce_method_docstring = \
         """Reduce the items in this group by applying `{name}` along some
         dimension(s).
@@ -308,7 +829,7 @@ inject_reduce_methods(ArrayGroupBy)
 
 
 class DatasetGroupBy(GroupBy):
-    def apply(self, func, **kwargs):
+    def apply(self, func, executor=None, n_workers=None, **kwargs):
         """Apply a function over each Dataset in the group and concatenate them
         together into a new Dataset.
 
@@ -327,6 +848,12 @@ class DatasetGroupBy(GroupBy):
         ----------
         func : function
             Callable to apply to each sub-dataset.
+        executor : {'thread', 'process'} or concurrent.futures.Executor, optional
+            If provided, call `func` on the groups in parallel. See
+            `ArrayGroupBy.apply` for details.
+        n_workers : int, optional
+            Number of threads or processes to use. If provided without
+            `executor`, a thread pool is used. Defaults to the number of CPUs.
         **kwargs
             Used to call `func(ds, **kwargs)` for each sub-dataset `ar`.
 
@@ -335,7 +862,8 @@ class DatasetGroupBy(GroupBy):
         applied : Dataset
             The result of splitting, applying and combining this dataset.
         """
-        applied = [func(ds, **kwargs) for ds in self._iter_grouped()]
+        applied = list(self._map_groups(func, kwargs, executor=executor,
+                                        n_workers=n_workers))
         concat_dim, indexers = self._infer_concat_args(applied[0])
         combined = self._combine(applied, concat_dim, indexers)
         return combined
@@ -65,7 +65,7 @@ def orthogonal_indexer(key, shape):
     """
     def expand_key(k, length):
         if isinstance(k, slice):
-            return np.arange(k.start or 0, k.stop or length, k.step or 1)
+            return np.arange(*k.indices(length))
         else:
             return k
 
@@ -142,15 +142,17 @@ def slice_slice(old_slice, applied_slice, size):
     index it with another slice to return a new slice equivalent to applying
     the slices sequentially
     """
-    step = (old_slice.step or 1) * (applied_slice.step or 1)
-
-    # For now, use the hack of turning old_slice into an ndarray to reconstruct
-    # the slice start and stop. This is not entirely ideal, but it is still
-    # definitely better than leaving the indexer as an array.
-    items = _expand_slice(old_slice, size)[applied_slice]
-    if len(items) > 0:
-        start = items[0]
-        stop = items[-1] + step
+    # calculate the new slice arithmetically, instead of expanding the old
+    # slice into an array
+    old_start, old_stop, old_step = old_slice.indices(size)
+    old_size = len(xrange(old_start, old_stop, old_step))
+    start, stop, step = applied_slice.indices(old_size)
+    n_items = len(xrange(start, stop, step))
+
+    step = old_step * step
+    if n_items > 0:
+        start = old_start + start * old_step
+        stop = start + (n_items - 1) * step + step
         if stop < 0:
             stop = None
     else:
@@ -159,6 +161,31 @@ def slice_slice(old_slice, applied_slice, size):
     return slice(start, stop, step)
 
 
+def slice_array(old_slice, applied_array, size):
+    """Given a slice and the size of the dimension to which it will be applied,
+    index it with an integer or an integer array to return the equivalent
+    integer(s) for indexing the dimension directly
+
+    The result is calculated arithmetically, without expanding the slice into
+    an array.
+    """
+    start, stop, step = old_slice.indices(size)
+    old_size = len(xrange(start, stop, step))
+    if isinstance(applied_array, (int, np.integer)):
+        if not -old_size <= applied_array < old_size:
+            raise IndexError('index %s is out of bounds for axis with size %s'
+                             % (applied_array, old_size))
+        return start + (applied_array % old_size) * step
+    applied_array = np.asarray(applied_array)
+    if applied_array.size and (applied_array.min() < -old_size
+                               or applied_array.max() >= old_size):
+        raise IndexError('index out of bounds for axis with size %s'
+                         % old_size)
+    applied_array = np.where(applied_array < 0, applied_array + old_size,
+                             applied_array)
+    return start + applied_array * step
+
+
 def _index_indexer_1d(old_indexer, applied_indexer, size):
     assert isinstance(applied_indexer, (int, np.integer, slice, np.ndarray))
     if isinstance(applied_indexer, slice) and applied_indexer == slice(None):
@@ -168,12 +195,43 @@ def _index_indexer_1d(old_indexer, applied_indexer, size):
         if isinstance(applied_indexer, slice):
             indexer = slice_slice(old_indexer, applied_indexer, size)
         else:
-            indexer = _expand_slice(old_indexer, size)[applied_indexer]
+            indexer = slice_array(old_indexer, applied_indexer, size)
     else:
         indexer = old_indexer[applied_indexer]
     return indexer
 
 
+def _bounding_slice_indexer(key):
+    """Given a canonical orthogonal key, replace each dense integer array
+    (which selects at least half of the elements in its range) with the
+    minimal slice containing all of its elements.
+
+    Returns the new key and a key of local offsets to apply to the result
+    of indexing with the new key (or None, if the key is unchanged).
+    """
+    new_key = []
+    local_key = []
+    changed = False
+    for k in key:
+        if isinstance(k, np.ndarray) and k.size:
+            start = int(k.min())
+            stop = int(k.max()) + 1
+            if stop - start <= 2 * k.size:
+                new_key.append(slice(start, stop))
+                local = k - start
+                if stop - start == k.size and (np.diff(local) == 1).all():
+                    local = slice(None)
+                local_key.append(local)
+                changed = True
+                continue
+        new_key.append(k)
+        if not isinstance(k, (int, np.integer)):
+            local_key.append(slice(None))
+    if not changed:
+        return key, None
+    return tuple(new_key), tuple(local_key)
+
+
 class LazilyIndexedArray(utils.NDArrayMixin):
     """Wrap an array that handles orthogonal indexing to make indexing lazy
     """
@@ -213,7 +271,14 @@ class LazilyIndexedArray(utils.NDArrayMixin):
         return tuple(shape)
 
     def __array__(self, dtype=None):
-        return np.asarray(self.array[self.key], dtype=None)
+        # read the bounding slices of dense integer array indexers from the
+        # wrapped array (which is often much faster than integer indexing for
+        # on-disk arrays), and then select the requested elements in memory
+        key, local_key = _bounding_slice_indexer(self.key)
+        array = np.asarray(self.array[key], dtype=None)
+        if local_key is not None:
+            array = array[orthogonal_indexer(local_key, array.shape)]
+        return array
 
     def __getitem__(self, key):
         return type(self)(self.array, self._updated_key(key))
@@ -225,3 +290,152 @@ class LazilyIndexedArray(utils.NDArrayMixin):
     def __repr__(self):
         return ('%s(array=%r, key=%r)' %
                 (type(self).__name__, self.array, self.key))
+
+
+def _as_slice_if_contiguous(indices):
+    """Return an equivalent slice for a sorted array of unique integers if the
+    integers are contiguous, or the array itself otherwise"""
+    if indices.size and indices[-1] - indices[0] + 1 == indices.size:
+        return slice(int(indices[0]), int(indices[-1]) + 1)
+    return indices
+
+
+class LazilyConcatenatedArray(utils.NDArrayMixin):
+    """Virtual concatenation of arrays along a new or existing axis.
+
+    Indexing with an orthogonal key only reads the needed elements of the
+    arrays that overlap the key. Wrap this object in a LazilyIndexedArray to
+    make indexing lazy.
+    """
+    def __init__(self, arrays, axis=0, indexers=None, ndim=None):
+        """
+        Parameters
+        ----------
+        arrays : sequence of array_like
+            Array like objects supporting orthogonal indexing, with the same
+            shape except along `axis`. Arrays with one dimension fewer than
+            the others are inserted as a single element along `axis`.
+        axis : int, optional
+            Axis along which to concatenate.
+        indexers : sequence of indexers, optional
+            Positions (slices or integer arrays) along `axis` of the elements
+            of each array in the concatenated array. By default, arrays are
+            concatenated in order.
+        ndim : int, optional
+            Number of dimensions of the concatenated array. By default, the
+            largest number of dimensions of the arrays.
+        """
+        arrays = list(arrays)
+        if not arrays:
+            raise ValueError('must supply at least one array to concatenate')
+        if ndim is None:
+            ndim = max(a.ndim for a in arrays)
+        self._new_axis = [a.ndim < ndim for a in arrays]
+
+        def other_shape(array, new_axis):
+            shape = array.shape
+            return shape if new_axis else shape[:axis] + shape[axis + 1:]
+        shapes = set(other_shape(a, new) for a, new
+                     in zip(arrays, self._new_axis))
+        if (len(shapes) != 1
+                or any(a.ndim not in (ndim - 1, ndim) for a in arrays)):
+            raise ValueError('arrays must have the same shape except along '
+                             'the concatenated axis')
+        self.arrays = arrays
+        self.axis = axis
+        lengths = [1 if new else a.shape[axis]
+                   for a, new in zip(arrays, self._new_axis)]
+        self._offsets = np.cumsum([0] + lengths)
+        if indexers is None:
+            self._which = None
+        else:
+            # map each position along the axis to its array and the position
+            # in that array
+            size = int(self._offsets[-1])
+            self._which = -np.ones(size, dtype=int)
+            self._local = np.empty(size, dtype=int)
+            for n, (indexer, length) in enumerate(zip(indexers, lengths)):
+                positions = np.arange(size)[indexer]
+                if np.size(positions) != length:
+                    raise ValueError('indexer %r does not match an array of '
+                                     'length %s' % (indexer, length))
+                self._which[positions] = n
+                self._local[positions] = np.arange(length)
+            if (self._which < 0).any():
+                raise ValueError('indexers do not cover every position of '
+                                 'the concatenated axis')
+
+    @property
+    def dtype(self):
+        return np.result_type(*[a.dtype for a in self.arrays])
+
+    @property
+    def shape(self):
+        n = self._new_axis.index(False) if False in self._new_axis else 0
+        shape = list(self.arrays[n].shape)
+        if self._new_axis[n]:
+            shape.insert(self.axis, 0)
+        shape[self.axis] = int(self._offsets[-1])
+        return tuple(shape)
+
+    def _locate(self, positions):
+        if self._which is None:
+            which = np.searchsorted(self._offsets, positions, side='right') - 1
+            return which, positions - self._offsets[which]
+        return self._which[positions], self._local[positions]
+
+    def _read(self, n, key, local):
+        if self._new_axis[n]:
+            array = np.asarray(self.arrays[n][key[:self.axis]
+                                              + key[self.axis + 1:]],
+                               dtype=self.dtype)
+            if isinstance(local, (int, np.integer)):
+                return array
+            axis = self.axis - sum(isinstance(k, (int, np.integer))
+                                   for k in key[:self.axis])
+            array = np.expand_dims(array, axis)
+            if isinstance(local, np.ndarray):
+                array = array.take(local, axis=axis)
+            return array
+        key = key[:self.axis] + (local,) + key[self.axis + 1:]
+        return np.asarray(self.arrays[n][key], dtype=self.dtype)
+
+    def __getitem__(self, key):
+        key = canonicalize_indexer(key, self.ndim)
+        k = key[self.axis]
+        size = self.shape[self.axis]
+        if isinstance(k, int):
+            if not -size <= k < size:
+                raise IndexError('index %s is out of bounds for axis %s with '
+                                 'size %s' % (k, self.axis, size))
+            which, local = self._locate(k % size)
+            return self._read(int(which), key, int(local))
+
+        positions = np.arange(size)[k]
+        positions, inverse = np.unique(positions, return_inverse=True)
+        # the axis of the result along which the pieces are concatenated
+        axis = self.axis - sum(isinstance(k, int) for k in key[:self.axis])
+        which, local = self._locate(positions)
+        pieces = []
+        order = []
+        for n in np.unique(which):
+            selected, = np.nonzero(which == n)
+            sort = np.argsort(local[selected], kind='mergesort')
+            pieces.append(self._read(
+                n, key, _as_slice_if_contiguous(local[selected][sort])))
+            order.append(selected[sort])
+        if not pieces:
+            return self._read(0, key, np.arange(0))
+        result = np.concatenate(pieces, axis=axis)
+        # restore the requested order
+        order = np.concatenate(order)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(order.size)
+        take = rank[inverse]
+        if (take != np.arange(take.size)).any():
+            result = result.take(take, axis=axis)
+        return result
+
+    def __repr__(self):
+        return ('%s(arrays=%r, axis=%r)' %
+                (type(self).__name__, self.arrays, self.axis))
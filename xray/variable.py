@@ -1,4 +1,6 @@
 import functools
+import hashlib
+import itertools
 import numpy as np
 import pandas as pd
 
@@ -8,10 +10,11 @@ except ImportError: # Python 3
     izip = zip
 from collections import OrderedDict
 
+from . import deferred
 from . import groupby
 from . import indexing
 from . import ops
-from .pycompat import basestring
+from .pycompat import basestring, xrange
 from . import utils
 import xray
 
@@ -51,6 +54,99 @@ def as_variable(obj, strict=True):
     return obj
 
 
+def _is_lazy(var):
+    """Whether the data of a Variable (or DataArray) is a lazily loaded
+    array, which has not been loaded into memory"""
+    var = as_variable(var)
+    return (isinstance(var._data, utils.NDArrayMixin)
+            and not var._in_memory())
+
+
+def _same_lazy_data(data1, data2):
+    """Whether two arrays are lazy views of the same array with the same key,
+    in which case they hold the same values without needing to be loaded"""
+    return (isinstance(data1, indexing.LazilyIndexedArray)
+            and isinstance(data2, indexing.LazilyIndexedArray)
+            and data1.array is data2.array
+            and len(data1.key) == len(data2.key)
+            and all(k1 is k2 or np.array_equal(k1, k2)
+                    for k1, k2 in zip(data1.key, data2.key)))
+
+
+def _content_digest(values):
+    """SHA-1 digest of the values of a numpy.ndarray, or None if the dtype
+    of the array is not suitable for hashing.
+
+    Values which compare equal in `Variable.equals` are given the same
+    digest, i.e., all NaNs are hashed alike, as are 0.0 and -0.0.
+    """
+    if values.dtype.kind not in 'biufmM':
+        return None
+    values = np.ascontiguousarray(values).reshape(-1)
+    if values.dtype.kind == 'f':
+        # adding +0.0 turns -0.0 into 0.0
+        values = np.where(np.isnan(values), np.nan, values + 0.0)
+    return hashlib.sha1(values.view(np.uint8)).hexdigest()
+
+
+class _EqualityChecker(object):
+    """Compare many variables for equality, with cheap checks first.
+
+    Variables are compared by identity, dimensions, shape and the identity of
+    their data before loading any values. Content digests are computed at
+    most once per variable and cached for the lifetime of the checker, and
+    variables with the same dtype and digest are considered equal. A full
+    comparison of values is only made if the dtype does not permit hashing,
+    or (with `verify=True`) to rule out hash collisions when two digests
+    match.
+
+    A checker should only be used for a single operation, because values
+    modified in-place after their digest is computed are not detected.
+    """
+    def __init__(self, verify=False):
+        self.verify = verify
+        self._digests = {}
+
+    def _digest(self, var):
+        key = id(var)
+        if key not in self._digests:
+            # keep a reference to var so its id is not reused
+            self._digests[key] = (var, _content_digest(var.values))
+        return self._digests[key][1]
+
+    def equals(self, var1, var2):
+        """Like `Variable.equals`, but using the cheap checks"""
+        var1 = getattr(var1, 'variable', var1)
+        var2 = getattr(var2, 'variable', var2)
+        if var1 is var2:
+            return True
+        try:
+            if (var1.dimensions != var2.dimensions
+                    or var1.shape != var2.shape):
+                return False
+            if var1._data is var2._data or _same_lazy_data(var1._data,
+                                                           var2._data):
+                return True
+            if var1.dtype == var2.dtype:
+                digest1 = self._digest(var1)
+                if digest1 is not None:
+                    if digest1 != self._digest(var2):
+                        return False
+                    elif not self.verify:
+                        return True
+        except (TypeError, AttributeError):
+            return False
+        return var1.equals(var2)
+
+    def identical(self, var1, var2):
+        """Like `Variable.identical`, but using the cheap checks"""
+        try:
+            return (utils.dict_equiv(var1.attrs, var2.attrs)
+                    and self.equals(var1, var2))
+        except (TypeError, AttributeError):
+            return False
+
+
 def _as_compatible_data(data):
     """Prepare and wrap data to put in a Variable.
 
@@ -245,6 +341,14 @@ class Variable(AbstractArray):
     _cache_data_class = NumpyArrayAdapter
 
     def _data_cached(self):
+        if deferred.is_deferred(self._data):
+            data = deferred.leaf_array(self._data)
+            if not isinstance(data, self._cache_data_class):
+                data = self._cache_data_class(self._data)
+                # cache the values, but keep arithmetic on this variable
+                # deferred
+                self._data = deferred.as_deferred(data)
+            return data
         if not isinstance(self._data, self._cache_data_class):
             self._data = self._cache_data_class(self._data)
         return self._data
@@ -411,6 +515,45 @@ class Variable(AbstractArray):
                 key[i] = indexers[dim]
         return self[tuple(key)]
 
+    def iter_chunks(self, chunksizes=None):
+        """Iterate over blocks of this variable aligned to its chunks.
+
+        Parameters
+        ----------
+        chunksizes : dict or sequence of int, optional
+            Size of the blocks along each dimension, either as a sequence with
+            one item for each dimension or as a dictionary mapping dimension
+            names to sizes (dimensions not in the dictionary are not split).
+            By default, the variable's native chunk sizes in
+            `encoding['chunksizes']` are used (as read from chunked netCDF4
+            files), or the whole variable is yielded as one block if it has
+            none.
+
+        Yields
+        ------
+        key : tuple of slice
+            Key for the block, such that `block` is `self[key]`.
+        block : Variable
+            Block of this variable. If this variable is not yet loaded into
+            memory, only the data for this block is loaded when it is
+            accessed.
+        """
+        if chunksizes is None:
+            chunksizes = self.encoding.get('chunksizes')
+        if chunksizes is None:
+            chunksizes = self.shape
+        elif isinstance(chunksizes, dict):
+            chunksizes = [chunksizes.get(dim, size) for dim, size
+                          in zip(self.dimensions, self.shape)]
+        if len(chunksizes) != self.ndim:
+            raise ValueError('chunksizes %r must have one item for each '
+                             'dimension' % (chunksizes,))
+        ranges = [[slice(start, start + chunk)
+                   for start in xrange(0, size, max(chunk, 1))]
+                  for size, chunk in zip(self.shape, chunksizes)]
+        for key in itertools.product(*ranges):
+            yield key, self[key]
+
     def transpose(self, *dimensions):
         """Return a new Variable object with transposed dimensions.
 
@@ -506,7 +649,12 @@ class Variable(AbstractArray):
 
         if dimension is not None:
             axis = self.get_axis_num(dimension)
-        data = func(self.values, axis=axis, **kwargs)
+        data = None
+        if _is_lazy(self):
+            # avoid loading all the data into memory at once
+            data = _blocked_reduce(self, func, axis, **kwargs)
+        if data is None:
+            data = func(self.values, axis=axis, **kwargs)
 
         removed_axes = (range(self.ndim) if axis is None
                         else np.atleast_1d(axis) % self.ndim)
@@ -561,6 +709,16 @@ class Variable(AbstractArray):
             length = dimension.size
             dimension, = dimension.dimensions
 
+        first_var, variables = groupby.peek_at(variables)
+        if not issubclass(cls, Coordinate) and _is_lazy(first_var):
+            # only materialize the variables if they may be concatenated
+            # lazily; otherwise they are streamed into the new array below
+            variables = list(variables)
+            concatenated = cls._concat_lazily(variables, dimension, indexers,
+                                              shortcut)
+            if concatenated is not None:
+                return concatenated
+
         if length is None or indexers is None:
             # so much for lazy evaluation! we need to look at all the variables
             # to figure out the indexers and/or dimensions of the stacked
@@ -594,7 +752,8 @@ class Variable(AbstractArray):
             shape = (length,) + first_var.shape
             dims = (dimension,) + first_var.dimensions
 
-        concatenated = cls(dims, np.empty(shape, dtype=first_var.dtype))
+        concatenated = cls(dims, np.empty(shape, dtype=first_var.dtype),
+                           encoding=first_var.encoding)
         concatenated.attrs.update(first_var.attrs)
 
         alt_dims = tuple(d for d in dims if d != dimension)
@@ -617,8 +776,43 @@ class Variable(AbstractArray):
 
         return concatenated
 
+    @classmethod
+    def _concat_lazily(cls, variables, dimension, indexers=None,
+                       shortcut=False):
+        """Concatenate variables without loading their data, by wrapping
+        them in an indexing.LazilyConcatenatedArray.
+
+        Returns None if the variables cannot be concatenated lazily (if the
+        dimensions of some variables do not match, e.g., if they would need to
+        be transposed).
+        """
+        variables = [as_variable(var) for var in variables]
+        first_var = variables[0]
+        if dimension in first_var.dimensions:
+            axis = first_var.get_axis_num(dimension)
+            dims = first_var.dimensions
+        else:
+            axis = 0
+            dims = (dimension,) + first_var.dimensions
+        alt_dims = tuple(d for d in dims if d != dimension)
+
+        attrs = OrderedDict(first_var.attrs)
+        for var in variables:
+            if var.dimensions not in (dims, alt_dims):
+                return None
+            if not shortcut:
+                utils.remove_incompatible_items(attrs, var.attrs)
+
+        arrays = [var._data if isinstance(var._data, utils.NDArrayMixin)
+                  else NumpyArrayAdapter(var._data) for var in variables]
+        data = indexing.LazilyConcatenatedArray(arrays, axis, indexers,
+                                                len(dims))
+        return cls(dims, indexing.LazilyIndexedArray(data), attrs,
+                   first_var.encoding)
+
     def _data_equals(self, other):
         return (self._data is other._data
+                or _same_lazy_data(self._data, other._data)
                 or ((not isinstance(self.values, np.ndarray)
                      or not isinstance(other.values, np.ndarray))
                      and self.values == other.values)
@@ -635,8 +829,11 @@ class Variable(AbstractArray):
         does element-wise comparisions (like numpy.ndarrays).
         """
         other = getattr(other, 'variable', other)
+        if self is other:
+            return True
         try:
             return (self.dimensions == other.dimensions
+                    and self.shape == other.shape
                     and self._data_equals(other))
         except (TypeError, AttributeError):
             return False
@@ -653,10 +850,36 @@ class Variable(AbstractArray):
     def __array_wrap__(self, obj, context=None):
         return Variable(self.dimensions, obj)
 
+    def deferred(self):
+        """Return a new Variable whose element-wise arithmetic is deferred.
+
+        Arithmetic, comparisons and element-wise numpy methods (like `astype`
+        and `clip`) on the returned variable, or on any variable derived from
+        it, are recorded in an expression graph instead of being computed
+        immediately. The values are computed in one fused pass over
+        cache-sized blocks (with numexpr, if it is installed) when they are
+        needed, e.g., when `values` is accessed, when the result is reduced
+        or when it is written to a file. Only the selected values are
+        computed if the result is indexed first.
+
+        Data which is not yet loaded into memory is read block by block
+        during evaluation. In-memory data is not copied, so it should not be
+        modified in-place before the result is evaluated. In-place arithmetic
+        on the returned variable (e.g., ``deferred += 1``) does not modify
+        this variable, but modifying its `values` array in-place does.
+        """
+        return Variable(self.dimensions,
+                        deferred.as_deferred(_orthogonal_data(self)),
+                        self.attrs, self.encoding)
+
     @staticmethod
     def _unary_op(f):
         @functools.wraps(f)
         def func(self, *args, **kwargs):
+            if (deferred.is_deferred(self._data)
+                    and f.__name__.strip('_') in deferred.DEFERRED_OPS):
+                return Variable(self.dimensions, deferred.unary_op(
+                    f, self._data, args, kwargs))
             return Variable(self.dimensions, f(self.values, *args, **kwargs))
         return func
 
@@ -666,6 +889,9 @@ class Variable(AbstractArray):
         def func(self, other):
             if isinstance(other, xray.DataArray):
                 return NotImplemented
+            result = _deferred_binary_op(f, self, other, reflexive)
+            if result is not None:
+                return result
             self_data, other_data, dims = _broadcast_variable_data(self, other)
             new_data = (f(self_data, other_data)
                         if not reflexive
@@ -677,11 +903,20 @@ class Variable(AbstractArray):
     def _inplace_binary_op(f):
         @functools.wraps(f)
         def func(self, other):
+            is_deferred = deferred.is_deferred(self._data)
+            # deferred data without any operations applied is shared with the
+            # variable it was created from
+            is_shared = (is_deferred
+                         and deferred.leaf_array(self._data) is not None)
             self_data, other_data, dims = _broadcast_variable_data(self, other)
             if dims != self.dimensions:
                 raise ValueError('dimensions cannot change for in-place '
                                  'operations')
+            if is_shared:
+                self_data = self_data.copy()
             self.values = f(self_data, other_data)
+            if is_deferred:
+                self._data = deferred.as_deferred(_orthogonal_data(self))
             return self
         return func
 
@@ -733,7 +968,8 @@ class Coordinate(Variable):
         return pd.Index(self._data_cached().array, name=self.name)
 
     def _data_equals(self, other):
-        return self.as_index.equals(other.to_coord().as_index)
+        return (self._data is other._data
+                or self.as_index.equals(other.to_coord().as_index))
 
     def to_coord(self):
         """Return this variable as an Coordinate"""
@@ -765,6 +1001,27 @@ class Coordinate(Variable):
         return self.as_index.is_numeric()
 
 
+def _broadcast_dimensions(first, second):
+    """Validate the dimensions of two Variables for broadcasting, and return
+    the list of dimensions of the broadcast result and a dictionary of their
+    lengths"""
+    dim_lengths = dict(zip(first.dimensions, first.shape))
+    for k, v in zip(second.dimensions, second.shape):
+        if k in dim_lengths and dim_lengths[k] != v:
+            raise ValueError('operands could not be broadcast together '
+                             'with mismatched lengths for dimension %r: %s'
+                             % (k, (dim_lengths[k], v)))
+        dim_lengths[k] = v
+    for dimensions in [first.dimensions, second.dimensions]:
+        if len(set(dimensions)) < len(dimensions):
+            raise ValueError('broadcasting requires that neither operand '
+                             'has duplicate dimensions: %r'
+                             % list(dimensions))
+    second_only_dims = [d for d in second.dimensions
+                        if d not in first.dimensions]
+    return list(first.dimensions) + second_only_dims, dim_lengths
+
+
 def broadcast_variables(first, second):
     """Given two Variables, return two Variables with matching dimensions and
     numpy broadcast compatible data.
@@ -785,23 +1042,9 @@ def broadcast_variables(first, second):
         dimensions.
     """
     # TODO: add unit tests specifically for this function
-    # validate dimensions
-    dim_lengths = dict(zip(first.dimensions, first.shape))
-    for k, v in zip(second.dimensions, second.shape):
-        if k in dim_lengths and dim_lengths[k] != v:
-            raise ValueError('operands could not be broadcast together '
-                             'with mismatched lengths for dimension %r: %s'
-                             % (k, (dim_lengths[k], v)))
-    for dimensions in [first.dimensions, second.dimensions]:
-        if len(set(dimensions)) < len(dimensions):
-            raise ValueError('broadcasting requires that neither operand '
-                             'has duplicate dimensions: %r'
-                             % list(dimensions))
-
-    # build dimensions for new Array
+    dimensions, _ = _broadcast_dimensions(first, second)
     second_only_dims = [d for d in second.dimensions
                         if d not in first.dimensions]
-    dimensions = list(first.dimensions) + second_only_dims
 
     # expand first_data's dimensions so it's broadcast compatible after
     # adding second's dimensions at the end
@@ -816,9 +1059,137 @@ def broadcast_variables(first, second):
     return new_first, new_second
 
 
+def _blocked_reduce(var, func, axis=None, chunksize=None, **kwargs):
+    """Reduce a Variable which is not loaded into memory with a standard
+    numpy reduction, reading one slab at a time along the (first) reduced
+    axis.
+
+    Partial results for each slab are combined with the running accumulators
+    of `groupby.streaming_grouped_reduce` (treating the array as a single
+    group), or with running minima or maxima and their indices for 'argmin'
+    and 'argmax'.
+
+    Returns None if this reduction is not supported, in which case the caller
+    should load the data and reduce it directly.
+    """
+    name = groupby._NUMPY_REDUCE_NAMES.get(func)
+    if name is None or var.ndim == 0 or var.dtype.kind not in 'biuf':
+        return None
+    if set(kwargs) - set(['ddof']) or ('ddof' in kwargs
+                                       and name not in ['var', 'std']):
+        return None
+    if axis is None:
+        axes = list(range(var.ndim))
+    else:
+        axes = sorted(set(int(n) % var.ndim for n in np.atleast_1d(axis)))
+        if name in ['argmin', 'argmax'] and len(axes) > 1:
+            return None
+    keep_axes = [n for n in range(var.ndim) if n not in axes]
+    slab_axis = axes[0]
+    size = var.shape[slab_axis]
+    if size == 0:
+        return None
+
+    if chunksize is None:
+        slab_bytes = var.dtype.itemsize * var.size // size
+        chunksize = max(groupby.STREAMING_CHUNK_BYTES // max(slab_bytes, 1), 1)
+        native_chunks = var.encoding.get('chunksizes')
+        if native_chunks:
+            # read whole chunks of the underlying file at a time
+            native = native_chunks[slab_axis]
+            chunksize = max(chunksize // native, 1) * native
+
+    def slabs():
+        # yield each slab with its reduced axes flattened into the last axis
+        for start in range(0, size, chunksize):
+            key = [slice(None)] * var.ndim
+            key[slab_axis] = slice(start, start + chunksize)
+            values = np.asarray(var._data[tuple(key)])
+            values = values.transpose(keep_axes + axes)
+            yield start, values.reshape(values.shape[:len(keep_axes)]
+                                        + (-1,))
+
+    if name not in ['argmin', 'argmax']:
+        chunks = ((values, np.zeros(values.shape[-1], dtype=int))
+                  for _, values in slabs())
+        result = groupby.streaming_grouped_reduce(chunks, 1, name, axis=-1,
+                                                  **kwargs)
+        return result[..., 0]
+
+    # flat indices along the reduced axes of elements in each slab are offset
+    # by the number of elements in all previous slabs
+    stride = int(np.prod([var.shape[n] for n in axes[1:]]))
+    extreme = np.min if name == 'argmin' else np.max
+    compare = np.less if name == 'argmin' else np.greater
+    best = best_index = None
+    for start, values in slabs():
+        value = extreme(values, axis=-1)
+        index = getattr(np, name)(values, axis=-1) + start * stride
+        if best is None:
+            best, best_index = value, index
+        else:
+            # ties are resolved in favor of the first occurrence, and NaN
+            # always wins (like numpy)
+            better = compare(value, best)
+            if var.dtype.kind == 'f':
+                better |= np.isnan(value) & ~np.isnan(best)
+            best = np.where(better, value, best)
+            best_index = np.where(better, index, best_index)
+    return best_index
+
+
+def _orthogonal_data(var):
+    """The data of a Variable as an array which supports orthogonal indexing
+    """
+    if isinstance(var._data, utils.NDArrayMixin):
+        return var._data
+    return NumpyArrayAdapter(var._data)
+
+
+def _deferred_binary_op(f, self, other, reflexive=False):
+    """Defer a binary operation if either operand is deferred, returning the
+    new Variable, or None if the operation should be computed immediately
+    """
+    other_is_variable = isinstance(other, Variable)
+    if (f.__name__.strip('_') not in deferred.DEFERRED_OPS
+            or not (deferred.is_deferred(self._data)
+                    or (other_is_variable
+                        and deferred.is_deferred(other._data)))):
+        return None
+    if other_is_variable:
+        dims, dim_lengths = _broadcast_dimensions(self, other)
+        other_data = _orthogonal_data(other)
+        other_dims = other.dimensions
+    elif isinstance(other, xray.Dataset) or hasattr(other, 'dimensions'):
+        return None
+    else:
+        dims = self.dimensions
+        dim_lengths = dict(zip(self.dimensions, self.shape))
+        if np.ndim(other) == 0:
+            other_data = other
+            other_dims = None
+        elif np.shape(other) == self.shape:
+            other_data = NumpyArrayAdapter(np.asarray(other))
+            other_dims = self.dimensions
+        else:
+            # rely on numpy broadcasting rules
+            return None
+    shape = tuple(dim_lengths[d] for d in dims)
+    data = deferred.binary_op(f, _orthogonal_data(self), self.dimensions,
+                              other_data, other_dims, dims, shape, reflexive)
+    return Variable(dims, data)
+
+
 def _broadcast_variable_data(self, other):
     if isinstance(other, xray.Dataset):
         raise TypeError('datasets do not support mathematical operations')
+    elif (isinstance(other, Variable) and other.dimensions == self.dimensions
+            and other.shape == self.shape
+            and len(set(self.dimensions)) == self.ndim):
+        # shortcut: the data is already aligned, so nothing to broadcast
+        self_data = self.values
+        other_data = other.values
+        dimensions = self.dimensions
     elif all(hasattr(other, attr) for attr
              in ['dimensions', 'values', 'shape', 'encoding']):
         # `other` satisfies the necessary Variable API for broadcast_variables